@@ -1,9 +1,10 @@
-from py_ecc import optimized_bls12_381 as b
+from curve_backend import get_backend
 from hashlib import sha256
 from dataclasses import dataclass
-from multicombs import lincomb
 import time
 
+curve = get_backend()
+
 # See page 25 and 29 of https://eprint.iacr.org/2020/1536.pdf and
 # page 49-50 of https://eprint.iacr.org/2020/499.pdf
 
@@ -23,12 +24,12 @@ def hash(x):
 # by anyone, so it is NOT a trusted setup
 def mk_generator_points(count):
     points = []
-    x = b.FQ(1)
+    x = 1
     while len(points) < count:
-        y = (x ** 3 + b.b) ** ((b.field_modulus + 1) // 4)
-        if b.is_on_curve((x, y, b.FQ(1)), b.b):
-            points.append(b.multiply((x, y, b.FQ(1)), BLS12_381_COFACTOR))
-        x += b.FQ(1)
+        y = pow(x ** 3 + 4, (curve.field_modulus + 1) // 4, curve.field_modulus)
+        if y * y % curve.field_modulus == (x ** 3 + 4) % curve.field_modulus:
+            points.append(curve.mul(curve.from_affine(x, y), BLS12_381_COFACTOR))
+        x += 1
     return points
 
 
@@ -36,11 +37,11 @@ def mk_generator_points(count):
 def commit(generator_points, poly):
     # Equivalent (but faster) to this:
     # reduce(
-    #    b.add,
-    #    [b.multiply(pt, cf) for pt, cf in zip(generator_points[:len(poly)], poly)],
-    #    b.Z1
+    #    curve.add,
+    #    [curve.mul(pt, cf) for pt, cf in zip(generator_points[:len(poly)], poly)],
+    #    curve.Z1
     # )
-    return lincomb(generator_points[:len(poly)], poly, b.add, b.Z1)
+    return curve.msm(generator_points[:len(poly)], poly)
 
 
 # Returne True iff x is a power of two
@@ -50,8 +51,8 @@ def is_power_of_two(x):
 
 # Serializes an elliptic curve point. Used for Fiat-Shamir.
 def serialize_point(pt):
-    pt = b.normalize(pt)
-    return pt[0].n.to_bytes(64, 'little') + pt[1].n.to_bytes(64, 'little')
+    x, y = curve.to_affine(pt)
+    return x.to_bytes(64, 'little') + y.to_bytes(64, 'little')
 
 
 # Returns the (left|right) half of something
@@ -94,11 +95,11 @@ def prove(points, commitment, poly):
         R.append(yR)
         # Generate random coefficient for recombining the L and R and commitment
         r = hash(r + serialize_point(yL) + serialize_point(yR))
-        a = int.from_bytes(r, 'little') % b.curve_order
+        a = int.from_bytes(r, 'little') % curve.curve_order
         # print('a value: ', a)
         # Generate half-size polynomial and points for the next round
-        poly = [(cL + cR * a) % b.curve_order for (cL, cR) in zip(polyL, polyR)]
-        points = [b.add(b.multiply(pL, a), pR) for (pL, pR) in zip(pointsL, pointsR)]
+        poly = [(cL + cR * a) % curve.curve_order for (cL, cR) in zip(polyL, polyR)]
+        points = [curve.add(curve.mul(pL, a), pR) for (pL, pR) in zip(pointsL, pointsR)]
         # print('intermediate commitment:', commit(points, poly))
     return Proof(L, R, poly[0])
 
@@ -118,24 +119,24 @@ def verify(points, commitment, proof):
     for i in range(len(proof.L)):
         r = hash(r + serialize_point(proof.L[i]) + serialize_point(proof.R[i]))
         # Generate random coefficient for recombining (same as the prover)
-        a = int.from_bytes(r, 'little') % b.curve_order
+        a = int.from_bytes(r, 'little') % curve.curve_order
         # print('a value: ', a)
         # Add L and R into the commitment, applying the appropriate coefficients
-        commitment = b.add(
+        commitment = curve.add(
             proof.L[i],
-            b.add(
-                b.multiply(commitment, a),
-                b.multiply(proof.R[i], a**2)
+            curve.add(
+                curve.mul(commitment, a),
+                curve.mul(proof.R[i], a**2)
             )
         )
         # print('intermediate commitment:', commitment)
         # Update the coefficients (points_coeffs[i] = how many times points[i] will
         # appear in the single base point of the last round)
-        points_coeffs = sum([[(x*a) % b.curve_order, x] for x in points_coeffs], [])
+        points_coeffs = sum([[(x*a) % curve.curve_order, x] for x in points_coeffs], [])
     # Finally, we do the linear combination
-    combined_point = lincomb(points, points_coeffs, b.add, b.Z1)
+    combined_point = curve.msm(points, points_coeffs)
     # Base case check: base_point * coefficient ?= commitment
-    return b.eq(b.multiply(combined_point, proof.tip), commitment)
+    return curve.eq(curve.mul(combined_point, proof.tip), commitment)
 
 
 # Prove that `commitment` actually is the commitment to a polynomial
@@ -148,7 +149,7 @@ def prove_evaluation(points, commitment, poly, x, y):
     # Alongside the base points, we track the powers of the x coordinate we are
     # proving an evaluation for. These points get manipulated in the same way as the
     # base points do.
-    xpowers = [pow(x, i, b.curve_order) for i in range(len(poly))]
+    xpowers = [pow(x, i, curve.curve_order) for i in range(len(poly))]
     # Left-side points for the proof
     L = []
     # Right-side points for the proof
@@ -156,7 +157,7 @@ def prove_evaluation(points, commitment, poly, x, y):
     # Fiat-shamir randomness value
     r = hash(serialize_point(commitment) + x.to_bytes(32, 'little') + y.to_bytes(32, 'little'))
     # For security, we randomize H
-    H = b.multiply(H, int.from_bytes(r, 'little') % b.curve_order)
+    H = curve.mul(H, int.from_bytes(r, 'little') % curve.curve_order)
     while len(poly) > 1:
         # Generate the left-side and right-side points, except we also mix in a similarly
         # constructed "commitment" that uses `H * powers of x` as its base instead of the
@@ -166,18 +167,18 @@ def prove_evaluation(points, commitment, poly, x, y):
         xpowersL, xpowersR = left_half(xpowers), right_half(xpowers)
         yL = commit(pointsR, polyL)
         yR = commit(pointsL, polyR)
-        L.append(b.add(yL, b.multiply(H, sum(a*b for a,b in zip(xpowersR, polyL)))))
-        R.append(b.add(yR, b.multiply(H, sum(a*b for a,b in zip(xpowersL, polyR)))))
+        L.append(curve.add(yL, curve.mul(H, sum(a*b for a,b in zip(xpowersR, polyL)))))
+        R.append(curve.add(yR, curve.mul(H, sum(a*b for a,b in zip(xpowersL, polyR)))))
         # Generate random coefficient for recombining the L and R and commitment
         r = hash(r + serialize_point(L[-1]) + serialize_point(R[-1]))
-        a = int.from_bytes(r, 'little') % b.curve_order
+        a = int.from_bytes(r, 'little') % curve.curve_order
         # print('a value: ', a)
         # Generate half-size polynomial and points for the next round. Notice how we treat
         # the powers of x the same way that we do the base points
-        poly = [(cL + cR * a) % b.curve_order for (cL, cR) in zip(polyL, polyR)]
-        points = [b.add(b.multiply(pL, a), pR) for (pL, pR) in zip(pointsL, pointsR)]
-        xpowers = [(xL * a + xR) % b.curve_order for (xL, xR) in zip(xpowersL, xpowersR)]
-        # print('intermediate commitment:', b.add(commit(points, poly), b.multiply(H, sum(a*b for a,b in zip(xpowers, poly)))))
+        poly = [(cL + cR * a) % curve.curve_order for (cL, cR) in zip(polyL, polyR)]
+        points = [curve.add(curve.mul(pL, a), pR) for (pL, pR) in zip(pointsL, pointsR)]
+        xpowers = [(xL * a + xR) % curve.curve_order for (xL, xR) in zip(xpowersL, xpowersR)]
+        # print('intermediate commitment:', curve.add(commit(points, poly), curve.mul(H, sum(a*b for a,b in zip(xpowers, poly)))))
     return Proof(L, R, poly[0])
 
 
@@ -187,45 +188,45 @@ def verify_evaluation(points, commitment, proof, x, y):
     # which we will use to mix in the _evaluation_ of the polynomial.
     points, H = points[:2**len(proof.L)], points[2**len(proof.L)]
     # Powers of x, as in the prover
-    xpowers = [pow(x, i, b.curve_order) for i in range(len(poly))]
+    xpowers = [pow(x, i, curve.curve_order) for i in range(len(poly))]
     # Fiat-shamir randomness value
     r = hash(serialize_point(commitment) + x.to_bytes(32, 'little') + y.to_bytes(32, 'little'))
     # For security, we randomize H
-    H = b.multiply(H, int.from_bytes(r, 'little') % b.curve_order)
+    H = curve.mul(H, int.from_bytes(r, 'little') % curve.curve_order)
     # We "mix in" H * the claimed evaluation P(x) = y. Notice that `H * P(x)` equals the
     # dot-product of `H * powers of x` and the polynomial coefficients, so it has the
     # "same format" as the polynomial commitment itself. This allows us to verify the
     # evaluation using the same technique that we use to just prove that the commitment
     # is valid
-    commitment = b.add(commitment, b.multiply(H, y))
+    commitment = curve.add(commitment, curve.mul(H, y))
     # Track the linear combination so we can generate the final-round point and xpower,
     # just as before
     points_coeffs = [1]
     for i in range(len(proof.L)):
         # Generate random coefficient for recombining (same as the prover)
         r = hash(r + serialize_point(proof.L[i]) + serialize_point(proof.R[i]))
-        a = int.from_bytes(r, 'little') % b.curve_order
+        a = int.from_bytes(r, 'little') % curve.curve_order
         # print('a value: ', a)
         # Add L and R into the commitment, applying the appropriate coefficients
-        commitment = b.add(
+        commitment = curve.add(
             proof.L[i],
-            b.add(
-                b.multiply(commitment, a),
-                b.multiply(proof.R[i], a**2)
+            curve.add(
+                curve.mul(commitment, a),
+                curve.mul(proof.R[i], a**2)
             )
         )
         # print('intermediate commitment:', commitment)
         # Update the coefficients (as in basic verification above)
-        points_coeffs = sum([[(x*a) % b.curve_order, x] for x in points_coeffs], [])
+        points_coeffs = sum([[(x*a) % curve.curve_order, x] for x in points_coeffs], [])
     # Finally, we do the linear combination; same one for base points and x powers
-    combined_point = lincomb(points, points_coeffs, b.add, b.Z1)
+    combined_point = curve.msm(points, points_coeffs)
     combined_x_powers = sum(p*c for p,c in zip(xpowers, points_coeffs))
     # Base case check: base_point * coefficient ?= commitment. Note that here we
     # have to also mix H * the combined xpower into the final base point
-    return b.eq(
-        b.add(
-            b.multiply(combined_point, proof.tip),
-            b.multiply(H, (proof.tip * combined_x_powers) % b.curve_order)
+    return curve.eq(
+        curve.add(
+            curve.mul(combined_point, proof.tip),
+            curve.mul(H, (proof.tip * combined_x_powers) % curve.curve_order)
         ),
         commitment
     )
@@ -0,0 +1,369 @@
+import os
+from time import time
+
+#
+# Group operations on BLS12-381, with interchangeable implementations
+#
+# The KZG, verkle and IPA code in kzg_data_availability, verkle, bulletproofs and verkle_trie only uses the
+# operations below, so the same algorithms run on any backend:
+#
+#   G1, G2, Z1, Z2          generators and identities (never modified in place)
+#   curve_order             order of the groups
+#   add, neg, mul, double   group operations on G1 and G2 points; points are never modified in place
+#   eq, is_inf, is_point    comparisons, and whether a value is a point (rather than a field element)
+#   in_group                whether a point on the curve is in the subgroup of order curve_order
+#   msm(points, factors)    linear combination sum factors[i] * points[i]
+#   serialize_g1/g2         compressed encoding (ZCash format: 48 bytes in G1, 96 bytes in G2), and
+#   deserialize_g1/g2       decoding, which raises a ValueError for invalid encodings
+#   to_affine, from_affine  affine coordinates (x, y) of a G1 point as integers
+#   pairing_check(pairs)    whether the product of e(P, Q) over all (P, Q) in pairs (P in G1, Q in G2) is one
+#
+# This module is shared by those directories, so their scripts are run with the repository root on the path:
+#
+#   cd kzg_data_availability && PYTHONPATH=.. python kzg_proofs.py
+#
+# get_backend() returns the fastest available implementation, unless the environment variable CURVE_BACKEND
+# selects one by name:
+#
+#   "blst"    the blst Python bindings, which have to be importable (installed, or the directory of a build on
+#             the path, e.g. PYTHONPATH=..:../verkle_trie_pedersen for the copy in verkle_trie_pedersen)
+#   "py_ecc"  py_ecc.optimized_bls12_381 (pure Python)
+#
+
+
+def get_number_of_windows(bits, window_bits):
+    # The top signed digit has to be below 2**(window_bits - 1) even after the carry from the digit below, which
+    # needs two bits of headroom: window_bits * number_of_windows >= bits + 2
+    return (bits + 1) // window_bits + 1
+
+
+def signed_digits(factor, window_bits, number_of_windows):
+    """
+    Decomposes factor into signed base 2**window_bits digits in [-2**(window_bits - 1), 2**(window_bits - 1)),
+    least significant first. Negative digits only need a negated point, so half the number of buckets is enough.
+    """
+    full = 1 << window_bits
+    half = full >> 1
+    mask = full - 1
+    digits = []
+    for i in range(number_of_windows):
+        digit = factor & mask
+        factor >>= window_bits
+        if digit >= half:
+            digit -= full
+            factor += 1
+        digits.append(digit)
+    assert factor == 0
+    return digits
+
+
+# Measured cost (in seconds) of a group addition, a doubling and a full size scalar multiplication in G1 for
+# each backend, used to choose the window size
+operation_costs = {}
+
+
+def measure_operation_costs(backend):
+    """
+    Measures the cost of a group addition, a doubling and a scalar multiplication (once per process and backend)
+    """
+    if backend.name not in operation_costs:
+        repetitions = 64
+        a = backend.G1
+        b = backend.double(a)
+        time_a = time()
+        for i in range(repetitions):
+            a = backend.add(a, b)
+        time_b = time()
+        for i in range(repetitions):
+            a = backend.double(a)
+        time_c = time()
+        for i in range(repetitions // 16):
+            backend.mul(b, backend.curve_order - 1)
+        time_d = time()
+        operation_costs[backend.name] = {"add": (time_b - time_a) / repetitions,
+                                         "dbl": (time_c - time_b) / repetitions,
+                                         "mul": (time_d - time_c) / (repetitions // 16)}
+    return operation_costs[backend.name]
+
+
+def estimate_cost(backend, n, bits, window_bits):
+    """
+    Estimated cost of an MSM of size n with factors of `bits` bits. Every window costs about n bucket additions,
+    two additions per bucket for the running sums, and `window_bits` doublings to combine it with the other windows
+    """
+    costs = measure_operation_costs(backend)
+    return get_number_of_windows(bits, window_bits) * ((n + 2**window_bits) * costs["add"] + window_bits * costs["dbl"])
+
+
+def choose_window_bits(backend, n, bits):
+    """
+    Chooses the window size that minimizes the estimated cost of an MSM of size n with factors of `bits` bits
+    """
+    return min(range(2, 21), key=lambda window_bits: estimate_cost(backend, n, bits, window_bits))
+
+
+def lincomb_naive(backend, points, factors, zero):
+    """
+    Direct linear combination
+    """
+    result = zero
+    for point, factor in zip(points, factors):
+        result = backend.add(result, backend.mul(point, factor))
+    return result
+
+
+def window_sum(backend, points, negated_points, digits, zero):
+    """
+    Computes sum(digit * point) for one window with one bucket per absolute digit value and running sum aggregation
+    """
+    buckets = {}
+    for point, negated_point, digit in zip(points, negated_points, digits):
+        if digit != 0:
+            point = point if digit > 0 else negated_point
+            bucket = buckets.get(abs(digit))
+            buckets[abs(digit)] = point if bucket is None else backend.add(bucket, point)
+
+    # sum_k k * bucket[k] as the sum of the running sums bucket[top] + ... + bucket[k]
+    running_sum = None
+    total = zero
+    for digit in range(max(buckets, default=0), 0, -1):
+        bucket = buckets.get(digit)
+        if bucket is not None:
+            running_sum = bucket if running_sum is None else backend.add(running_sum, bucket)
+        total = backend.add(total, running_sum)
+    return total
+
+
+def to_affine_or_inf(backend, point):
+    return None if backend.is_inf(point) else backend.to_affine(point)
+
+
+def from_affine_or_inf(backend, point):
+    return backend.Z1 if point is None else backend.from_affine(*point)
+
+
+def window_sums_affine(backend_name, affine_points, digits_by_window):
+    """
+    Computes the window sums in G1 for the windows in `digits_by_window` in a worker process (points are passed
+    in affine coordinates)
+    """
+    backend = get_backend(backend_name)
+    points = [from_affine_or_inf(backend, point) for point in affine_points]
+    negated_points = [backend.neg(point) for point in points]
+    return [to_affine_or_inf(backend, window_sum(backend, points, negated_points, digits, backend.Z1))
+            for digits in digits_by_window]
+
+
+# Number of windows computed per work item when the windows are split across processes
+WINDOWS_PER_TASK = 4
+
+
+def pippenger(backend, points, factors, zero, window_bits=None, pool=None):
+    """
+    Multiexponentiation using Pippenger's algorithm with signed digits and running sum bucket aggregation, using
+    the group operations of `backend`. The window size is chosen from the measured cost of additions and doublings
+    unless `window_bits` is given (small inputs fall back to separate scalar multiplications).
+    If `pool` (a multiprocessing.Pool) is given, the windows of an MSM in G1 are computed in parallel.
+    """
+    factors = [factor % backend.curve_order for factor in factors[:len(points)]]
+    points = points[:len(factors)]
+    n = len(factors)
+    bits = max(factors, default=0).bit_length()
+    if bits == 0:
+        return zero
+    if window_bits is None:
+        window_bits = choose_window_bits(backend, n, bits)
+        # Small MSMs are faster as separate scalar multiplications
+        mul_cost = measure_operation_costs(backend)["mul"] * bits / backend.curve_order.bit_length()
+        if n * mul_cost < estimate_cost(backend, n, bits, window_bits):
+            return lincomb_naive(backend, points, factors, zero)
+    number_of_windows = get_number_of_windows(bits, window_bits)
+    digits_by_window = list(zip(*[signed_digits(factor, window_bits, number_of_windows) for factor in factors]))
+
+    if pool is None:
+        negated_points = [backend.neg(point) for point in points]
+        sums = [window_sum(backend, points, negated_points, digits, zero) for digits in digits_by_window]
+    else:
+        affine_points = [to_affine_or_inf(backend, point) for point in points]
+        tasks = [(backend.name, affine_points, digits_by_window[i:i + WINDOWS_PER_TASK])
+                 for i in range(0, number_of_windows, WINDOWS_PER_TASK)]
+        sums = [from_affine_or_inf(backend, point) for task_sums in pool.starmap(window_sums_affine, tasks)
+                for point in task_sums]
+
+    result = sums[-1]
+    for window in reversed(sums[:-1]):
+        for i in range(window_bits):
+            result = backend.double(result)
+        result = backend.add(result, window)
+    return result
+
+
+class PyEccBackend():
+
+    name = "py_ecc"
+
+    def __init__(self):
+        from py_ecc import optimized_bls12_381 as b
+        from py_ecc.bls import point_compression
+        self.b = b
+        self.point_compression = point_compression
+        self.G1, self.G2, self.Z1, self.Z2 = b.G1, b.G2, b.Z1, b.Z2
+        self.curve_order = b.curve_order
+        self.field_modulus = b.field_modulus
+        self.add = b.add
+        self.neg = b.neg
+        self.double = b.double
+        self.eq = b.eq
+        self.is_inf = b.is_inf
+
+    def mul(self, x, n):
+        return self.b.multiply(x, n % self.curve_order)
+
+    def is_point(self, x):
+        return type(x) == tuple
+
+    def in_group(self, x):
+        # mul reduces the factor modulo curve_order, which would turn this into a multiplication by zero
+        return self.b.is_inf(self.b.multiply(x, self.curve_order))
+
+    def msm(self, points, factors):
+        zero = self.Z2 if len(points) > 0 and type(points[0][0]) == self.b.FQ2 else self.Z1
+        return pippenger(self, points, factors, zero)
+
+    def serialize_g1(self, x):
+        return self.point_compression.compress_G1(x).to_bytes(48, "big")
+
+    def deserialize_g1(self, data):
+        if len(data) != 48:
+            raise ValueError("Invalid G1 point encoding")
+        return self.point_compression.decompress_G1(int.from_bytes(data, "big"))
+
+    def serialize_g2(self, x):
+        return b"".join(z.to_bytes(48, "big") for z in self.point_compression.compress_G2(x))
+
+    def deserialize_g2(self, data):
+        if len(data) != 96:
+            raise ValueError("Invalid G2 point encoding")
+        return self.point_compression.decompress_G2((int.from_bytes(data[:48], "big"), int.from_bytes(data[48:], "big")))
+
+    def to_affine(self, x):
+        x, y = self.b.normalize(x)
+        return x.n, y.n
+
+    def from_affine(self, x, y):
+        point = (self.b.FQ(x), self.b.FQ(y), self.b.FQ.one())
+        if not self.b.is_on_curve(point, self.b.b):
+            raise ValueError("Point is not on the curve")
+        return point
+
+    def pairing_check(self, pairs):
+        product = self.b.FQ12.one()
+        for p, q in pairs:
+            product *= self.b.pairing(q, p, False)
+        return self.b.final_exponentiate(product) == self.b.FQ12.one()
+
+
+class BlstBackend():
+
+    name = "blst"
+
+    def __init__(self):
+        import blst
+        self.blst = blst
+        self.G1, self.G2 = blst.G1(), blst.G2()
+        self.Z1, self.Z2 = blst.G1().mult(0), blst.G2().mult(0)
+        self.curve_order = 0x73eda753299d7d483339d80809a1d80553bda402fffe5bfeffffffff00000001
+        self.field_modulus = 0x1a0111ea397fe69a4b1ba7b6434bacd764774b84f38512bf6730d2a0f6b0f6241eabfffeb153ffffb9feffffffffaaab
+
+    def add(self, x, y):
+        return x.dup().add(y)
+
+    def neg(self, x):
+        return x.dup().neg()
+
+    def mul(self, x, n):
+        return x.dup().mult(n % self.curve_order)
+
+    def double(self, x):
+        return x.dup().dbl()
+
+    def eq(self, x, y):
+        return x.is_equal(y)
+
+    def is_inf(self, x):
+        return x.is_inf()
+
+    def is_point(self, x):
+        return isinstance(x, (self.blst.P1, self.blst.P2))
+
+    def in_group(self, x):
+        return x.in_group()
+
+    def msm(self, points, factors):
+        zero = self.Z2 if len(points) > 0 and isinstance(points[0], self.blst.P2) else self.Z1
+        return pippenger(self, points, factors, zero)
+
+    def serialize_g1(self, x):
+        return x.compress()
+
+    def deserialize_g1(self, data):
+        if len(data) != 48:
+            raise ValueError("Invalid G1 point encoding")
+        try:
+            return self.blst.P1(data)
+        except RuntimeError:
+            raise ValueError("Invalid G1 point encoding")
+
+    def serialize_g2(self, x):
+        return x.compress()
+
+    def deserialize_g2(self, data):
+        if len(data) != 96:
+            raise ValueError("Invalid G2 point encoding")
+        try:
+            return self.blst.P2(data)
+        except RuntimeError:
+            raise ValueError("Invalid G2 point encoding")
+
+    def to_affine(self, x):
+        data = x.serialize()
+        return int.from_bytes(data[:48], "big"), int.from_bytes(data[48:], "big")
+
+    def from_affine(self, x, y):
+        try:
+            return self.blst.P1(x.to_bytes(48, "big") + y.to_bytes(48, "big"))
+        except RuntimeError:
+            raise ValueError("Point is not on the curve")
+
+    def pairing_check(self, pairs):
+        product = None
+        for p, q in pairs:
+            pairing = self.blst.PT(q.to_affine(), p.to_affine())
+            product = pairing if product is None else product.mul(pairing)
+        return product is None or product.final_exp().is_one()
+
+
+BACKENDS = {"blst": BlstBackend, "py_ecc": PyEccBackend}
+
+
+# Backend instances by name, so that all modules of a process share the same one
+backends = {}
+
+
+def get_backend(name=None):
+    """
+    Returns the backend called `name`. If name is None, returns the backend selected by the environment variable
+    CURVE_BACKEND, or the fastest available one
+    """
+    if name is None:
+        name = os.environ.get("CURVE_BACKEND")
+    if name is None:
+        for backend_name in BACKENDS:
+            try:
+                return get_backend(backend_name)
+            except ImportError:
+                pass
+        raise ImportError("No BLS12-381 backend available")
+    if name not in backends:
+        backends[name] = BACKENDS[name]()
+    return backends[name]
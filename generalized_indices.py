@@ -0,0 +1,38 @@
+#
+# Merkle multi-proofs in generalized indices, shared by mimc_stark, merkle_tree and ssz_research/partials
+# (run their scripts with the repository root on the path, e.g. `cd mimc_stark && PYTHONPATH=.. python test.py`)
+#
+
+# Generalized indices (the root is 1 and the children of i are 2i and 2i+1) of the nodes that a proof
+# for the nodes `tree_indices` has to provide, in descending order: the siblings of the nodes on the
+# paths to the root that are neither on a path themselves nor computable from the nodes below them.
+# Takes one pass over the nodes on the paths, largest (i.e. deepest) first; the parents of the nodes
+# come out in descending order too, so the queue of pending nodes is the merge of two sorted lists
+def get_helper_indices(tree_indices):
+    indices = sorted(set(tree_indices), reverse=True)
+    parents = []
+    helpers = []
+    i = j = 0
+    # Returns the largest pending node, or 0 if there is none
+    def peek():
+        a = indices[i] if i < len(indices) else 0
+        b = parents[j] if j < len(parents) else 0
+        return max(a, b)
+    def pop(x):
+        nonlocal i, j
+        while i < len(indices) and indices[i] == x:
+            i += 1
+        while j < len(parents) and parents[j] == x:
+            j += 1
+    x = peek()
+    while x > 1:
+        pop(x)
+        # The sibling of an odd node is the next largest node if it is pending
+        if x % 2 and peek() == x - 1:
+            pop(x - 1)
+        else:
+            helpers.append(x ^ 1)
+        if not parents or parents[-1] != x // 2:
+            parents.append(x // 2)
+        x = peek()
+    return helpers
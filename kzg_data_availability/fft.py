@@ -1,58 +1,113 @@
 
-from py_ecc import optimized_bls12_381 as b
+from curve_backend import get_backend
 
-def _simple_ft(vals, modulus, roots_of_unity):
-    L = len(roots_of_unity)
-    o = []
-    for i in range(L):
-        last = b.Z1 if type(vals[0]) == tuple else 0
-        for j in range(L):
-            if type(vals[0]) == tuple:
-                last = b.add(last, b.multiply(vals[j], roots_of_unity[(i*j)%L]))
-            else:
-                last += vals[j] * roots_of_unity[(i*j)%L]
-        o.append(last if type(last) == tuple else last % modulus)
-    return o
+curve = get_backend()
 
-def _fft(vals, modulus, roots_of_unity):
-    if len(vals) <= 4 and type(vals[0]) != tuple:
-        #return vals
-        return _simple_ft(vals, modulus, roots_of_unity)
-    elif len(vals) == 1 and type(vals[0]) == tuple:
-        return vals
-    L = _fft(vals[::2], modulus, roots_of_unity[::2])
-    R = _fft(vals[1::2], modulus, roots_of_unity[::2])
-    o = [0 for i in vals]
-    for i, (x, y) in enumerate(zip(L, R)):
-        y_times_root = b.multiply(y, roots_of_unity[i]) if type(y) == tuple else y*roots_of_unity[i]
-        o[i] = b.add(x, y_times_root) if type(x) == tuple else (x+y_times_root) % modulus
-        o[i+len(L)] = b.add(x, b.neg(y_times_root)) if type(x) == tuple else (x-y_times_root) % modulus
-    return o
+# Powers of the root of unity, cached by (modulus, root of unity)
+_roots_of_unity_cache = {}
+
+# Powers of the inverse root of unity, cached by (modulus, root of unity)
+_inverse_roots_of_unity_cache = {}
+
+# Bit reversal permutations, cached by length
+_bit_reversal_cache = {}
 
 def expand_root_of_unity(root_of_unity, modulus):
     # Build up roots of unity
-    rootz = [1, root_of_unity]
-    while rootz[-1] != 1:
-        rootz.append((rootz[-1] * root_of_unity) % modulus)
-    return rootz
+    key = (modulus, root_of_unity)
+    if key not in _roots_of_unity_cache:
+        rootz = [1, root_of_unity]
+        while rootz[-1] != 1:
+            rootz.append((rootz[-1] * root_of_unity) % modulus)
+        _roots_of_unity_cache[key] = rootz
+    return _roots_of_unity_cache[key]
+
+def expand_inverse_root_of_unity(root_of_unity, modulus):
+    # rootz[L - i] = root_of_unity**(-i), so the inverse roots are the roots in reverse order
+    key = (modulus, root_of_unity)
+    if key not in _inverse_roots_of_unity_cache:
+        _inverse_roots_of_unity_cache[key] = expand_root_of_unity(root_of_unity, modulus)[::-1]
+    return _inverse_roots_of_unity_cache[key]
+
+def bit_reversal_permutation(L):
+    if L not in _bit_reversal_cache:
+        bits = L.bit_length() - 1
+        permutation = [0] * L
+        for i in range(1, L):
+            permutation[i] = (permutation[i >> 1] >> 1) | ((i & 1) << (bits - 1))
+        _bit_reversal_cache[L] = permutation
+    return _bit_reversal_cache[L]
+
+def _bit_reverse_in_place(vals):
+    for i, j in enumerate(bit_reversal_permutation(len(vals))):
+        if i < j:
+            vals[i], vals[j] = vals[j], vals[i]
+
+def _field_butterflies(vals, modulus, roots_of_unity):
+    L = len(vals)
+    half = 1
+    while half < L:
+        step = L // (2 * half)
+        for start in range(0, L, 2 * half):
+            for k in range(half):
+                i = start + k
+                x = vals[i]
+                y_times_root = vals[i + half] * roots_of_unity[k * step]
+                vals[i] = (x + y_times_root) % modulus
+                vals[i + half] = (x - y_times_root) % modulus
+        half *= 2
+
+def _group_butterflies(vals, roots_of_unity):
+    add, neg, multiply = curve.add, curve.neg, curve.mul
+    L = len(vals)
+    half = 1
+    while half < L:
+        step = L // (2 * half)
+        for start in range(0, L, 2 * half):
+            x, y = vals[start], vals[start + half]
+            vals[start], vals[start + half] = add(x, y), add(x, neg(y))
+            for k in range(1, half):
+                i = start + k
+                x = vals[i]
+                y_times_root = multiply(vals[i + half], roots_of_unity[k * step])
+                vals[i] = add(x, y_times_root)
+                vals[i + half] = add(x, neg(y_times_root))
+        half *= 2
+
+def _fft_in_place(vals, modulus, roots_of_unity):
+    """
+    Iterative radix-2 FFT of vals (field elements or G1 points): a bit reversal permutation followed by
+    log2(L) levels of butterflies, all in place. roots_of_unity[i] must be the i-th power of a root of unity
+    of order L = len(vals).
+    """
+    _bit_reverse_in_place(vals)
+    if curve.is_point(vals[0]):
+        _group_butterflies(vals, roots_of_unity)
+    else:
+        _field_butterflies(vals, modulus, roots_of_unity)
+    return vals
+
+def _fft(vals, modulus, roots_of_unity):
+    return _fft_in_place(list(vals), modulus, roots_of_unity)
 
 def fft(vals, modulus, root_of_unity, inv=False):
     rootz = expand_root_of_unity(root_of_unity, modulus)
     # Fill in vals with zeroes if needed
     if len(rootz) > len(vals) + 1:
         vals = vals + [0] * (len(rootz) - len(vals) - 1)
+    else:
+        vals = list(vals)
     if inv:
         # Inverse FFT
         invlen = pow(len(vals), modulus-2, modulus)
-        if type(vals[0]) == tuple:
-            return [b.multiply(x, invlen) for x in
-                    _fft(vals, modulus, rootz[:0:-1])]
+        _fft_in_place(vals, modulus, expand_inverse_root_of_unity(root_of_unity, modulus))
+        if curve.is_point(vals[0]):
+            return [curve.mul(x, invlen) for x in vals]
         else:
-            return [(x*invlen) % modulus for x in
-                    _fft(vals, modulus, rootz[:0:-1])]
+            return [(x*invlen) % modulus for x in vals]
     else:
         # Regular FFT
-        return _fft(vals, modulus, rootz[:-1])
+        return _fft_in_place(vals, modulus, rootz)
 
 # Evaluates f(x) for f in evaluation form
 def inv_fft_at_point(vals, modulus, root_of_unity, x):
@@ -107,14 +162,12 @@ def shift_poly(poly, modulus, factor):
     return o
 
 def mul_polys(a, b, modulus, root_of_unity):
-    rootz = [1, root_of_unity]
-    while rootz[-1] != 1:
-        rootz.append((rootz[-1] * root_of_unity) % modulus)
+    rootz = expand_root_of_unity(root_of_unity, modulus)
     if len(rootz) > len(a) + 1:
         a = a + [0] * (len(rootz) - len(a) - 1)
     if len(rootz) > len(b) + 1:
         b = b + [0] * (len(rootz) - len(b) - 1)
-    x1 = _fft(a, modulus, rootz[:-1])
-    x2 = _fft(b, modulus, rootz[:-1])
-    return _fft([(v1*v2)%modulus for v1,v2 in zip(x1,x2)],
-               modulus, rootz[:0:-1])
+    x1 = _fft(a, modulus, rootz)
+    x2 = _fft(b, modulus, rootz)
+    return _fft_in_place([(v1*v2)%modulus for v1,v2 in zip(x1,x2)],
+                         modulus, expand_inverse_root_of_unity(root_of_unity, modulus))
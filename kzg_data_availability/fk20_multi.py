@@ -1,4 +1,4 @@
-from py_ecc import optimized_bls12_381 as b
+from curve_backend import get_backend
 from fft import fft
 import kzg_proofs
 from kzg_proofs import (
@@ -11,19 +11,28 @@ from kzg_proofs import (
     reverse_bit_order,
     is_power_of_two,
     eval_poly_at,
-    get_extended_data
+    get_extended_data,
+    G1_POINT_SIZE,
+    serialize_g1,
+    deserialize_g1
 )
 from fk20_single import (
-    toeplitz_part1,
+    FK20Context,
+    MappedG1Points,
     toeplitz_part2,
     toeplitz_part3
 )
+from multiprocessing import Pool
+import os
+import tempfile
+
+curve = get_backend()
 
 # FK20 Method to compute all proofs
 # Toeplitz multiplication via http://www.netlib.org/utk/people/JackDongarra/etemplates/node384.html
 # Multi proof method
 
-def fk20_multi(polynomial, l, setup):
+def fk20_multi(polynomial, l, setup, context=None):
     """
     For a polynomial of size n, let w be a n-th root of unity. Then this method will return
     k=n/l KZG proofs for the points
@@ -42,18 +51,18 @@ def fk20_multi(polynomial, l, setup):
     
     # Preprocessing part -- this is independent from the polynomial coefficients and can be
     # done before the polynomial is known, it only needs to be computed once
-    xext_fft = []
-    for i in range(l):
-        x = setup[0][n - l - 1 - i::-l] + [b.Z1]
-        xext_fft.append(toeplitz_part1(x))
+    if context is None:
+        context = FK20Context(setup, n, l)
+    assert context.n == n and context.l == l
+    xext_fft = context.xext_fft
 
-    hext_fft = [b.Z1] * 2 * k
+    hext_fft = [curve.Z1] * 2 * k
     for i in range(l):
 
         toeplitz_coefficients = polynomial[- i - 1::l] + [0] * (k + 1) + polynomial[2 * l - i - 1: - l - i:l]
 
         # Compute the vector h from the paper using a Toeplitz matric multiplication
-        hext_fft = [b.add(v, w) for v, w in zip(hext_fft, toeplitz_part2(toeplitz_coefficients, xext_fft[i]))]
+        hext_fft = [curve.add(v, w) for v, w in zip(hext_fft, toeplitz_part2(toeplitz_coefficients, xext_fft[i]))]
     
     h = toeplitz_part3(hext_fft)
 
@@ -61,7 +70,7 @@ def fk20_multi(polynomial, l, setup):
     return fft(h, MODULUS, get_root_of_unity(k))
 
 
-def fk20_multi_data_availability_optimized(polynomial, l, setup):
+def fk20_multi_data_availability_optimized(polynomial, l, setup, context=None):
     """
     FK20 multi-proof method, optimized for dava availability where the top half of polynomial
     coefficients == 0
@@ -79,32 +88,32 @@ def fk20_multi_data_availability_optimized(polynomial, l, setup):
 
     # Preprocessing part -- this is independent from the polynomial coefficients and can be
     # done before the polynomial is known, it only needs to be computed once
-    xext_fft = []
-    for i in range(l):
-        x = setup[0][n - l - 1 - i::-l] + [b.Z1]
-        xext_fft.append(toeplitz_part1(x))
+    if context is None:
+        context = FK20Context(setup, n, l)
+    assert context.n == n and context.l == l
+    xext_fft = context.xext_fft
 
     add_instrumentation()
 
-    hext_fft = [b.Z1] * 2 * k
+    hext_fft = [curve.Z1] * 2 * k
     for i in range(l):
 
         toeplitz_coefficients = reduced_polynomial[- i - 1::l] + [0] * (k + 1) \
              + reduced_polynomial[2 * l - i - 1: - l - i:l]
 
         # Compute the vector h from the paper using a Toeplitz matric multiplication
-        hext_fft = [b.add(v, w) for v, w in zip(hext_fft, toeplitz_part2(toeplitz_coefficients, xext_fft[i]))]
+        hext_fft = [curve.add(v, w) for v, w in zip(hext_fft, toeplitz_part2(toeplitz_coefficients, xext_fft[i]))]
 
     # Final FFT done after summing all h vectors
     h = toeplitz_part3(hext_fft)
 
-    h = h + [b.Z1] * k
+    h = h + [curve.Z1] * k
 
     # The proofs are the DFT of the h vector
     return fft(h, MODULUS, get_root_of_unity(2 * k))
 
 
-def data_availabilty_using_fk20_multi(polynomial, l, setup):
+def data_availabilty_using_fk20_multi(polynomial, l, setup, context=None):
     """
     Computes all the KZG proofs for data availability checks. This involves sampling on the double domain
     and reordering according to reverse bit order
@@ -113,25 +122,104 @@ def data_availabilty_using_fk20_multi(polynomial, l, setup):
     n = len(polynomial)
     extended_polynomial = polynomial + [0] * n
 
-    all_proofs = fk20_multi_data_availability_optimized(extended_polynomial, l, setup)
+    all_proofs = fk20_multi_data_availability_optimized(extended_polynomial, l, setup, context)
 
     return list_to_reverse_bit_order(all_proofs)
 
 
+def data_availabilty_using_fk20_multi_batch(polynomials, l, setup, context=None, pool=None):
+    """
+    Computes all the KZG proofs for data availability checks for many polynomials (blobs) of the same size.
+    Returns the list of proofs (in reverse bit order) for each polynomial.
+
+    The Toeplitz products of all polynomials share the decoded precomputed setup: the work is split by coset
+    (computing the part of every polynomial's h vector that belongs to the coset) and then by polynomial (summing
+    the parts and computing the proofs). If `pool` (a multiprocessing.Pool) is given, both run in parallel.
+    """
+    if len(polynomials) == 0:
+        return []
+    n = len(polynomials[0])
+    assert all(len(polynomial) == n for polynomial in polynomials)
+    k = n // l
+    if context is None:
+        context = FK20Context(setup, n, l)
+    assert context.n == n and context.l == l
+
+    toeplitz_coefficients_by_coset = [[polynomial[- i - 1::l] + [0] * (k + 1) + polynomial[2 * l - i - 1: - l - i:l]
+                                       for polynomial in polynomials]
+                                      for i in range(l)]
+
+    if pool is None:
+        hext_fft_parts_by_coset = [toeplitz_part2_batch(list(xext_fft), toeplitz_coefficients)
+                                   for xext_fft, toeplitz_coefficients in zip(context.xext_fft, toeplitz_coefficients_by_coset)]
+        return [fk20_multi_proofs_from_parts([parts[j] for parts in hext_fft_parts_by_coset], k)
+                for j in range(len(polynomials))]
+
+    tasks = [(serialize_g1_points(xext_fft), toeplitz_coefficients)
+             for xext_fft, toeplitz_coefficients in zip(context.xext_fft, toeplitz_coefficients_by_coset)]
+    hext_fft_parts_by_coset = pool.starmap(toeplitz_part2_batch_serialized, tasks)
+
+    tasks = [([parts[j] for parts in hext_fft_parts_by_coset], k) for j in range(len(polynomials))]
+    return [deserialize_g1_points(proofs) for proofs in pool.starmap(fk20_multi_proofs_from_parts_serialized, tasks)]
+
+
+def toeplitz_part2_batch(xext_fft, toeplitz_coefficients_list):
+    """
+    Performs the second part of the Toeplitz matrix multiplication for many coefficient vectors with the same
+    precomputed xext_fft
+    """
+    return [toeplitz_part2(toeplitz_coefficients, xext_fft) for toeplitz_coefficients in toeplitz_coefficients_list]
+
+
+def fk20_multi_proofs_from_parts(hext_fft_parts, k):
+    """
+    Sums the hext_fft parts of all cosets and computes the data availability proofs (in reverse bit order) from them
+    """
+    hext_fft = hext_fft_parts[0]
+    for part in hext_fft_parts[1:]:
+        hext_fft = [curve.add(v, w) for v, w in zip(hext_fft, part)]
+
+    h = toeplitz_part3(hext_fft) + [curve.Z1] * k
+
+    # The proofs are the DFT of the h vector
+    return list_to_reverse_bit_order(fft(h, MODULUS, get_root_of_unity(2 * k)))
+
+
+# Versions of the above for worker processes, which pass G1 points in serialized form
+
+def toeplitz_part2_batch_serialized(xext_fft_serialized, toeplitz_coefficients_list):
+    return [serialize_g1_points(hext_fft)
+            for hext_fft in toeplitz_part2_batch(deserialize_g1_points(xext_fft_serialized), toeplitz_coefficients_list)]
+
+
+def fk20_multi_proofs_from_parts_serialized(hext_fft_parts_serialized, k):
+    return serialize_g1_points(fk20_multi_proofs_from_parts([deserialize_g1_points(x) for x in hext_fft_parts_serialized], k))
+
+
+def serialize_g1_points(points):
+    if isinstance(points, MappedG1Points):
+        return points.data[points.offset:points.offset + len(points) * G1_POINT_SIZE]
+    return b"".join(serialize_g1(point) for point in points)
+
+
+def deserialize_g1_points(data):
+    return [deserialize_g1(data[i:i + G1_POINT_SIZE]) for i in range(0, len(data), G1_POINT_SIZE)]
+
+
 def add_instrumentation():
     global multiplication_count
     
     multiplication_count = 0
 
     # Add counter to multiply function for statistics
-    b_multiply_ = b.multiply
+    curve_mul_ = curve.mul
     def multiply_and_count(*args):
         global multiplication_count
         multiplication_count += 1
 
-        return b_multiply_(*args)
+        return curve_mul_(*args)
 
-    b.multiply = multiply_and_count
+    curve.mul = multiply_and_count
 
 
 if __name__ == "__main__":
@@ -149,6 +237,23 @@ if __name__ == "__main__":
     print("Required {0} G1 multiplications".format(multiplication_count))
     print(n, l, multiplication_count)
 
+    # The same proofs using a precomputed context, stored to and memory-mapped from a file
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "fk20_context")
+        FK20Context(setup, n, l).save(filename)
+        context = FK20Context.load(filename, setup)
+        all_proofs_with_context = data_availabilty_using_fk20_multi(polynomial, l, setup, context)
+        assert all(curve.eq(p, q) for p, q in zip(all_proofs, all_proofs_with_context))
+        print("KZG proofs computed with stored FK20 context match")
+
+        # Proofs for several polynomials at once, in parallel
+        polynomials = [polynomial, polynomial[::-1]]
+        with Pool() as pool:
+            all_proofs_batch = data_availabilty_using_fk20_multi_batch(polynomials, l, setup, context, pool)
+        assert all(curve.eq(p, q) for p, q in zip(all_proofs, all_proofs_batch[0]))
+        assert all(curve.eq(p, q) for p, q in zip(data_availabilty_using_fk20_multi(polynomials[1], l, setup, context), all_proofs_batch[1]))
+        print("KZG proofs computed for {0} polynomials in batch match".format(len(polynomials)))
+
     # Now check all positions
     extended_data = get_extended_data(polynomial)
 
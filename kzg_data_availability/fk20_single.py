@@ -1,8 +1,9 @@
-from py_ecc import optimized_bls12_381 as b
+from curve_backend import get_backend
 from fft import fft
 import kzg_proofs
 from kzg_proofs import (
     MODULUS,
+    G1_POINT_SIZE,
     check_proof_single,
     generate_setup,
     commit_to_poly,
@@ -10,8 +11,16 @@ from kzg_proofs import (
     get_root_of_unity,
     reverse_bit_order,
     is_power_of_two,
-    eval_poly_at
+    eval_poly_at,
+    serialize_g1,
+    deserialize_g1,
+    hash_setup,
+    MappedG1Points
 )
+import mmap
+import os
+
+curve = get_backend()
 
 # FK20 Method to compute all proofs
 # Toeplitz multiplication via http://www.netlib.org/utk/people/JackDongarra/etemplates/node384.html
@@ -51,7 +60,7 @@ def toeplitz_part1(x):
     root_of_unity = get_root_of_unity(len(x) * 2)
     
     # Extend x with zeros (neutral element of G1)
-    xext = x + [b.Z1] * len(x)
+    xext = x + [curve.Z1] * len(x)
 
     xext_fft = fft(xext, MODULUS, root_of_unity, inv=False)
     
@@ -68,7 +77,7 @@ def toeplitz_part2(toeplitz_coefficients, xext_fft):
     root_of_unity = get_root_of_unity(len(xext_fft))
 
     toeplitz_coefficients_fft = fft(toeplitz_coefficients, MODULUS, root_of_unity, inv=False)
-    hext_fft = [b.multiply(v, w) for v, w in zip(xext_fft, toeplitz_coefficients_fft)]
+    hext_fft = [curve.mul(v, w) for v, w in zip(xext_fft, toeplitz_coefficients_fft)]
 
     return hext_fft
 
@@ -80,7 +89,88 @@ def toeplitz_part3(hext_fft):
     return fft(hext_fft, MODULUS, root_of_unity, inv=True)[:len(hext_fft) // 2]
 
 
-def fk20_single(polynomial, setup):
+# The precomputation toeplitz_part1 only depends on the setup, so it can be done once and stored
+#
+# File layout of a stored FK20Context:
+#   "FK20" | n (4 bytes) | l (4 bytes) | setup hash (32 bytes) | l vectors xext_fft[i] of 2n/l G1 points (96 bytes each)
+
+class FK20Context():
+    """
+    Precomputed setup for the FK20 method, for polynomials with n coefficients (after dropping the zero upper half
+    in the data availability versions) and proofs for cosets of size l (l = 1 for single proofs).
+    xext_fft[i] is the Fourier transform of the extended setup vector for the i-th Toeplitz matrix.
+    A context can be reused for any number of polynomials.
+    """
+
+    MAGIC = b"FK20"
+    HEADER_SIZE = 4 + 4 + 4 + 32
+
+    def __init__(self, setup, n, l=1, xext_fft=None, setup_hash=None):
+        assert is_power_of_two(n)
+        assert is_power_of_two(l)
+        assert n // l >= 1
+        self.n = n
+        self.l = l
+        self.setup_hash = setup_hash if setup_hash is not None else hash_setup(setup, n)
+        if xext_fft is None:
+            xext_fft = []
+            for i in range(l):
+                x = setup[0][n - l - 1 - i::-l] + [curve.Z1]
+                xext_fft.append(toeplitz_part1(x))
+        self.xext_fft = xext_fft
+
+
+    def save(self, filename):
+        """
+        Write the context to a file, together with the content hash of the setup
+        """
+        with open(filename, "wb") as f:
+            f.write(self.MAGIC + self.n.to_bytes(4, "little") + self.l.to_bytes(4, "little") + self.setup_hash)
+            for xext_fft in self.xext_fft:
+                f.write(b"".join(serialize_g1(point) for point in xext_fft))
+
+
+    @classmethod
+    def load(cls, filename, setup=None):
+        """
+        Load a context from a file. The file is memory-mapped, and the points are only decoded when they are used.
+        If `setup` is given, raises a ValueError if the context was computed for a different setup
+        """
+        with open(filename, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if data[:4] != cls.MAGIC:
+            raise ValueError("Not an FK20 context file")
+        n = int.from_bytes(data[4:8], "little")
+        l = int.from_bytes(data[8:12], "little")
+        setup_hash = data[12:cls.HEADER_SIZE]
+        if setup is not None and setup_hash != hash_setup(setup, n):
+            raise ValueError("FK20 context was computed for a different setup")
+        vector_size = 2 * n // l * G1_POINT_SIZE
+        if len(data) != cls.HEADER_SIZE + l * vector_size:
+            raise ValueError("Truncated FK20 context file")
+        xext_fft = [MappedG1Points(data, cls.HEADER_SIZE + i * vector_size, 2 * n // l) for i in range(l)]
+        return cls(None, n, l, xext_fft, setup_hash)
+
+
+    @classmethod
+    def load_or_compute(cls, filename, setup, n, l=1):
+        """
+        Load the context for (setup, n, l) from `filename`, or compute it and store it there if the file does not
+        exist or belongs to a different setup or parameters
+        """
+        if os.path.exists(filename):
+            try:
+                context = cls.load(filename, setup)
+                if context.n == n and context.l == l:
+                    return context
+            except ValueError:
+                pass
+        context = cls(setup, n, l)
+        context.save(filename)
+        return context
+
+
+def fk20_single(polynomial, setup, context=None):
     """
     Compute all n (single) proofs according to FK20 method
     """
@@ -88,8 +178,10 @@ def fk20_single(polynomial, setup):
     assert is_power_of_two(len(polynomial))
     n = len(polynomial)
     
-    x = setup[0][n - 2::-1] + [b.Z1]
-    xext_fft = toeplitz_part1(x)
+    if context is None:
+        context = FK20Context(setup, n)
+    assert context.n == n and context.l == 1
+    xext_fft = context.xext_fft[0]
     
     toeplitz_coefficients = polynomial[-1::] + [0] * (n + 1) + polynomial[1:-1]
 
@@ -101,7 +193,7 @@ def fk20_single(polynomial, setup):
 
 
 # Compute all n (single) proofs according to FK20 method
-def fk20_single_data_availability_optimized(polynomial, setup):
+def fk20_single_data_availability_optimized(polynomial, setup, context=None):
     """
     Special version of the FK20 for the situation of data availability checks:
     The upper half of the polynomial coefficients is always 0, so we do not need to extend to twice the size
@@ -116,21 +208,23 @@ def fk20_single_data_availability_optimized(polynomial, setup):
     
     # Preprocessing part -- this is independent from the polynomial coefficients and can be
     # done before the polynomial is known, it only needs to be computed once
-    x = setup[0][n - 2::-1] + [b.Z1]
-    xext_fft = toeplitz_part1(x)
+    if context is None:
+        context = FK20Context(setup, n)
+    assert context.n == n and context.l == 1
+    xext_fft = context.xext_fft[0]
     
     toeplitz_coefficients = reduced_polynomial[-1::] + [0] * (n + 1) + reduced_polynomial[1:-1]
 
     # Compute the vector h from the paper using a Toeplitz matric multiplication
     h = toeplitz_part3(toeplitz_part2(toeplitz_coefficients, xext_fft))
     
-    h = h + [b.Z1] * n
+    h = h + [curve.Z1] * n
 
     # The proofs are the DFT of the h vector
     return fft(h, MODULUS, get_root_of_unity(2 * n))
 
 
-def data_availabilty_using_fk20(polynomial, setup):
+def data_availabilty_using_fk20(polynomial, setup, context=None):
     """
     Computes all the KZG proofs for data availability checks. This involves sampling on the double domain
     and reordering according to reverse bit order
@@ -139,7 +233,7 @@ def data_availabilty_using_fk20(polynomial, setup):
     n = len(polynomial)
     extended_polynomial = polynomial + [0] * n
 
-    all_proofs = fk20_single_data_availability_optimized(extended_polynomial, setup)
+    all_proofs = fk20_single_data_availability_optimized(extended_polynomial, setup, context)
 
     return list_to_reverse_bit_order(all_proofs)
 
@@ -1,10 +1,12 @@
-from py_ecc import optimized_bls12_381 as b
+from curve_backend import get_backend, get_number_of_windows, signed_digits
 from fft import fft
-from multicombs import lincomb
+import hashlib
+
+curve = get_backend()
 
 # Generatore for the field
 PRIMITIVE_ROOT = 5
-MODULUS = b.curve_order
+MODULUS = curve.curve_order
 
 assert pow(PRIMITIVE_ROOT, (MODULUS - 1) // 2, MODULUS) != 1
 assert pow(PRIMITIVE_ROOT, MODULUS - 1, MODULUS) == 1
@@ -25,10 +27,72 @@ def generate_setup(s, size):
     # For data availability we always need to compute the polynomials anyway, so it makes little sense to do things in Lagrange space
     """
     return (
-        [b.multiply(b.G1, pow(s, i, MODULUS)) for i in range(size + 1)],
-        [b.multiply(b.G2, pow(s, i, MODULUS)) for i in range(size + 1)],
+        [curve.mul(curve.G1, pow(s, i, MODULUS)) for i in range(size + 1)],
+        [curve.mul(curve.G2, pow(s, i, MODULUS)) for i in range(size + 1)],
     )
 
+#########################################################################################
+#
+# Serialization of G1 points
+#
+#########################################################################################
+
+# Uncompressed affine encoding: x and y as 48 byte big endian integers. The point at infinity
+# is encoded as x = y = 0, which is not on the curve
+G1_POINT_SIZE = 96
+
+def serialize_g1(point):
+    """
+    Serialize a G1 point (in any coordinates) to its uncompressed affine encoding
+    """
+    if curve.is_inf(point):
+        return bytes(G1_POINT_SIZE)
+    x, y = curve.to_affine(point)
+    return x.to_bytes(48, "big") + y.to_bytes(48, "big")
+
+def deserialize_g1(data):
+    """
+    Deserialize a G1 point from its uncompressed affine encoding. Raises a ValueError if the point is not on the
+    curve (curve.from_affine checks the curve equation); subgroup membership is not checked
+    """
+    x = int.from_bytes(data[:48], "big")
+    y = int.from_bytes(data[48:G1_POINT_SIZE], "big")
+    if x == 0 and y == 0:
+        return curve.Z1
+    return curve.from_affine(x, y)
+
+def hash_setup(setup, size):
+    """
+    Content hash of the first `size` G1 points of a setup, used to check that precomputed data belongs to the setup
+    """
+    return hashlib.sha256(b"".join(serialize_g1(point) for point in setup[0][:size])).digest()
+
+class MappedG1Points():
+    """
+    Read-only sequence of `length` G1 points stored in a memory-mapped buffer at `offset`, decoded on access.
+    Every access goes through deserialize_g1, so it costs a check of the curve equation
+    """
+
+    def __init__(self, data, offset, length):
+        self.data = data
+        self.offset = offset
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.length))]
+        if not 0 <= i < self.length:
+            raise IndexError(i)
+        position = self.offset + i * G1_POINT_SIZE
+        return deserialize_g1(self.data[position:position + G1_POINT_SIZE])
+
+    def __iter__(self):
+        for i in range(self.length):
+            yield self[i]
+
 #########################################################################################
 #
 # Field operations
@@ -95,6 +159,18 @@ def div_polys(a, b):
         diff -= 1
     return [x % MODULUS for x in o]
 
+def div_polys_by_binomial(a, n, c):
+    """
+    Divide polynomial a (coefficient form) by X^n - c. Returns the quotient and the remainder, which has n coefficients.
+    Linear in the size of a, unlike div_polys
+    """
+    if len(a) <= n:
+        return [], [x % MODULUS for x in a] + [0] * (n - len(a))
+    a = [x % MODULUS for x in a]
+    for i in range(len(a) - 1, n - 1, -1):
+        a[i - n] = (a[i - n] + c * a[i]) % MODULUS
+    return a[n:], a[:n]
+
 #########################################################################################
 #
 # Utils for reverse bit order
@@ -160,14 +236,14 @@ def commit_to_poly(polynomial, setup):
     """
     Kate commitment to polynomial in coefficient form
     """
-    return lincomb(setup[0][:len(polynomial)], polynomial, b.add, b.Z1)
+    return curve.msm(setup[0][:len(polynomial)], polynomial)
 
 def compute_proof_single(polynomial, x, setup):
     """
     Compute Kate proof for polynomial in coefficient form at position x
     """
-    quotient_polynomial = div_polys(polynomial, [-x, 1])
-    return lincomb(setup[0][:len(quotient_polynomial)], quotient_polynomial, b.add, b.Z1)
+    quotient_polynomial, _ = div_polys_by_binomial(polynomial, 1, x)
+    return curve.msm(setup[0][:len(quotient_polynomial)], quotient_polynomial)
 
 def check_proof_single(commitment, proof, x, y, setup):
     """
@@ -180,14 +256,86 @@ def check_proof_single(commitment, proof, x, y, setup):
     # e([commitment - y]^(-1), [1]) * e([proof],  [s - x]) = 1_T
     #
 
-    s_minus_x = b.add(setup[1][1], b.multiply(b.neg(b.G2), x))
-    commitment_minus_y = b.add(commitment, b.multiply(b.neg(b.G1), y))
+    s_minus_x = curve.add(setup[1][1], curve.mul(curve.neg(curve.G2), x))
+    commitment_minus_y = curve.add(commitment, curve.mul(curve.neg(curve.G1), y))
+
+    return curve.pairing_check([(curve.neg(commitment_minus_y), curve.G2), (proof, s_minus_x)])
+
+#########################################################################################
+#
+# Kate single proofs at many points
+#
+#########################################################################################
 
-    pairing_check = b.pairing(b.G2, b.neg(commitment_minus_y), False)
-    pairing_check *= b.pairing(s_minus_x, proof, False)
-    pairing = b.final_exponentiate(pairing_check)
+# The proofs for k points at which the same polynomial (with n coefficients) is opened are k linear combinations
+# of the same n - 1 setup points. A FixedBaseMSM precomputes 2^(c*t) * point for every setup point and window t,
+# so that each linear combination is a single pass of bucket accumulation over all windows: the doublings and the
+# per-window bucket aggregation of Pippenger's method are done once in the precomputation and shared by all openings
+# (the factors are split into the same signed digits as in curve_backend.pippenger)
 
-    return pairing == b.FQ12.one()
+class FixedBaseMSM():
+    """
+    Linear combinations of a fixed list of G1 points (usually a prefix of the setup) with arbitrary factors.
+    The precomputation costs about 255 doublings and stores 256 / window_bits points per base point
+    """
+
+    def __init__(self, points, window_bits=None):
+        n = len(points)
+        if window_bits is None:
+            # Cost of one linear combination: one addition per base point and window, and the bucket aggregation
+            window_bits = min(range(2, 17), key=lambda c: n * get_number_of_windows(MODULUS.bit_length(), c) + (1 << c))
+        self.window_bits = window_bits
+        self.number_of_windows = get_number_of_windows(MODULUS.bit_length(), window_bits)
+        self.tables = [list(points)]
+        for t in range(1, self.number_of_windows):
+            row = []
+            for point in self.tables[-1]:
+                for i in range(window_bits):
+                    point = curve.double(point)
+                row.append(point)
+            self.tables.append(row)
+
+    def __len__(self):
+        return len(self.tables[0])
+
+    def lincomb(self, factors):
+        """
+        Compute sum factors[i] * points[i]. There can be fewer factors than points
+        """
+        assert len(factors) <= len(self)
+        buckets = [None] * ((1 << (self.window_bits - 1)) + 1)
+        for j, factor in enumerate(factors):
+            for row, digit in zip(self.tables, signed_digits(factor % MODULUS, self.window_bits, self.number_of_windows)):
+                if digit == 0:
+                    continue
+                point = row[j] if digit > 0 else curve.neg(row[j])
+                digit = abs(digit)
+                buckets[digit] = point if buckets[digit] is None else curve.add(buckets[digit], point)
+
+        # sum digit * buckets[digit], using running sums
+        running_sum = curve.Z1
+        result = curve.Z1
+        for bucket in buckets[:0:-1]:
+            if bucket is not None:
+                running_sum = curve.add(running_sum, bucket)
+            result = curve.add(result, running_sum)
+        return result
+
+def compute_proof_single_batch(polynomial, xs, setup, msm=None):
+    """
+    Compute Kate proofs for polynomial in coefficient form at all positions in xs. Returns the evaluations and the proofs.
+    `msm` is a FixedBaseMSM of the first len(polynomial) - 1 setup points; the precomputation pays off after a few
+    openings, so when serving openings of many polynomials, it should be created once and passed in
+    """
+    if msm is None:
+        msm = FixedBaseMSM(setup[0][:len(polynomial) - 1])
+    ys = []
+    proofs = []
+    for x in xs:
+        quotient_polynomial, remainder = div_polys_by_binomial(polynomial, 1, x)
+        ys.append(remainder[0])
+        proofs.append(msm.lincomb(quotient_polynomial))
+    return ys, proofs
 
 #########################################################################################
 #
@@ -201,8 +349,8 @@ def compute_proof_multi(polynomial, x, n, setup):
     an n-th root of unity (this is the proof for one data availability sample, which consists
     of several polynomial evaluations)
     """
-    quotient_polynomial = div_polys(polynomial, [-pow(x, n, MODULUS)] + [0] * (n - 1) + [1])
-    return lincomb(setup[0][:len(quotient_polynomial)], quotient_polynomial, b.add, b.Z1)
+    quotient_polynomial, _ = div_polys_by_binomial(polynomial, n, pow(x, n, MODULUS))
+    return curve.msm(setup[0][:len(quotient_polynomial)], quotient_polynomial)
 
 def check_proof_multi(commitment, proof, x, ys, setup):
     """
@@ -223,13 +371,10 @@ def check_proof_multi(commitment, proof, x, ys, setup):
     # e([commitment - interpolation_polynomial]^(-1), [1]) * e([proof],  [s^n - x^n]) = 1_T
     #
 
-    xn_minus_yn = b.add(setup[1][n], b.multiply(b.neg(b.G2), pow(x, n, MODULUS)))
-    commitment_minus_interpolation = b.add(commitment, b.neg(lincomb(
-        setup[0][:len(interpolation_polynomial)], interpolation_polynomial, b.add, b.Z1)))
-    pairing_check = b.pairing(b.G2, b.neg(commitment_minus_interpolation), False)
-    pairing_check *= b.pairing(xn_minus_yn, proof, False)
-    pairing = b.final_exponentiate(pairing_check)
-    return pairing == b.FQ12.one()
+    xn_minus_yn = curve.add(setup[1][n], curve.mul(curve.neg(curve.G2), pow(x, n, MODULUS)))
+    commitment_minus_interpolation = curve.add(commitment, curve.neg(curve.msm(
+        setup[0][:len(interpolation_polynomial)], interpolation_polynomial)))
+    return curve.pairing_check([(curve.neg(commitment_minus_interpolation), curve.G2), (proof, xn_minus_yn)])
 
 if __name__ == "__main__":
     polynomial = [1, 2, 3, 4, 7, 7, 7, 7, 13, 13, 13, 13, 13, 13, 13, 13]
@@ -249,4 +394,12 @@ if __name__ == "__main__":
     ys = [eval_poly_at(polynomial, z) for z in coset]
     proof = compute_proof_multi(polynomial, x, 8, setup)
     assert check_proof_multi(commitment, proof, x, ys, setup)
-    print("Coset check passed")
\ No newline at end of file
+    print("Coset check passed")
+
+    xs = [17, 5431, 123456789, MODULUS - 1]
+    ys, proofs = compute_proof_single_batch(polynomial, xs, setup)
+    for x, y, proof in zip(xs, ys, proofs):
+        assert y == eval_poly_at(polynomial, x)
+        assert curve.eq(proof, compute_proof_single(polynomial, x, setup))
+        assert check_proof_single(commitment, proof, x, y, setup)
+    print("Batch single point check passed")
\ No newline at end of file
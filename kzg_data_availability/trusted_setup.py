@@ -0,0 +1,183 @@
+from curve_backend import get_backend
+from concurrent.futures import ThreadPoolExecutor
+from fft import fft
+from kzg_proofs import (
+    MODULUS,
+    G1_POINT_SIZE,
+    generate_setup,
+    get_root_of_unity,
+    is_power_of_two,
+    serialize_g1,
+    hash_setup,
+    MappedG1Points
+)
+import kzg_setup
+import mmap
+import os
+
+curve = get_backend()
+
+#
+# Loading, verifying and caching trusted setups
+#
+# A setup is the pair ([s^i]_1 for i = 0..n, [s^i]_2 for i = 0..m) as returned by kzg_proofs.generate_setup.
+# The file format and the verification are in kzg_setup.py in the repository root, which verkle_trie uses too.
+# Loading only decompresses; the subgroup checks and the pairing checks that the points really are successive
+# powers of the same secret are done by verify_setup, which can be run later or in a background thread.
+#
+# The Lagrange form of the setup ([L_i(s)]_1 for the Lagrange polynomials L_i of the n-th roots of unity) is
+# derived with a group FFT, which is the slowest part of a cold start. It is cached in a directory, in a file named
+# after the content hash of the setup, and memory-mapped when loaded.
+#
+
+LAGRANGE_MAGIC = b"KZGL"
+LAGRANGE_HEADER_SIZE = 4 + 4 + 32
+
+# Thread used by verify_setup_in_background
+_verification_executor = ThreadPoolExecutor(max_workers=1)
+
+
+def save_setup(setup, filename):
+    """
+    Write a setup to a file in compressed form
+    """
+    kzg_setup.save_setup(curve, setup[0], setup[1], filename)
+
+
+def load_setup(filename, verify=True):
+    """
+    Load a setup written by save_setup. Decompression checks that all points are on the curve. If `verify` is
+    True, the setup is also checked with verify_setup (which includes the subgroup checks), and a ValueError is
+    raised if it is not a valid setup
+    """
+    setup = kzg_setup.load_setup(curve, filename)
+    if verify and not verify_setup(setup):
+        raise ValueError("Invalid trusted setup")
+    return setup
+
+
+def verify_setup(setup):
+    """
+    Check that setup[0] and setup[1] are successive powers of the same secret, starting with the generators, and
+    that all points are in the subgroup of order curve_order (see kzg_setup.verify_setup)
+    """
+    return kzg_setup.verify_setup(curve, setup[0], setup[1])
+
+
+def verify_setup_in_background(setup):
+    """
+    Run verify_setup in a background thread. Returns a concurrent.futures.Future for the result, so that the setup
+    can be used right away and the verification checked before anything derived from it is published
+    """
+    return _verification_executor.submit(verify_setup, setup)
+
+
+def compute_lagrange_setup(setup, n):
+    """
+    Compute the Lagrange form [L_i(s)]_1 of the setup for the n-th roots of unity, using an inverse group FFT
+    """
+    assert is_power_of_two(n)
+    assert len(setup[0]) >= n
+    return fft(list(setup[0][:n]), MODULUS, get_root_of_unity(n), inv=True)
+
+
+def get_lagrange_setup(setup, n, cache_directory=None, setup_hash=None):
+    """
+    Lagrange form of the setup for the n-th roots of unity. If `cache_directory` is given, the result is cached
+    there in a file named after the content hash of the setup: a cached file is memory-mapped and returned as a
+    MappedG1Points, otherwise the Lagrange form is computed and stored
+    """
+    if cache_directory is None:
+        return compute_lagrange_setup(setup, n)
+
+    if setup_hash is None:
+        setup_hash = hash_setup(setup, n)
+    filename = os.path.join(cache_directory, "lagrange_{0}_{1}.bin".format(n, setup_hash.hex()))
+
+    if os.path.exists(filename):
+        with open(filename, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if (data[:4] == LAGRANGE_MAGIC and int.from_bytes(data[4:8], "little") == n
+                and data[8:LAGRANGE_HEADER_SIZE] == setup_hash
+                and len(data) == LAGRANGE_HEADER_SIZE + n * G1_POINT_SIZE):
+            return MappedG1Points(data, LAGRANGE_HEADER_SIZE, n)
+
+    g1_lagrange = compute_lagrange_setup(setup, n)
+
+    # Write to a temporary file first, so that a process that is stopped while writing never leaves a truncated
+    # cache file behind
+    os.makedirs(cache_directory, exist_ok=True)
+    temporary_filename = "{0}.{1}.tmp".format(filename, os.getpid())
+    with open(temporary_filename, "wb") as f:
+        f.write(LAGRANGE_MAGIC + n.to_bytes(4, "little") + setup_hash)
+        f.write(b"".join(serialize_g1(point) for point in g1_lagrange))
+    os.replace(temporary_filename, filename)
+    return g1_lagrange
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+    from kzg_proofs import commit_to_poly
+
+    n = 16
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "setup.bin")
+
+        time_a = time.time()
+        setup = generate_setup(1927409816240961209460912649124, n)
+        save_setup(setup, filename)
+        time_b = time.time()
+        print("Generated and saved setup in {0:.3f} s".format(time_b - time_a))
+
+        time_a = time.time()
+        loaded_setup = load_setup(filename, verify=False)
+        verification = verify_setup_in_background(loaded_setup)
+        time_b = time.time()
+        print("Loaded setup in {0:.3f} s".format(time_b - time_a))
+        assert all(curve.eq(x, y) for x, y in zip(loaded_setup[0], setup[0]))
+        assert all(curve.eq(x, y) for x, y in zip(loaded_setup[1], setup[1]))
+
+        time_a = time.time()
+        g1_lagrange = get_lagrange_setup(loaded_setup, n, directory)
+        time_b = time.time()
+        g1_lagrange_cached = get_lagrange_setup(loaded_setup, n, directory)
+        time_c = time.time()
+        assert isinstance(g1_lagrange_cached, MappedG1Points)
+        assert all(curve.eq(x, y) for x, y in zip(g1_lagrange, g1_lagrange_cached))
+        print("Computed Lagrange setup in {0:.3f} s, loaded it from the cache in {1:.3f} s".format(time_b - time_a, time_c - time_b))
+
+        # A commitment in Lagrange form (to the evaluations in natural order) is the same as in coefficient form
+        polynomial = [1, 2, 3, 4, 7, 7, 7, 7, 13, 13, 13, 13, 13, 13, 13, 13]
+        evaluations = fft(polynomial, MODULUS, get_root_of_unity(n))
+        assert curve.eq(curve.msm(g1_lagrange_cached[:n], evaluations), commit_to_poly(polynomial, loaded_setup))
+        print("Lagrange commitment check passed")
+
+        assert verification.result()
+        print("Setup verification passed")
+
+        invalid_setup = (loaded_setup[0][:3] + [curve.add(loaded_setup[0][3], curve.G1)] + loaded_setup[0][4:], loaded_setup[1])
+        assert not verify_setup(invalid_setup)
+        print("Invalid setup check passed")
+
+        # A point of small order added to the setup is invisible to the pairing checks, but fails the subgroup check.
+        # It is r * P for a point P on the curve outside the subgroup, computed without reducing r
+        x = 1
+        while True:
+            x += 1
+            y = pow(x ** 3 + 4, (curve.field_modulus + 1) // 4, curve.field_modulus)
+            if y * y % curve.field_modulus == (x ** 3 + 4) % curve.field_modulus:
+                point = curve.from_affine(x, y)
+                if not curve.in_group(point):
+                    break
+        small_order_point = curve.Z1
+        for bit in bin(curve.curve_order)[2:]:
+            small_order_point = curve.double(small_order_point)
+            if bit == "1":
+                small_order_point = curve.add(small_order_point, point)
+        assert not curve.is_inf(small_order_point)
+        g1_setup = list(loaded_setup[0])
+        g1_setup[3] = curve.add(g1_setup[3], small_order_point)
+        assert not verify_setup((g1_setup, loaded_setup[1]))
+        print("Setup with a point outside the subgroup rejected")
@@ -0,0 +1,83 @@
+import secrets
+
+#
+# Trusted setup files and their verification, shared by kzg_data_availability and verkle_trie (run their scripts
+# with the repository root on the path, see curve_backend.py). All functions take the curve backend to use.
+#
+# A setup is a pair of lists ([s^i]_1 for i = 0..n, [s^i]_2 for i = 0..m). Generating it requires the secret and a
+# scalar multiplication per point, so a setup is normally computed once (or taken from a ceremony) and stored in
+# compressed form:
+#
+#   "KZGS" | number of G1 points (4 bytes) | number of G2 points (4 bytes) | G1 points (48 bytes each) |
+#   G2 points (96 bytes each)
+#
+# Points are compressed as in the ZCash BLS12-381 serialization, which is also what the Ethereum KZG ceremony
+# publishes. Loading only decompresses; the subgroup checks and the pairing checks that the points really are
+# successive powers of the same secret are done by verify_setup.
+#
+
+SETUP_MAGIC = b"KZGS"
+SETUP_HEADER_SIZE = 4 + 4 + 4
+
+G1_COMPRESSED_SIZE = 48
+G2_COMPRESSED_SIZE = 96
+
+
+def save_setup(backend, g1_setup, g2_setup, filename):
+    """
+    Write a setup to a file in compressed form
+    """
+    with open(filename, "wb") as f:
+        f.write(SETUP_MAGIC + len(g1_setup).to_bytes(4, "little") + len(g2_setup).to_bytes(4, "little"))
+        f.write(b"".join(backend.serialize_g1(point) for point in g1_setup))
+        f.write(b"".join(backend.serialize_g2(point) for point in g2_setup))
+
+
+def load_setup(backend, filename):
+    """
+    Read the G1 and G2 points of a setup written by save_setup. Decompression checks that all points are on the
+    curve; raises a ValueError if the file is not a setup file or contains invalid points
+    """
+    with open(filename, "rb") as f:
+        data = f.read()
+    if data[:4] != SETUP_MAGIC:
+        raise ValueError("Not a trusted setup file")
+    g1_length = int.from_bytes(data[4:8], "little")
+    g2_length = int.from_bytes(data[8:12], "little")
+    if len(data) != SETUP_HEADER_SIZE + g1_length * G1_COMPRESSED_SIZE + g2_length * G2_COMPRESSED_SIZE:
+        raise ValueError("Truncated trusted setup file")
+
+    g2_start = SETUP_HEADER_SIZE + g1_length * G1_COMPRESSED_SIZE
+    g1_setup = [backend.deserialize_g1(data[i:i + G1_COMPRESSED_SIZE])
+                for i in range(SETUP_HEADER_SIZE, g2_start, G1_COMPRESSED_SIZE)]
+    g2_setup = [backend.deserialize_g2(data[i:i + G2_COMPRESSED_SIZE])
+                for i in range(g2_start, len(data), G2_COMPRESSED_SIZE)]
+    return g1_setup, g2_setup
+
+
+def verify_setup(backend, g1_setup, g2_setup):
+    """
+    Check that g1_setup and g2_setup are successive powers of the same secret, starting with the generators.
+    The pairing equations
+        e([s^(i+1)]_1, [1]_2) = e([s^i]_1, [s]_2)    and    e([s]_1, [s^i]_2) = e([1]_1, [s^(i+1)]_2)
+    are checked together using a random linear combination, so this only costs four pairings. The pairing
+    equations say nothing about components of small order, so every point is also checked to be in the subgroup
+    of order curve_order
+    """
+    if len(g1_setup) < 2 or len(g2_setup) < 2:
+        return False
+    if not backend.eq(g1_setup[0], backend.G1) or not backend.eq(g2_setup[0], backend.G2):
+        return False
+    if not all(backend.in_group(point) for point in g1_setup) or not all(backend.in_group(point) for point in g2_setup):
+        return False
+
+    r = [secrets.randbits(128) for i in range(len(g1_setup) - 1)]
+    g1_shifted = backend.msm(g1_setup[1:], r)
+    g1_combined = backend.msm(g1_setup[:-1], r)
+    if not backend.pairing_check([(backend.neg(g1_shifted), g2_setup[0]), (g1_combined, g2_setup[1])]):
+        return False
+
+    r = [secrets.randbits(128) for i in range(len(g2_setup) - 1)]
+    g2_shifted = backend.msm(g2_setup[1:], r)
+    g2_combined = backend.msm(g2_setup[:-1], r)
+    return backend.pairing_check([(backend.neg(g1_setup[1]), g2_combined), (g1_setup[0], g2_shifted)])
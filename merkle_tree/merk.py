@@ -1,4 +1,5 @@
 from hashlib import sha256
+from generalized_indices import get_helper_indices
 def hash(x): return sha256(x).digest()
 
 def merkle_tree(leaves):
@@ -10,28 +11,9 @@ def merkle_tree(leaves):
 def log2(x):
     return 0 if x == 1 else 1 + log2(x//2)
 
+# Indices of the nodes of a multi proof for the leaves at positions `tree_indices` of a tree of depth `depth`
 def get_proof_indices(tree_indices, depth):
-    leaf_count = 2**depth
-    # Get all indices touched by the proof
-    maximal_indices = set({})
-    for i in tree_indices:
-        x = leaf_count + i 
-        while x > 1:
-            maximal_indices.add(x ^ 1)
-            x //= 2 
-    maximal_indices = [leaf_count + i for i in tree_indices] + sorted(list(maximal_indices))[::-1]
-    # Get indices that cannot be recalculated from earlier indices
-    redundant_indices = set({})
-    proof = []
-    for index in maximal_indices:
-        if index not in redundant_indices:
-            proof.append(index)
-            while index > 1:
-                redundant_indices.add(index)
-                if (index ^ 1) not in redundant_indices:
-                    break
-                index //= 2 
-    return [i for i in proof if i-leaf_count not in tree_indices]
+    return get_helper_indices([2**depth + i for i in tree_indices])
 
 def mk_multi_proof(tree, indices):
     return [tree[i] for i in get_proof_indices(indices, log2(len(tree) // 2))]
@@ -1,4 +1,4 @@
-from permuted_tree import merkelize, mk_branch, verify_branch, mk_multi_branch, verify_multi_branch
+from merkle_tree import merkelize, mk_multi_branch, verify_multi_branch, blake
 from utils import get_power_cycle, get_pseudorandom_indices
 from poly_utils import PrimeField
 
@@ -8,56 +8,147 @@ from poly_utils import PrimeField
 #
 # We use maxdeg+1 instead of maxdeg because it's more mathematically
 # convenient in this case.
-
-def prove_low_degree(values, root_of_unity, maxdeg_plus_1, modulus, exclude_multiples_of=0):
+#
+# Every round folds the polynomial by a factor `arity` (2, 4, 8 or 16):
+# writing P(x) = sum P_r(x**arity) * x**r for r < arity, the next layer is
+# P'(y) = sum P_r(y) * special_x**r on the domain of y = x**arity. The
+# values of P' are computed directly from the values of P: for the arity
+# points x_j with x_j**arity = y, P'(y) is the evaluation at special_x of
+# the polynomial of degree < arity through the points (x_j, P(x_j)),
+# which in barycentric form is
+#
+#   (y - special_x**arity) / (arity * y) * sum P(x_j) * x_j / (x_j - special_x)
+#
+# The points x_j are the positions i, i + n/arity, i + 2n/arity, ... of a
+# layer of size n, so their values are packed into one Merkle leaf (see
+# merkelize_layer). Each query then opens one leaf per layer: the leaf of
+# row i in one layer is checked against the value at position i of the
+# next layer.
+#
+# `values` can be any sequence of ints, and `tree` its layer Merkle tree
+# if it has already been computed (a list from merkelize_layer, or
+# anything that can be indexed like one)
+
+# Position of value `position` in the packed leaves of a layer of `length` values
+def get_packed_position(position, length, arity):
+    rows = length // arity
+    return (position % rows) * arity + position // rows
+
+# Leaves of the Merkle tree of a layer: leaf i contains the values at
+# positions i, i + n/arity, i + 2n/arity, ... as 32-byte big-endian values
+def pack_layer(values, arity):
+    rows = len(values) // arity
+    return [b''.join(values[i + rows * j].to_bytes(32, 'big') for j in range(arity)) for i in range(rows)]
+
+def merkelize_layer(values, arity):
+    return merkelize(pack_layer(values, arity))
+
+def unpack_leaf(leaf):
+    return [int.from_bytes(leaf[i: i+32], 'big') for i in range(0, len(leaf), 32)]
+
+# Number of rows of a layer folded at once
+ROW_CHUNK_SIZE = 2**14
+
+# Computes the next layer of the FRI, in evaluation form. The rows are
+# folded chunk by chunk, so that only the x coordinates, inverses and
+# values of one chunk are held at a time
+def fold_layer(values, root_of_unity, arity, special_x, f):
+    modulus = f.modulus
+    length = len(values)
+    rows = length // arity
+    assert f.exp(root_of_unity, length) == 1 and f.exp(root_of_unity, length // 2) != 1
+    # The points of row i are x_i * root_of_unity_of_arity**j for x_i = root_of_unity**i
+    root_of_unity_of_arity = f.exp(root_of_unity, rows)
+    powers_of_root_of_unity_of_arity = [f.exp(root_of_unity_of_arity, j) for j in range(arity)]
+    root_to_the_arity = f.exp(root_of_unity, arity)
+    special_x_to_the_arity = f.exp(special_x, arity)
+    folded = []
+    x, y = 1, 1
+    for start in range(0, rows, ROW_CHUNK_SIZE):
+        chunk_rows = range(start, min(start + ROW_CHUNK_SIZE, rows))
+        xs, ys = [], []
+        for i in chunk_rows:
+            xs.append(x)
+            ys.append(y)
+            x = x * root_of_unity % modulus
+            y = y * root_to_the_arity % modulus
+        points = [[x_i * w % modulus for x_i in xs] for w in powers_of_root_of_unity_of_arity]
+        # 1 / (x_ij - special_x) for all points, and 1 / (arity * y_i) for all rows
+        inverses = f.multi_inv([x_ij - special_x for column in points for x_ij in column] + [arity * y_i for y_i in ys])
+        assert all(inverses)
+        count = len(xs)
+        for k, i in enumerate(chunk_rows):
+            total = sum(values[i + rows * j] * points[j][k] * inverses[j * count + k] for j in range(arity))
+            folded.append((ys[k] - special_x_to_the_arity) * inverses[arity * count + k] * total % modulus)
+    return folded
+
+# Evaluates the folded value for a single row, given the values in its leaf
+def fold_row(row_values, x, root_of_unity_of_arity, special_x, f):
+    modulus = f.modulus
+    arity = len(row_values)
+    x_j = [x]
+    for j in range(1, arity):
+        x_j.append(x_j[-1] * root_of_unity_of_arity % modulus)
+    y = f.exp(x, arity)
+    # 1 / (x_j - special_x) for all points, and 1 / (arity * y)
+    inverses = f.multi_inv([xj - special_x for xj in x_j] + [arity * y])
+    total = sum(v * xj * inverse for v, xj, inverse in zip(row_values, x_j, inverses))
+    return (y - f.exp(special_x, arity)) * inverses[-1] * total % modulus
+
+# Pseudo-random positions in the first layer to query, derived from all layer roots and the final layer
+def get_query_positions(roots, final_values, length, queries, exclude_multiples_of):
+    seed = blake(b''.join(roots) + b''.join(final_values))
+    return get_pseudorandom_indices(seed, length, queries, exclude_multiples_of=exclude_multiples_of)
+
+def prove_low_degree(values, root_of_unity, maxdeg_plus_1, modulus, exclude_multiples_of=0, tree=None,
+                     arity=4, queries=40):
     f = PrimeField(modulus)
+    assert arity in (2, 4, 8, 16)
     print('Proving %d values are degree <= %d' % (len(values), maxdeg_plus_1))
 
-    # If the degree we are checking for is less than or equal to 32,
-    # use the polynomial directly as a proof
-    if maxdeg_plus_1 <= 16:
-        print('Produced FRI proof')
-        return [[x.to_bytes(32, 'big') for x in values]]
-
-    # Calculate the set of x coordinates
-    xs = get_power_cycle(root_of_unity, modulus)
-    assert len(values) == len(xs)
-
-    # Put the values into a Merkle tree. This is the root that the
-    # proof will be checked against
-    m = merkelize(values)
-
-    # Select a pseudo-random x coordinate
-    special_x = int.from_bytes(m[1], 'big') % modulus
-
-    # Calculate the "column" at that x coordinate
-    # (see https://vitalik.ca/general/2017/11/22/starks_part_2.html)
-    # We calculate the column by Lagrange-interpolating each row, and not
-    # directly from the polynomial, as this is more efficient
-    quarter_len = len(xs)//4
-    x_polys = f.multi_interp_4(
-        [[xs[i+quarter_len*j] for j in range(4)] for i in range(quarter_len)],
-        [[values[i+quarter_len*j] for j in range(4)] for i in range(quarter_len)]
-    )
-    column = [f.eval_quartic(p, special_x) for p in x_polys]
-    m2 = merkelize(column)
-
-    # Pseudo-randomly select y indices to sample
-    ys = get_pseudorandom_indices(m2[1], len(column), 40, exclude_multiples_of=exclude_multiples_of)
-
-    # Compute the positions for the values in the polynomial
-    poly_positions = sum([[y + (len(xs) // 4) * j for j in range(4)] for y in ys], [])
-
-    # This component of the proof, including Merkle branches
-    o = [m2[1], mk_multi_branch(m2, ys), mk_multi_branch(m, poly_positions)]
-
-    # Recurse...
-    return [o] + prove_low_degree(column, f.exp(root_of_unity, 4),
-                                  maxdeg_plus_1 // 4, modulus, exclude_multiples_of=exclude_multiples_of)
+    # Commit to every layer, folding until the degree we are checking for
+    # is less than or equal to 16
+    layers = []
+    trees = []
+    roots = []
+    while maxdeg_plus_1 > 16:
+        if tree is None:
+            tree = merkelize_layer(values, arity)
+        layers.append(values)
+        trees.append(tree)
+        roots.append(tree[1])
+
+        # Select a pseudo-random x coordinate, and fold
+        special_x = int.from_bytes(tree[1], 'big') % modulus
+        values = fold_layer(values, root_of_unity, arity, special_x, f)
+        root_of_unity = f.exp(root_of_unity, arity)
+        maxdeg_plus_1 = (maxdeg_plus_1 + arity - 1) // arity
+        tree = None
+        print('Folded to %d values of degree <= %d' % (len(values), maxdeg_plus_1))
+
+    # Use the last layer directly as a proof
+    final_values = [x.to_bytes(32, 'big') for x in values]
+
+    # Each query opens the leaf of its row in every layer; the row in the
+    # next layer is the row in this one
+    positions = get_query_positions(roots, final_values, len(layers[0]) if layers else len(values),
+                                    queries, exclude_multiples_of)
+    branches = []
+    for layer in layers:
+        rows = len(layer) // arity
+        positions = sorted(set(p % rows for p in positions))
+        branches.append(mk_multi_branch(trees[len(branches)], positions))
+
+    print('Produced FRI proof')
+    return [roots[1:], branches, final_values]
 
 # Verify an FRI proof
-def verify_low_degree_proof(merkle_root, root_of_unity, proof, maxdeg_plus_1, modulus, exclude_multiples_of=0):
+def verify_low_degree_proof(merkle_root, root_of_unity, proof, maxdeg_plus_1, modulus, exclude_multiples_of=0,
+                            arity=4, queries=40):
     f = PrimeField(modulus)
+    assert arity in (2, 4, 8, 16)
+    next_roots, branches, final_values = proof
+    roots = [merkle_root] + next_roots
 
     # Calculate which root of unity we're working with
     testval = root_of_unity
@@ -66,69 +157,53 @@ def verify_low_degree_proof(merkle_root, root_of_unity, proof, maxdeg_plus_1, mo
         roudeg *= 2
         testval = (testval * testval) % modulus
 
-    # Powers of the given root of unity 1, p, p**2, p**3 such that p**4 = 1
-    quartic_roots_of_unity = [1,
-                              f.exp(root_of_unity, roudeg // 4),
-                              f.exp(root_of_unity, roudeg // 2),
-                              f.exp(root_of_unity, roudeg * 3 // 4)]
-
-    # Verify the recursive components of the proof
-    for prf in proof[:-1]:
-        root2, column_branches, poly_branches = prf
+    layer_count = 0
+    degree = maxdeg_plus_1
+    while degree > 16:
+        layer_count += 1
+        degree = (degree + arity - 1) // arity
+    assert len(branches) == layer_count and len(next_roots) == max(layer_count - 1, 0)
+    if layer_count == 0:
+        assert merkelize_layer([int.from_bytes(x, 'big') for x in final_values], arity)[1] == merkle_root
+
+    # The values at the queried positions of the first layer are only
+    # checked against the folding of the previous layer from the second
+    # layer on
+    positions = get_query_positions(roots[:layer_count], final_values, roudeg, queries, exclude_multiples_of)
+    expected_values = {}
+    for root, layer_branches in zip(roots, branches):
         print('Verifying degree <= %d' % maxdeg_plus_1)
-
-        # Calculate the pseudo-random x coordinate
-        special_x = int.from_bytes(merkle_root, 'big') % modulus
-
-        # Calculate the pseudo-randomly sampled y indices
-        ys = get_pseudorandom_indices(root2, roudeg // 4, 40,
-                                      exclude_multiples_of=exclude_multiples_of)
-
-        # Compute the positions for the values in the polynomial
-        poly_positions = sum([[y + (roudeg // 4) * j for j in range(4)] for y in ys], [])
+        special_x = int.from_bytes(root, 'big') % modulus
+        rows = roudeg // arity
+        root_of_unity_of_arity = f.exp(root_of_unity, rows)
 
         # Verify Merkle branches
-        column_values = verify_multi_branch(root2, ys, column_branches)
-        poly_values = verify_multi_branch(merkle_root, poly_positions, poly_branches)
-
-        # For each y coordinate, get the x coordinates on the row, the values on
-        # the row, and the value at that y from the column
-        xcoords = []
-        rows = []
-        columnvals = []
-        for i, y in enumerate(ys):
-            # The x coordinates from the polynomial
-            x1 = f.exp(root_of_unity, y)
-            xcoords.append([(quartic_roots_of_unity[j] * x1) % modulus for j in range(4)])
-
-            # The values from the original polynomial
-            row = [int.from_bytes(x, 'big') for x in poly_values[i*4: i*4+4]]
-            rows.append(row)
-
-            columnvals.append(int.from_bytes(column_values[i], 'big'))
-
-        # Verify for each selected y coordinate that the four points from the
-        # polynomial and the one point from the column that are on that y 
-        # coordinate are on the same deg < 4 polynomial
-        polys = f.multi_interp_4(xcoords, rows)
-
-        for p, c in zip(polys, columnvals):
-            assert f.eval_quartic(p, special_x) == c
-
-        # Update constants to check the next proof
-        merkle_root = root2
-        root_of_unity = f.exp(root_of_unity, 4)
-        maxdeg_plus_1 //= 4
-        roudeg //= 4
+        row_positions = sorted(set(p % rows for p in positions))
+        leaves = dict(zip(row_positions, verify_multi_branch(root, row_positions, layer_branches, rows)))
+
+        next_expected_values = {}
+        for p in positions:
+            row_values = unpack_leaf(leaves[p % rows])
+            assert len(row_values) == arity
+            if p in expected_values:
+                assert row_values[p // rows] == expected_values[p]
+            next_expected_values[p % rows] = fold_row(row_values, f.exp(root_of_unity, p % rows),
+                                                      root_of_unity_of_arity, special_x, f)
+
+        # Update constants to check the next layer
+        positions = sorted(next_expected_values)
+        expected_values = next_expected_values
+        root_of_unity = f.exp(root_of_unity, arity)
+        maxdeg_plus_1 = (maxdeg_plus_1 + arity - 1) // arity
+        roudeg = rows
 
     # Verify the direct components of the proof
-    data = [int.from_bytes(x, 'big') for x in proof[-1]]
+    data = [int.from_bytes(x, 'big') for x in final_values]
     print('Verifying degree <= %d' % maxdeg_plus_1)
     assert maxdeg_plus_1 <= 16
-
-    # Check the Merkle root matches up
-    mtree = merkelize(data)
-    assert mtree[1] == merkle_root
+    assert len(data) == roudeg
+    for p, value in expected_values.items():
+        assert data[p] == value
 
     # Check the degree of the data
     powers = get_power_cycle(root_of_unity, modulus)
@@ -140,7 +215,7 @@ def verify_low_degree_proof(merkle_root, root_of_unity, proof, maxdeg_plus_1, mo
     poly = f.lagrange_interp([powers[x] for x in pts[:maxdeg_plus_1]],
                              [data[x] for x in pts[:maxdeg_plus_1]])
     for x in pts[maxdeg_plus_1:]:
-        assert f.eval_poly_at(poly, powers[x]) == data[x]   
+        assert f.eval_poly_at(poly, powers[x]) == data[x]
 
     print('FRI proof verified')
     return True
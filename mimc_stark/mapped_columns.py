@@ -0,0 +1,146 @@
+from merkle_tree import blake
+from fri import get_packed_position
+import mmap
+
+# Columns and Merkle trees stored in memory-mapped files, for proving computations whose evaluation
+# domain is too large to keep every column in memory as a list of ints
+#
+# A column file is a sequence of fixed-width records (the 32-byte big-endian values of one or more
+# columns at a position of the evaluation domain). A tree file holds the inner nodes 1 ... n-1 of a
+# Merkle tree over n records, 32 bytes each at offset 32 * i, in the layout of merkle_tree.merkelize;
+# the leaves are the records of the column file, permuted as in permuted_tree or in their own order
+
+# Number of records or nodes processed at once when streaming over a file
+CHUNK_SIZE = 2**14
+
+def create_file(filename, size):
+    with open(filename, "wb") as f:
+        f.truncate(size)
+
+def open_mapped_file(filename, writable=False):
+    with open(filename, "r+b" if writable else "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+
+# Read-only view of a column file as a sequence of records
+class MappedRecords():
+    def __init__(self, filename, record_size):
+        self.data = open_mapped_file(filename)
+        self.record_size = record_size
+
+    def __len__(self):
+        return len(self.data) // self.record_size
+
+    def __getitem__(self, i):
+        return self.data[i * self.record_size: (i + 1) * self.record_size]
+
+# Read-only view of a column file of single 32-byte values as a sequence of ints
+class MappedColumn(MappedRecords):
+    def __init__(self, filename):
+        MappedRecords.__init__(self, filename, 32)
+
+    def __getitem__(self, i):
+        return int.from_bytes(self.data[i * 32: (i + 1) * 32], 'big')
+
+# Read-only view of a file holding the values of an FRI layer in the packed order of fri.pack_layer,
+# as the sequence of ints in their original order
+class MappedLayer(MappedRecords):
+    def __init__(self, filename, arity):
+        MappedRecords.__init__(self, filename, 32)
+        self.arity = arity
+
+    def __getitem__(self, i):
+        position = get_packed_position(i, len(self), self.arity)
+        return int.from_bytes(self.data[position * 32: (position + 1) * 32], 'big')
+
+# Writes the records for positions start, start + stride, start + 2 * stride, ... of a column file
+def write_strided_records(filename, records, start, stride):
+    write_records_at(filename, records, [start + i * stride for i in range(len(records))])
+
+# Writes each record at the given position of a column file
+def write_records_at(filename, records, positions):
+    data = open_mapped_file(filename, writable=True)
+    for record, position in zip(records, positions):
+        data[position * len(record): (position + 1) * len(record)] = record
+    data.close()
+
+# Reads the records for positions start, start + stride, start + 2 * stride, ... of a column file
+def read_strided_records(filename, record_size, start, stride, count):
+    data = open_mapped_file(filename)
+    records = [data[(start + i * stride) * record_size: (start + i * stride + 1) * record_size] for i in range(count)]
+    data.close()
+    return records
+
+# Position in the column of the i'th leaf of a permuted_tree
+def get_permuted_position(i, leaf_count):
+    return i // 4 + (leaf_count // 4) * (i % 4)
+
+def get_leaf_position(i, leaf_count, permuted):
+    return get_permuted_position(i, leaf_count) if permuted else i
+
+# Computes the nodes of subtree s out of subtree_count subtrees of equal size of the Merkle tree over the
+# records of a column file, and writes them to the tree file. The nodes above the subtrees are left out
+def merkelize_subtree_to_file(arguments):
+    column_filename, record_size, tree_filename, subtree_count, permuted, s = arguments
+    records = open_mapped_file(column_filename)
+    nodes = open_mapped_file(tree_filename, writable=True)
+    leaf_count = len(records) // record_size
+    subtree_size = leaf_count // subtree_count
+
+    # Bottom level: hash pairs of (permuted) records
+    level_start, level_size = leaf_count // 2 + s * subtree_size // 2, subtree_size // 2
+    for chunk_start in range(0, level_size, CHUNK_SIZE):
+        chunk = []
+        for i in range(chunk_start, min(chunk_start + CHUNK_SIZE, level_size)):
+            left = get_leaf_position(s * subtree_size + 2 * i, leaf_count, permuted)
+            right = get_leaf_position(s * subtree_size + 2 * i + 1, leaf_count, permuted)
+            chunk.append(blake(records[left * record_size: (left + 1) * record_size] +
+                               records[right * record_size: (right + 1) * record_size]))
+        nodes[(level_start + chunk_start) * 32: (level_start + chunk_start + len(chunk)) * 32] = b''.join(chunk)
+
+    # Inner levels: hash pairs of nodes of the level below
+    while level_size > 1:
+        level_start, level_size = level_start // 2, level_size // 2
+        for chunk_start in range(0, level_size, CHUNK_SIZE):
+            chunk_end = min(chunk_start + CHUNK_SIZE, level_size)
+            children = nodes[(level_start + chunk_start) * 64: (level_start + chunk_end) * 64]
+            chunk = [blake(children[i: i + 64]) for i in range(0, len(children), 64)]
+            nodes[(level_start + chunk_start) * 32: (level_start + chunk_end) * 32] = b''.join(chunk)
+    nodes.close()
+    records.close()
+
+# Merkle tree over the records of a column file, with the inner nodes stored in a tree file and the top
+# levels cached in memory. Can be used in place of the list returned by permuted_tree.merkelize, or by
+# merkle_tree.merkelize if `permuted` is False
+class MappedMerkleTree():
+    def __init__(self, records, tree_filename, cached_levels=16, permuted=True):
+        self.records = records
+        self.leaf_count = len(records)
+        self.permuted = permuted
+        self.nodes = open_mapped_file(tree_filename)
+        cache_size = min(2**cached_levels, self.leaf_count)
+        self.cache = [b''] + [self.nodes[i * 32: (i + 1) * 32] for i in range(1, cache_size)]
+
+    def __len__(self):
+        return 2 * self.leaf_count
+
+    def __getitem__(self, i):
+        if i >= self.leaf_count:
+            return self.records[get_leaf_position(i - self.leaf_count, self.leaf_count, self.permuted)]
+        elif i < len(self.cache):
+            return self.cache[i]
+        else:
+            return self.nodes[i * 32: (i + 1) * 32]
+
+# Builds the Merkle tree over the records of a column file, with the subtrees below the top
+# log2(subtree_count) levels computed with map_function
+def merkelize_to_file(column_filename, record_size, tree_filename, map_function, subtree_count=1, permuted=True):
+    records = MappedRecords(column_filename, record_size)
+    leaf_count = len(records)
+    create_file(tree_filename, leaf_count * 32)
+    map_function(merkelize_subtree_to_file, [(column_filename, record_size, tree_filename, subtree_count, permuted, s)
+                                             for s in range(subtree_count)])
+    nodes = open_mapped_file(tree_filename, writable=True)
+    for i in range(subtree_count - 1, 0, -1):
+        nodes[i * 32: (i + 1) * 32] = blake(nodes[i * 64: (i + 1) * 64])
+    nodes.close()
+    return MappedMerkleTree(records, tree_filename, permuted=permuted)
@@ -2,6 +2,7 @@ try:
     from hashlib import blake2s
 except:
     from pyblake2 import blake2s
+from generalized_indices import get_helper_indices
 blake = lambda x: blake2s(x).digest()
 
 def merkelize(L):
@@ -33,75 +34,35 @@ def verify_branch(root, index, proof, output_as_int=False):
     assert v == root
     return int.from_bytes(proof[0], 'big') if output_as_int else proof[0]
 
-# Make a compressed proof for multiple indices
+# Make a compressed proof for multiple indices: the leaves at the distinct indices in ascending order,
+# followed by the nodes at get_helper_indices in descending order
 def mk_multi_branch(tree, indices):
-    # Branches we are outputting
-    output = []
-    # Elements in the tree we can get from the branches themselves
-    calculable_indices = {}
-    for i in indices:
-        new_branch = mk_branch(tree, i)
-        index = len(tree) // 2 + i
-        calculable_indices[index] = True
-        for j in range(1, len(new_branch)):
-            calculable_indices[index ^ 1] = True
-            index //= 2
-        output.append(new_branch)
-    # Fill in the calculable list: if we can get or calculate both children, we can calculate the parent
-    complete = False
-    while not complete:
-        complete = True
-        keys = sorted([x//2 for x in calculable_indices])[::-1]
-        for k in keys:
-            if k*2 in calculable_indices and (k*2)+1 in calculable_indices and k not in calculable_indices:
-                calculable_indices[k] = True
-                complete = False
-    # If for any branch node both children are calculable, or the node overlaps with a leaf, or the node
-    # overlaps with a previously calculated one, elide it
-    scanned = {}
-    for i, b in zip(indices, output):
-        index = len(tree) // 2 + i
-        scanned[index] = True
-        for j in range(1, len(b)):
-            if ((index^1)*2 in calculable_indices and (index^1)*2+1 in calculable_indices) or ((index^1)-len(tree)//2 in indices) or (index^1) in scanned:
-                b[j] = b''
-            scanned[index^1] = True
-            index //= 2
-    return output
+    leaf_count = len(tree) // 2
+    positions = sorted(set(indices))
+    return [tree[leaf_count + i] for i in positions] + \
+        [tree[i] for i in get_helper_indices([leaf_count + i for i in positions])]
 
-# Verify a compressed proof
-def verify_multi_branch(root, indices, proof):
-    # The values in the Merkle tree we can fill in
-    partial_tree = {}
-    # Fill in elements from the branches
-    for i, b in zip(indices, proof):
-        half_tree_size = 2**(len(b) - 1)
-        index = half_tree_size+i
-        partial_tree[index] = b[0]
-        for j in range(1, len(b)):
-            if b[j]:
-                partial_tree[index ^ 1] = b[j]
-            index //= 2
-    # If we can calculate or get both children, we can calculate the parent
-    complete = False
-    while not complete:
-        complete = True
-        keys = sorted([x//2 for x in partial_tree])[::-1]
-        for k in keys:
-            if k*2 in partial_tree and k*2+1 in partial_tree and k not in partial_tree:
-                partial_tree[k] = blake(partial_tree[k*2] + partial_tree[k*2+1])
-                complete = False
-    # If any branch node is missing, we can calculate it
-    for i, b in zip(indices, proof):
-        index = half_tree_size + i
-        for j in range(1, len(b)):
-            if b[j] == b'':
-                b[j] = partial_tree[index ^ 1]
-            partial_tree[index^1] = b[j]
-            index //= 2
-    # Verify the branches and output the values
-    return [verify_branch(root, i, b) for i,b in zip(indices, proof)]
+# Verify a compressed proof, and return the leaves at the indices. `leaf_count` is the number of
+# leaves of the tree
+def verify_multi_branch(root, indices, proof, leaf_count):
+    positions = sorted(set(indices))
+    if not positions:
+        return []
+    helper_indices = get_helper_indices([leaf_count + i for i in positions])
+    assert len(proof) == len(positions) + len(helper_indices)
+    leaves = dict(zip(positions, proof))
+    nodes = {leaf_count + i: leaf for i, leaf in leaves.items()}
+    nodes.update(zip(helper_indices, proof[len(positions):]))
+    # Compute the parents of the leaves, then of their parents, and so on, in descending order; the
+    # sibling of every node is a leaf, a helper node or a node of the same level computed before
+    queue = [leaf_count + i for i in positions[::-1]]
+    for index in queue:
+        if index > 1 and index // 2 not in nodes:
+            nodes[index // 2] = blake(nodes[index - index % 2] + nodes[index - index % 2 + 1])
+            queue.append(index // 2)
+    assert nodes[1] == root
+    return [leaves[i] for i in indices]
 
 # Byte length of a multi proof
 def bin_length(proof):
-    return sum([len(b''.join(x)) + len(x) // 8 for x in proof]) + len(proof) * 2
+    return len(b''.join(proof))
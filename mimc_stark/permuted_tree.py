@@ -32,5 +32,5 @@ def verify_branch(root, index, proof, output_as_int=False):
 def mk_multi_branch(tree, indices):
     return _mk_multi_branch(tree, permute4_indices(indices, len(tree) // 2))
 
-def verify_multi_branch(root, indices, proof):
-    return _verify_multi_branch(root, permute4_indices(indices, 2**len(proof[0]) // 2), proof)
+def verify_multi_branch(root, indices, proof, leaf_count):
+    return _verify_multi_branch(root, permute4_indices(indices, leaf_count), proof, leaf_count)
@@ -0,0 +1,467 @@
+from permuted_tree import merkelize, mk_branch, verify_branch, blake, mk_multi_branch, verify_multi_branch, permute4_values
+from mapped_columns import (create_file, write_records_at, write_strided_records, read_strided_records,
+                            merkelize_to_file, MappedLayer)
+import merkle_tree
+import multiprocessing
+import os
+from poly_utils import PrimeField
+import time
+from fft import fft
+from fri import prove_low_degree, verify_low_degree_proof, pack_layer, unpack_leaf, get_packed_position
+from utils import get_power_cycle, get_pseudorandom_indices, is_a_power_of_2
+
+modulus = 2**256 - 2**32 * 351 + 1
+f = PrimeField(modulus)
+nonresidue = 7
+
+spot_check_security_factor = 80
+extension_factor = 8
+# Folding factor of every FRI layer, and number of FRI queries
+fri_arity = 4
+fri_queries = 40
+
+# Description of a computation as an algebraic intermediate representation (AIR):
+#
+# - width: number of registers, i.e. columns of the computational trace
+# - steps: number of rows of the trace (a power of 2)
+# - transition_constraints: functions constraint(row, next_row, periodic) of the values of the registers
+#   in a row and the next row, and of the values of the periodic columns in the row. The STARK proves
+#   that all of them are zero for every pair of successive rows
+# - transition_degree: the highest total degree of the transition constraints as polynomials in their
+#   arguments
+# - boundary_constraints: tuples (step, register, value), proving that trace[register][step] == value
+# - periodic_columns: public columns that repeat with a period that divides `steps`, like round
+#   constants. Their length must be a power of 2
+#
+# The transition constraints are plain Python functions, so they should be defined at module level if
+# the AIR has to be sent to other processes
+class AIR():
+    def __init__(self, width, steps, transition_constraints, transition_degree, boundary_constraints,
+                 periodic_columns=None):
+        if periodic_columns is None:
+            periodic_columns = []
+        assert is_a_power_of_2(steps)
+        assert all(is_a_power_of_2(len(column)) and len(column) <= steps for column in periodic_columns)
+        assert all(0 <= step < steps and 0 <= register < width for step, register, value in boundary_constraints)
+        self.width = width
+        self.steps = steps
+        self.transition_constraints = transition_constraints
+        self.transition_degree = transition_degree
+        self.boundary_constraints = boundary_constraints
+        self.periodic_columns = periodic_columns
+
+    # Registers that have at least one boundary constraint
+    def get_boundary_registers(self):
+        return sorted(set(register for step, register, value in self.boundary_constraints))
+
+    # Degree bound of the quotients of the transition constraints, and of the random linear combination of
+    # all columns that is proven to be low-degree with FRI. Rounded up to a power of 2 for FRI
+    def get_degree_bound(self):
+        degree_factor = 1
+        while degree_factor < self.transition_degree - 1:
+            degree_factor *= 2
+        return self.steps * degree_factor
+
+# Computes the values of a periodic column on the extended evaluation domain, given by the root of unity
+# G2. The result has length len(column) * extension_factor, and the value at position i of the domain is
+# at position i % (len(column) * extension_factor)
+def extend_periodic_column(column, steps, G2):
+    skips2 = steps // len(column)
+    mini_polynomial = fft(column, modulus, f.exp(G2, extension_factor * skips2), inv=True)
+    return fft(mini_polynomial, modulus, f.exp(G2, skips2))
+
+# Evaluates the transition constraints on successive points of a coset of the extended evaluation domain,
+# given the values of the registers on them and on the point after the last one, and the values of the
+# periodic columns on them. Returns one list of values per constraint. The next row of every point is the
+# next point of the coset
+def evaluate_transition_constraints(air, trace_evaluations, periodic_evaluations):
+    rows = zip(*[column[:-1] for column in trace_evaluations])
+    next_rows = zip(*[column[1:] for column in trace_evaluations])
+    periodic_rows = zip(*periodic_evaluations) if periodic_evaluations else [()] * (len(trace_evaluations[0]) - 1)
+    values = [[constraint(row, next_row, periodic) for constraint in air.transition_constraints]
+              for row, next_row, periodic in zip(rows, next_rows, periodic_rows)]
+    return [list(column) for column in zip(*values)]
+
+# Interpolant I(x) of the boundary values of a register, and the polynomial Z(x) that is zero at the
+# boundary positions, so that the boundary constraints are equivalent to (P(x) - I(x)) / Z(x) being a
+# polynomial
+def get_boundary_polynomials(air, register, G1):
+    constraints = [(step, value) for step, r, value in air.boundary_constraints if r == register]
+    boundary_xs = [f.exp(G1, step) for step, value in constraints]
+    return f.lagrange_interp(boundary_xs, [value for step, value in constraints]), f.zpoly(boundary_xs)
+
+# Pseudo-random coefficients of the linear combination of all committed columns
+def get_linear_combination_coefficients(m_root, count):
+    return [int.from_bytes(blake(m_root + i.to_bytes(4, 'big')), 'big') for i in range(count)]
+
+# The extended evaluation domain (powers of G2) is split into the extension_factor cosets
+# G2**j * <G1>, where row i of coset j is the position j + extension_factor * i of the domain. Every
+# coset also contains the next row of each of its points, so the work can be split into ranges of rows
+# of the cosets, in separate processes: the low-degree extension is done on the rows r, r + count,
+# r + 2 * count, ... of a coset, and the constraint evaluation, the encoding of the Merkle leaves and the
+# linear combination on the rows start, start + 1, ... of a coset
+
+# Values of the registers on the rows r, r + count, r + 2 * count, ... of coset j, one list per register
+def extend_trace_rows(arguments):
+    air, trace_polynomials, j, r, count = arguments
+    steps = air.steps
+    size = steps // count
+    G2 = f.exp(nonresidue, (modulus-1)//(steps * extension_factor))
+    G1 = f.exp(G2, extension_factor)
+    offset = f.exp(G2, j + extension_factor * r)
+    offset_powers = [1]
+    for i in range(1, steps):
+        offset_powers.append(offset_powers[-1] * offset % modulus)
+    # The rows are the points G2**j * G1**r * y for y**size = 1, and P_i(G2**j * G1**r * y) =
+    # sum c_k * (G2**j * G1**r)**k * y**k, so they are the FFT of the rescaled coefficients, with the
+    # coefficients of the powers of y that are equal (mod y**size - 1) added together
+    evaluations = []
+    for polynomial in trace_polynomials:
+        coefficients = [c * p % modulus for c, p in zip(polynomial, offset_powers)]
+        if count > 1:
+            coefficients = [sum(coefficients[k::size]) % modulus for k in range(size)]
+        evaluations.append(fft(coefficients, modulus, f.exp(G1, count)))
+    return evaluations
+
+# Values of the P, D and B columns (in that order) on the rows start, start + 1, ... of coset j, and the
+# Merkle leaves of these points. `trace_rows` has the values of the registers on these rows and on the
+# row after the last one
+def evaluate_rows(arguments):
+    air, trace_rows, periodic_evaluations, j, start = arguments
+    steps = air.steps
+    count = len(trace_rows[0]) - 1
+    G2 = f.exp(nonresidue, (modulus-1)//(steps * extension_factor))
+    G1 = f.exp(G2, extension_factor)
+    offset = f.exp(G2, j)
+    xs = [f.exp(G2, j + extension_factor * start)]
+    for i in range(1, count):
+        xs.append(xs[-1] * G1 % modulus)
+    last_step_position = f.exp(G1, steps-1)
+    periodic_evaluations = [[column[(j + extension_factor * (start + i)) % len(column)] for i in range(count)]
+                            for column in periodic_evaluations]
+    trace_evaluations = [column[:-1] for column in trace_rows]
+
+    # D_j(x) = C_j(P(x), P(g1*x), K(x)) / Z(x) with Z(x) = (x^steps - 1) / (x - x_atlast_step),
+    # where x^steps is the same for the whole coset
+    c_evaluations = evaluate_transition_constraints(air, trace_rows, periodic_evaluations)
+    z_num_inv = f.inv(f.exp(offset, steps) - 1)
+    z_evaluations_inv = [(x - last_step_position) * z_num_inv % modulus for x in xs]
+    d_evaluations = [[c * z % modulus for c, z in zip(column, z_evaluations_inv)] for column in c_evaluations]
+
+    # B_i(x) = (P_i(x) - I_i(x)) / Z_i(x) for every register with boundary constraints
+    b_evaluations = []
+    for register in air.get_boundary_registers():
+        interpolant, zeropoly = get_boundary_polynomials(air, register, G1)
+        inv_z_evaluations = f.multi_inv([f.eval_poly_at(zeropoly, x) for x in xs])
+        b_evaluations.append([((p - f.eval_poly_at(interpolant, x)) * invq) % modulus
+                              for p, x, invq in zip(trace_evaluations[register], xs, inv_z_evaluations)])
+
+    columns = trace_evaluations + d_evaluations + b_evaluations
+    leaves = [b''.join(v.to_bytes(32, 'big') for v in row) for row in zip(*columns)]
+    return columns, leaves
+
+# Values of the random linear combination of the columns on the rows start, start + 1, ... of coset j
+# (see mk_stark_proof)
+def combine_rows(arguments):
+    air, columns, k, j, start = arguments
+    steps = air.steps
+    count = len(columns[0])
+    degree_bound = air.get_degree_bound()
+    G2 = f.exp(nonresidue, (modulus-1)//(steps * extension_factor))
+    G1 = f.exp(G2, extension_factor)
+    trace_evaluations = columns[:air.width]
+    d_evaluations = columns[air.width: air.width + len(air.transition_constraints)]
+    b_evaluations = columns[air.width + len(air.transition_constraints):]
+    low_degree_columns = trace_evaluations + b_evaluations
+
+    l_evaluations = [0] * count
+    for column, coefficient in zip(d_evaluations + low_degree_columns, k):
+        l_evaluations = [(l + coefficient * v) % modulus for l, v in zip(l_evaluations, column)]
+    if degree_bound > steps:
+        # x^(degree_bound - steps) on the rows
+        G1_to_the_shift = f.exp(G1, degree_bound - steps)
+        powers = [f.exp(G2, (j + extension_factor * start) * (degree_bound - steps))]
+        for i in range(1, count):
+            powers.append(powers[-1] * G1_to_the_shift % modulus)
+        for column, coefficient in zip(low_degree_columns, k[len(columns):]):
+            l_evaluations = [(l + coefficient * v * p) % modulus for l, v, p in zip(l_evaluations, column, powers)]
+    return l_evaluations
+
+# Values of `columns` on the rows start, ..., start + count - 1 and on the row after the last one
+def get_rows(columns, start, count):
+    return [column[start: start + count] + [column[(start + count) % len(column)]] for column in columns]
+
+# Merges the values on the ranges of rows, coset by coset, into the values on the whole evaluation domain
+def interleave_ranges(range_values):
+    values = [v for values in range_values for v in values]
+    steps = len(values) // extension_factor
+    o = [None] * len(values)
+    for j in range(extension_factor):
+        o[j::extension_factor] = values[j * steps: (j + 1) * steps]
+    return o
+
+# Splits records of `column_count` 32-byte values into columns
+def records_to_columns(records, column_count):
+    return [[int.from_bytes(record[32 * c: 32 * c + 32], 'big') for record in records] for c in range(column_count)]
+
+# extend_trace_rows, with the values written to their positions in a trace file instead of returned
+def extend_trace_rows_to_file(arguments):
+    air, trace_polynomials, j, r, count, trace_filename = arguments
+    trace_evaluations = extend_trace_rows((air, trace_polynomials, j, r, count))
+    write_strided_records(trace_filename, [b''.join(v.to_bytes(32, 'big') for v in row)
+                                           for row in zip(*trace_evaluations)],
+                          j + extension_factor * r, extension_factor * count)
+
+# evaluate_rows, with the registers read from a trace file and the leaves written to their positions in
+# a column file instead of returned
+def evaluate_rows_to_file(arguments):
+    air, periodic_evaluations, j, start, count, trace_filename, column_filename = arguments
+    records = (read_strided_records(trace_filename, 32 * air.width, j + extension_factor * start,
+                                    extension_factor, count) +
+               read_strided_records(trace_filename, 32 * air.width,
+                                    j + extension_factor * ((start + count) % air.steps), extension_factor, 1))
+    columns, leaves = evaluate_rows((air, records_to_columns(records, air.width), periodic_evaluations, j, start))
+    write_strided_records(column_filename, leaves, j + extension_factor * start, extension_factor)
+
+# combine_rows, with the columns read from a column file and the result written to another one
+def combine_rows_to_file(arguments):
+    air, column_count, k, j, start, count, column_filename, l_filename = arguments
+    records = read_strided_records(column_filename, 32 * column_count, j + extension_factor * start,
+                                   extension_factor, count)
+    l_evaluations = combine_rows((air, records_to_columns(records, column_count), k, j, start))
+    # The values are stored in the packed order of the FRI layer tree
+    precision = air.steps * extension_factor
+    write_records_at(l_filename, [v.to_bytes(32, 'big') for v in l_evaluations],
+                     [get_packed_position(j + (start + i) * extension_factor, precision, fri_arity)
+                      for i in range(count)])
+
+# Same as merkelize (or merkle_tree.merkelize if `permuted` is False), but with the subtrees below the
+# top log2(subtree_count) levels computed with map_function
+def merkelize_in_subtrees(leaves, map_function, subtree_count, permuted=True):
+    if subtree_count <= 1:
+        return merkelize(leaves) if permuted else merkle_tree.merkelize(leaves)
+    if permuted:
+        leaves = permute4_values(leaves)
+    subtree_size = len(leaves) // subtree_count
+    subtrees = map_function(merkle_tree.merkelize, [leaves[i: i + subtree_size]
+                                                    for i in range(0, len(leaves), subtree_size)])
+    nodes = [b''] * (2 * len(leaves))
+    # Level l of subtree s holds the nodes (subtree_count + s) * 2**l ... (subtree_count + s + 1) * 2**l - 1
+    level_size = 1
+    while level_size <= subtree_size:
+        for s, subtree in enumerate(subtrees):
+            start = (subtree_count + s) * level_size
+            nodes[start: start + level_size] = subtree[level_size: 2 * level_size]
+        level_size *= 2
+    for i in range(subtree_count - 1, 0, -1):
+        nodes[i] = blake(nodes[i*2] + nodes[i*2+1])
+    return nodes
+
+# Generate a STARK proving that `trace` (a list of `air.width` columns of `air.steps` values) satisfies
+# the constraints of `air`. If `processes` is given, the work on the cosets of the evaluation domain and
+# on the Merkle trees is spread over that many worker processes, with the cosets split into ranges of
+# rows so that there is at least one range per process. If `directory` is given, the columns and Merkle
+# trees are stored in memory-mapped files in that directory, and only one coset per process is held in
+# memory at a time
+def mk_stark_proof(air, trace, processes=None, directory=None):
+    start_time = time.time()
+    steps = air.steps
+    assert steps <= 2**32 // extension_factor
+    assert len(trace) == air.width and all(len(column) == steps for column in trace)
+
+    precision = steps * extension_factor
+    degree_bound = air.get_degree_bound()
+    assert degree_bound * 2 <= precision
+
+    # Root of unity such that x^precision=1
+    G2 = f.exp(nonresidue, (modulus-1)//precision)
+
+    # Root of unity such that x^steps=1
+    skips = precision // steps
+    G1 = f.exp(G2, skips)
+
+    if processes:
+        pool = multiprocessing.Pool(processes)
+        map_function = pool.map
+        subtree_count = 1
+        while subtree_count * 2 <= processes and subtree_count * 2 <= precision // 4:
+            subtree_count *= 2
+        ranges_per_coset = 1
+        while ranges_per_coset * extension_factor < processes and ranges_per_coset * 2 <= steps:
+            ranges_per_coset *= 2
+    else:
+        pool = None
+        map_function = lambda function, arguments: list(map(function, arguments))
+        subtree_count = 1
+        ranges_per_coset = 1
+    range_size = steps // ranges_per_coset
+    row_ranges = [(j, start) for j in range(extension_factor) for start in range(0, steps, range_size)]
+    strided_ranges = [(j, r) for j in range(extension_factor) for r in range(ranges_per_coset)]
+
+    try:
+        # Interpolate every register into a polynomial P_i, with each step along a successive power of G1
+        trace_polynomials = [fft(column, modulus, G1, inv=True) for column in trace]
+        periodic_evaluations = [extend_periodic_column(column, steps, G2) for column in air.periodic_columns]
+        print('Converted computational trace and periodic columns into polynomials')
+
+        column_count = air.width + len(air.transition_constraints) + len(air.get_boundary_registers())
+        shifted = air.width + len(air.get_boundary_registers()) if degree_bound > steps else 0
+
+        # Low-degree extend P_i, and compute D_j(x) = C_j(P(x), P(g1*x), K(x)) / Z(x) and
+        # B_i(x) = (P_i(x) - I_i(x)) / Z_i(x), one range of rows at a time, and compute their Merkle root
+        if directory is None:
+            trace_ranges = map_function(extend_trace_rows, [(air, trace_polynomials, j, r, ranges_per_coset)
+                                                            for j, r in strided_ranges])
+            trace_cosets = [[[None] * steps for column in trace] for j in range(extension_factor)]
+            for (j, r), trace_evaluations in zip(strided_ranges, trace_ranges):
+                for column, values in zip(trace_cosets[j], trace_evaluations):
+                    column[r::ranges_per_coset] = values
+            ranges = map_function(evaluate_rows, [(air, get_rows(trace_cosets[j], start, range_size),
+                                                   periodic_evaluations, j, start) for j, start in row_ranges])
+            mtree = merkelize_in_subtrees(interleave_ranges([leaves for columns, leaves in ranges]),
+                                          map_function, subtree_count)
+        else:
+            trace_filename = os.path.join(directory, 'trace.bin')
+            create_file(trace_filename, precision * 32 * air.width)
+            map_function(extend_trace_rows_to_file, [(air, trace_polynomials, j, r, ranges_per_coset, trace_filename)
+                                                     for j, r in strided_ranges])
+            column_filename = os.path.join(directory, 'columns.bin')
+            create_file(column_filename, precision * 32 * column_count)
+            map_function(evaluate_rows_to_file, [(air, periodic_evaluations, j, start, range_size, trace_filename,
+                                                  column_filename) for j, start in row_ranges])
+            mtree = merkelize_to_file(column_filename, 32 * column_count, os.path.join(directory, 'columns_tree.bin'),
+                                      map_function, subtree_count)
+        print('Computed P, D and B polynomials on %d cosets and their hash root' % extension_factor)
+
+        # Based on the hashes of P, D and B, we select a random linear combination of all columns, with the
+        # columns of degree < steps (P and B) also multiplied by x^(degree_bound - steps), and prove the
+        # low-degreeness of that, instead of proving the low-degreeness of each column separately
+        k = get_linear_combination_coefficients(mtree[1], column_count + shifted)
+
+        # Compute the linear combination. We don't even both calculating it in
+        # coefficient form; we just compute the evaluations
+        if directory is None:
+            l_evaluations = interleave_ranges(map_function(combine_rows, [(air, columns, k, j, start)
+                                                                          for (j, start), (columns, leaves)
+                                                                          in zip(row_ranges, ranges)]))
+            l_mtree = merkelize_in_subtrees(pack_layer(l_evaluations, fri_arity), map_function, subtree_count,
+                                            permuted=False)
+        else:
+            l_filename = os.path.join(directory, 'l.bin')
+            create_file(l_filename, precision * 32)
+            map_function(combine_rows_to_file, [(air, column_count, k, j, start, range_size, column_filename,
+                                                 l_filename) for j, start in row_ranges])
+            l_evaluations = MappedLayer(l_filename, fri_arity)
+            l_mtree = merkelize_to_file(l_filename, 32 * fri_arity, os.path.join(directory, 'l_tree.bin'),
+                                        map_function, subtree_count, permuted=False)
+        print('Computed random linear combination')
+    finally:
+        if pool is not None:
+            pool.close()
+
+    # Do some spot checks of the Merkle tree at pseudo-random coordinates, excluding
+    # multiples of `extension_factor`
+    samples = spot_check_security_factor
+    positions = get_pseudorandom_indices(l_mtree[1], precision, samples,
+                                         exclude_multiples_of=extension_factor)
+    augmented_positions = sum([[x, (x + skips) % precision] for x in positions], [])
+    # The linear combination is committed to in the first FRI layer tree, with the values at
+    # positions p, p + precision / fri_arity, ... in one leaf
+    l_rows = precision // fri_arity
+    l_positions = sorted(set(x % l_rows for x in positions))
+    print('Computed %d spot checks' % samples)
+
+    # Return the Merkle roots of the columns and the linear combination, the spot check Merkle proofs,
+    # and the low-degree proof of the linear combination
+    o = [mtree[1],
+         l_mtree[1],
+         mk_multi_branch(mtree, augmented_positions),
+         merkle_tree.mk_multi_branch(l_mtree, l_positions),
+         prove_low_degree(l_evaluations, G2, degree_bound, modulus, exclude_multiples_of=extension_factor,
+                          tree=l_mtree, arity=fri_arity, queries=fri_queries)]
+    print("STARK computed in %.4f sec" % (time.time() - start_time))
+    return o
+
+# Verifies a STARK
+def verify_stark_proof(air, proof):
+    m_root, l_root, main_branches, linear_comb_branches, fri_proof = proof
+    start_time = time.time()
+    steps = air.steps
+    assert steps <= 2**32 // extension_factor
+
+    precision = steps * extension_factor
+    degree_bound = air.get_degree_bound()
+    assert degree_bound * 2 <= precision
+
+    # Get (steps)th root of unity
+    G2 = f.exp(nonresidue, (modulus-1)//precision)
+    skips = precision // steps
+    G1 = f.exp(G2, skips)
+
+    # Gets the polynomials representing the periodic columns
+    periodic_polynomials = []
+    for column in air.periodic_columns:
+        skips2 = steps // len(column)
+        periodic_polynomials.append((fft(column, modulus, f.exp(G2, extension_factor * skips2), inv=True), skips2))
+
+    boundary_registers = air.get_boundary_registers()
+    boundary_polynomials = [get_boundary_polynomials(air, register, G1) for register in boundary_registers]
+
+    # Verifies the low-degree proofs
+    assert verify_low_degree_proof(l_root, G2, fri_proof, degree_bound, modulus, exclude_multiples_of=extension_factor,
+                                   arity=fri_arity, queries=fri_queries)
+
+    # Performs the spot checks
+    constraint_count = len(air.transition_constraints)
+    column_count = air.width + constraint_count + len(boundary_registers)
+    shifted = air.width + len(boundary_registers) if degree_bound > steps else 0
+    k = get_linear_combination_coefficients(m_root, column_count + shifted)
+    samples = spot_check_security_factor
+    positions = get_pseudorandom_indices(l_root, precision, samples,
+                                         exclude_multiples_of=extension_factor)
+    augmented_positions = sum([[x, (x + skips) % precision] for x in positions], [])
+    last_step_position = f.exp(G2, (steps - 1) * skips)
+    main_branch_leaves = verify_multi_branch(m_root, augmented_positions, main_branches, precision)
+    l_rows = precision // fri_arity
+    l_positions = sorted(set(x % l_rows for x in positions))
+    linear_comb_branch_leaves = dict(zip(l_positions, merkle_tree.verify_multi_branch(l_root, l_positions,
+                                                                                      linear_comb_branches, l_rows)))
+    for i, pos in enumerate(positions):
+        x = f.exp(G2, pos)
+        x_to_the_shift = f.exp(x, degree_bound - steps)
+        leaf = main_branch_leaves[i*2]
+        next_leaf = main_branch_leaves[i*2+1]
+        assert len(leaf) == len(next_leaf) == 32 * column_count
+        values = [int.from_bytes(leaf[j: j+32], 'big') for j in range(0, len(leaf), 32)]
+        row = values[:air.width]
+        next_row = [int.from_bytes(next_leaf[j: j+32], 'big') for j in range(0, 32 * air.width, 32)]
+        d_of_x = values[air.width: air.width + constraint_count]
+        b_of_x = values[air.width + constraint_count:]
+        l_leaf = linear_comb_branch_leaves[pos % l_rows]
+        assert len(l_leaf) == 32 * fri_arity
+        l_of_x = unpack_leaf(l_leaf)[pos // l_rows]
+
+        zvalue = f.div(f.exp(x, steps) - 1,
+                       x - last_step_position)
+        periodic = [f.eval_poly_at(polynomial, f.exp(x, skips2)) for polynomial, skips2 in periodic_polynomials]
+
+        # Check transition constraints C_j(P(x), P(g1*x), K(x)) = Z(x) * D_j(x)
+        for constraint, d in zip(air.transition_constraints, d_of_x):
+            assert (constraint(row, next_row, periodic) - zvalue * d) % modulus == 0
+
+        # Check boundary constraints B_i(x) * Z_i(x) + I_i(x) = P_i(x)
+        for register, b, (interpolant, zeropoly) in zip(boundary_registers, b_of_x, boundary_polynomials):
+            assert (row[register] - b * f.eval_poly_at(zeropoly, x) -
+                    f.eval_poly_at(interpolant, x)) % modulus == 0
+
+        # Check correctness of the linear combination
+        low_degree_values = row + b_of_x
+        expected_l_of_x = sum(coefficient * v for coefficient, v in zip(k, d_of_x + low_degree_values))
+        if shifted:
+            expected_l_of_x += sum(coefficient * v * x_to_the_shift
+                                   for coefficient, v in zip(k[column_count:], low_degree_values))
+        assert (l_of_x - expected_l_of_x) % modulus == 0
+
+    print('Verified %d consistency checks' % spot_check_security_factor)
+    print('Verified STARK in %.4f sec' % (time.time() - start_time))
+    return True
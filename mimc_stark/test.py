@@ -1,7 +1,8 @@
 from fft import fft
 from mimc_stark import mk_mimc_proof, modulus, mimc, verify_mimc_proof
 from merkle_tree import merkelize, mk_branch, verify_branch, bin_length
-from fri import prove_low_degree, verify_low_degree_proof
+from fri import prove_low_degree, verify_low_degree_proof, merkelize_layer
+from stark import AIR, mk_stark_proof, verify_stark_proof
 
 def test_merkletree():
     t = merkelize([x.to_bytes(32, 'big') for x in range(128)])
@@ -10,44 +11,91 @@ def test_merkletree():
     print('Merkle tree works')
 
 def fri_proof_bin_length(fri_proof):
-    return sum([32 + bin_length(x[1]) + bin_length(x[2]) for x in fri_proof[:-1]]) + len(b''.join(fri_proof[-1]))
-    
+    roots, branches, final_values = fri_proof
+    return 32 * len(roots) + sum([bin_length(x) for x in branches]) + len(b''.join(final_values))
+
 def test_fri():
-    # Pure FRI tests
+    # Pure FRI tests, with every supported arity
+    import time
     poly = list(range(4096))
     root_of_unity = pow(7, (modulus-1)//16384, modulus)
     evaluations = fft(poly, modulus, root_of_unity)
-    proof = prove_low_degree(evaluations, root_of_unity, 4096, modulus)
-    print("Approx proof length: %d" % fri_proof_bin_length(proof))
-    assert verify_low_degree_proof(merkelize(evaluations)[1], root_of_unity, proof, 4096, modulus)
-    
-    try:
+    for arity in (2, 4, 8, 16):
+        a = time.time()
+        proof = prove_low_degree(evaluations, root_of_unity, 4096, modulus, arity=arity)
+        b = time.time()
+        assert verify_low_degree_proof(merkelize_layer(evaluations, arity)[1], root_of_unity, proof, 4096, modulus,
+                                       arity=arity)
+        print("Arity %d: approx proof length %d, proved in %.3f sec, verified in %.3f sec" %
+              (arity, fri_proof_bin_length(proof), b - a, time.time() - b))
+
         fakedata = [x if pow(3, i, 4096) > 400 else 39 for x, i in enumerate(evaluations)]
-        proof2 = prove_low_degree(fakedata, root_of_unity, 4096, modulus)
-        assert verify_low_degree_proof(merkelize(fakedata)[1], root_of_unity, proof, 4096, modulus)
-        raise Exception("Fake data passed FRI")
-    except:
-        pass
-    try:
-        assert verify_low_degree_proof(merkelize(evaluations)[1], root_of_unity, proof, 2048, modulus)
-        raise Exception("Fake data passed FRI")
-    except:
-        pass
+        proof2 = prove_low_degree(fakedata, root_of_unity, 4096, modulus, arity=arity)
+        try:
+            verify_low_degree_proof(merkelize_layer(fakedata, arity)[1], root_of_unity, proof2, 4096, modulus,
+                                    arity=arity)
+            raise Exception("Fake data passed FRI")
+        except AssertionError:
+            pass
+        try:
+            verify_low_degree_proof(merkelize_layer(evaluations, arity)[1], root_of_unity, proof, 2048, modulus,
+                                    arity=arity)
+            raise Exception("Wrong degree passed FRI")
+        except AssertionError:
+            pass
+    print('FRI works')
 
 def test_stark():
     INPUT = 3
     import sys
     LOGSTEPS = int(sys.argv[1]) if len(sys.argv) > 1 else 13
+    PROCESSES = int(sys.argv[2]) if len(sys.argv) > 2 else None
     # Full STARK test
     import random
     #constants = [random.randrange(modulus) for i in range(64)]
     constants = [(i**7) ^ 42 for i in range(64)]
-    proof = mk_mimc_proof(INPUT, 2**LOGSTEPS, constants)
+    proof = mk_mimc_proof(INPUT, 2**LOGSTEPS, constants, PROCESSES)
     m_root, l_root, main_branches, linear_comb_branches, fri_proof = proof
     L1 = bin_length(main_branches) + bin_length(linear_comb_branches)
     L2 = fri_proof_bin_length(fri_proof)
     print("Approx proof length: %d (branches), %d (FRI proof), %d (total)" % (L1, L2, L1 + L2))
     assert verify_mimc_proof(3, 2**LOGSTEPS, constants, mimc(3, 2**LOGSTEPS, constants), proof)
+    # Keeping the columns and Merkle trees on disk gives the same proof, with and without worker processes
+    import tempfile
+    for processes in (None, PROCESSES or 2):
+        with tempfile.TemporaryDirectory() as directory:
+            assert mk_mimc_proof(INPUT, 2**LOGSTEPS, constants, processes, directory) == proof
+    print('STARK with the columns on disk works')
+
+# Fibonacci sequence with two registers: (a, b) -> (b, a + b)
+def fibonacci_transition_a(row, next_row, periodic):
+    return next_row[0] - row[1]
+
+def fibonacci_transition_b(row, next_row, periodic):
+    return next_row[1] - row[0] - row[1]
+
+def test_air_stark():
+    steps = 2**10
+    trace = [[1], [1]]
+    for i in range(steps-1):
+        trace[0].append(trace[1][-1])
+        trace[1].append((trace[0][-2] + trace[1][-1]) % modulus)
+    def mk_air(output):
+        return AIR(width=2,
+                   steps=steps,
+                   transition_constraints=[fibonacci_transition_a, fibonacci_transition_b],
+                   transition_degree=1,
+                   boundary_constraints=[(0, 0, 1), (0, 1, 1), (steps-1, 1, output)])
+    proof = mk_stark_proof(mk_air(trace[1][-1]), trace)
+    assert verify_stark_proof(mk_air(trace[1][-1]), proof)
+    try:
+        verify_stark_proof(mk_air(trace[1][-1] + 1), proof)
+        raise Exception("Wrong output passed")
+    except AssertionError:
+        pass
+    print('Two-register AIR STARK works')
 
 if __name__ == '__main__':
+    test_fri()
     test_stark()
+    test_air_stark()
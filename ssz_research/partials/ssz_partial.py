@@ -1,5 +1,6 @@
 from minimal_ssz import infer_type, is_basic, merkleize, pack_object, hash_tree_root, pack, is_power_of_two, ZERO_CHUNK, Vector, convert_to_list, is_top_level_dynamic, get_subtype_if_basic
 from hash_function import hash
+from generalized_indices import get_helper_indices
 
 def last_power_of_two(x):
     return x if x <= 1 else 2 * last_power_of_two(x // 2)
@@ -220,23 +221,17 @@ def descend(obj, path):
     else:
         raise Exception("Unknown path object", path)
 
+# Indices of the objects of a partial for the nodes `tree_indices`: the nodes themselves, except those
+# that are on the path of another one, and the helper nodes
 def get_proof_indices(tree_indices):
-    # Get all indices touched by the proof
-    keys = set(tree_indices)
+    on_paths = set()
     for i in tree_indices:
-        x = i
-        while x > 1:
-            keys.add(x ^ 1)
+        x = i // 2
+        while x >= 1 and x not in on_paths:
+            on_paths.add(x)
             x //= 2
-    keys = sorted(list(keys))[::-1]
-    pos = 0
-    while pos < len(keys):
-        k = keys[pos]
-        if k in keys and k^1 in keys and k//2 not in keys:
-            keys.append(k // 2)
-        pos += 1
-    # Get indices that cannot be recalculated from earlier indices
-    return [x for x in keys if not (x*2 in keys and x*2+1 in keys)]
+    return sorted(set(i for i in tree_indices if i not in on_paths) | set(get_helper_indices(tree_indices)),
+                  reverse=True)
 
 class OutOfRangeException(Exception):
     pass
@@ -1,12 +1,14 @@
 # Implement technique from https://github.com/khovratovich/Kate/blob/master/Kate_amortized.pdf
 
-from py_ecc import optimized_bls12_381 as b
+from curve_backend import get_backend
 from fft import fft
 from poly_utils import PrimeField
 from multicombs import lincomb
 from verkle import WIDTH, DEPTH, MODULUS, root_of_unity_candidates, ROOT_OF_UNITY
 import time
 
+curve = get_backend()
+
 ROOT_OF_UNITY2 = root_of_unity_candidates[WIDTH*2]
 
 
@@ -27,8 +29,8 @@ def semi_toeplitz_fft(toeplitz_coefficients, x):
     assert len(x) == WIDTH
     if xext_hat == None:
         a = time.time()
-        if type(x[0]) == tuple:
-            xext = x + [b.Z1 for a in x]
+        if curve.is_point(x[0]):
+            xext = x + [curve.Z1 for a in x]
         else:
             xext = x + [0 * a for a in x]
 
@@ -39,8 +41,8 @@ def semi_toeplitz_fft(toeplitz_coefficients, x):
     text_hat = fft(text, MODULUS, ROOT_OF_UNITY2, inv=False)
     yext_hat = [None for i in range(2*len(x))]
     for i in range(len(xext_hat)):
-        if type(xext_hat[0]) == tuple:
-            yext_hat[i] = b.multiply(xext_hat[i], text_hat[i])
+        if curve.is_point(xext_hat[0]):
+            yext_hat[i] = curve.mul(xext_hat[i], text_hat[i])
         else:
             yext_hat[i] *= text_hat[i]
     return fft(yext_hat, MODULUS, ROOT_OF_UNITY2, inv=True)[:len(x)]
@@ -55,7 +57,7 @@ def generate_all_proofs(values, setup):
     print("Generated polynomial coefficients in %.3f seconds" % (time.time() - a))
 
     a = time.time()
-    h = semi_toeplitz_fft(coefs + [0], setup[0][len(values)-2::-1] + [b.Z1])
+    h = semi_toeplitz_fft(coefs + [0], setup[0][len(values)-2::-1] + [curve.Z1])
     print("Toeplitz matrix multiplication in %.3f seconds" % (time.time() - a))
 
     a = time.time()
@@ -1,16 +1,17 @@
-from py_ecc import optimized_bls12_381 as b
-from fft import fft
+from curve_backend import get_backend
+from fft import fft, inv_fft_at_point
 from poly_utils import PrimeField
-from multicombs import lincomb
 import os
 import hashlib
 import random
 import time
 
+curve = get_backend()
+
 WIDTH = 16
 DEPTH = 3
 
-MODULUS = b.curve_order
+MODULUS = curve.curve_order
 
 field = PrimeField(MODULUS)
 
@@ -45,10 +46,10 @@ LAGRANGE_POLYS = [
 # Generate trusted setup, both in coefficient and Lagrange form
 def generate_setup(s):
     return (
-        [b.multiply(b.G1, pow(s, i, MODULUS)) for i in range(WIDTH+1)],
-        [b.multiply(b.G2, pow(s, i, MODULUS)) for i in range(WIDTH+1)],
-        [b.multiply(b.G1, field.eval_poly_at(l, s)) for l in LAGRANGE_POLYS],
-        [b.multiply(b.G2, field.eval_poly_at(l, s)) for l in LAGRANGE_POLYS],
+        [curve.mul(curve.G1, pow(s, i, MODULUS)) for i in range(WIDTH+1)],
+        [curve.mul(curve.G2, pow(s, i, MODULUS)) for i in range(WIDTH+1)],
+        [curve.mul(curve.G1, field.eval_poly_at(l, s)) for l in LAGRANGE_POLYS],
+        [curve.mul(curve.G2, field.eval_poly_at(l, s)) for l in LAGRANGE_POLYS],
     )
 
 # Just sha256
@@ -57,14 +58,13 @@ def hash(x):
 
 # Hashes a curve point to a number
 def hash_point_to_field(pt):
-    assert len(pt) == 2
-    return int.from_bytes(hash(str(pt).encode('utf-8')), 'big') % MODULUS
+    return int.from_bytes(hash(curve.serialize_g1(pt)), 'big') % MODULUS
 
 # Generates a commitment to a layer
 def layer_commit(values, setup):
     values += [0] * (WIDTH - len(values))
     coeffs = fft(values, MODULUS, ROOT_OF_UNITY, inv=True)
-    return b.normalize(lincomb(setup[0][:len(coeffs)], coeffs, b.add, b.Z1))
+    return curve.msm(setup[0][:len(coeffs)], coeffs)
 
 # Generates the polynomial D / (x-w**i) in evaluation form, for a given data and a given index i
 def generate_quotient(values, index):
@@ -104,7 +104,7 @@ def generate_proof(data_tree, commitment_tree, indices, setup):
     committee_root = commitment_tree[0][0]
     # Generate a random r value; we use a power of r as a coefficient for each sub-leaf
     # to create a random linear combination
-    r = int.from_bytes(hash(str([committee_root[0].n] + indices).encode('utf-8')), 'big') % b.curve_order
+    r = int.from_bytes(hash(curve.serialize_g1(committee_root) + str(indices).encode('utf-8')), 'big') % MODULUS
     #print("r", r)
     
     # Total polynomial that we are evaluating
@@ -132,18 +132,18 @@ def generate_proof(data_tree, commitment_tree, indices, setup):
                 c.append(commitment_tree[d][position_of_leaf // WIDTH])
         commitments.append(c)
     # Generate a polynomial commitment for the result
-    return commitments, b.normalize(lincomb(setup[2], total_poly_evaluations, b.add, b.Z1))
+    return commitments, curve.msm(setup[2], total_poly_evaluations)
 
 # Verify a witness generated by the above function
 def verify_proof(proof, commitment_root, indices, values, setup):
     # Regenerate the same r value as above
-    r = int.from_bytes(hash(str([commitment_root[0].n] + indices).encode('utf-8')), 'big') % b.curve_order
+    r = int.from_bytes(hash(curve.serialize_g1(commitment_root) + str(indices).encode('utf-8')), 'big') % MODULUS
     #print("r", r)
     commitments, witness = proof
     # We're making a big pairing check that essentially checks the equation:
     # sum [(P_i - y_i) * r_i * Z(everything except x_i)] = w * Z(everything) = sum [Q_i * r_i * Z(everything)]
     # where Z(set) = product: (X - s) for s in set
-    pairing_check = b.FQ12.one()
+    pairs = []
     for i, (c, index, v) in enumerate(zip(commitments, indices, values)):
         for d in range(DEPTH):
             rfactor = pow(r, i*DEPTH+d, MODULUS)
@@ -153,22 +153,122 @@ def verify_proof(proof, commitment_root, indices, values, setup):
             #print('d', d, 'i', index, 'rfactor', rfactor, 'pos', position_of_leaf)
             # P_i
             comm = c[d-1] if d else commitment_root
-            comm = (comm[0], comm[1], b.FQ.one())
             leaf = hash_point_to_field(c[d]) if d < DEPTH-1 else v
             #print('comm', comm, 'subindex', sub_index, 'leaf', leaf)
             # (P_i - y_i) * r_i
-            comm_minus_leaf_times_r = b.multiply(b.add(comm, b.multiply(b.G1, MODULUS - leaf)), rfactor)
+            comm_minus_leaf_times_r = curve.mul(curve.add(comm, curve.mul(curve.G1, MODULUS - leaf)), rfactor)
             # Z(everything except x_i)
-            Z_comm = b.multiply(setup[3][sub_index], field.inv(LAGRANGE_POLYS[sub_index][-1]))
+            Z_comm = curve.mul(setup[3][sub_index], field.inv(LAGRANGE_POLYS[sub_index][-1]))
             # Add the product into the pairing
-            pairing_check *= b.pairing(Z_comm, comm_minus_leaf_times_r, False)
+            pairs.append((comm_minus_leaf_times_r, Z_comm))
     # Z(everything)
-    global_Z_comm = b.add(setup[1][WIDTH], b.neg(setup[1][0]))
+    global_Z_comm = curve.add(setup[1][WIDTH], curve.neg(setup[1][0]))
     # Subtract out sum [Q_i * r_i * Z(everything)]
-    pairing_check *= b.pairing(b.neg(global_Z_comm), (witness[0], witness[1], b.FQ.one()), False)
-    o = b.final_exponentiate(pairing_check)
-    assert o == b.FQ12.one(), o
-    return o == b.FQ12.one()
+    pairs.append((witness, curve.neg(global_Z_comm)))
+    o = curve.pairing_check(pairs)
+    assert o
+    return o
+
+# Multiproofs, following https://dankradfeist.de/ethereum/2021/06/18/pcs-multiproofs.html
+#
+# Every opening (d, position) proves data_tree[d][position] against the commitment to its chunk,
+# commitment_tree[d][position // WIDTH]. Openings and commitments shared by several indices are only
+# included once, and all openings are aggregated into one quotient commitment D and a single KZG
+# proof, so the verifier needs two pairings regardless of the number of indices
+
+# The openings needed to prove a set of indices, as sorted (layer, position in the data layer) pairs
+def get_openings(indices):
+    return sorted(set((d, index // WIDTH**(DEPTH-d-1)) for index in indices for d in range(DEPTH)))
+
+# The commitments that have to be sent along with a multiproof, as sorted (layer, position in the
+# commitment layer) pairs: every opened commitment except the root
+def get_proof_commitment_positions(openings):
+    return sorted(set((d, position // WIDTH) for d, position in openings if d > 0))
+
+# Fiat-Shamir challenge r for the random linear combination of the openings
+def multiproof_challenge(commitment_root, commitments, openings, ys):
+    transcript = b''.join(curve.serialize_g1(c) for c in [commitment_root] + commitments)
+    transcript += str(openings).encode('utf-8')
+    transcript += b''.join((y % MODULUS).to_bytes(32, 'big') for y in ys)
+    return int.from_bytes(hash(transcript), 'big') % MODULUS
+
+# Generate a multiproof for a set of indices
+def generate_multiproof(data_tree, commitment_tree, indices, setup):
+    openings = get_openings(indices)
+    commitments = [commitment_tree[d][position] for d, position in get_proof_commitment_positions(openings)]
+    ys = [data_tree[d][position] for d, position in openings]
+    r = multiproof_challenge(commitment_tree[0][0], commitments, openings, ys)
+
+    # g(X) = sum r**k * (f_k(X) - y_k) / (X - z_k) and h(X) = sum r**k * f_k(X) / (t - z_k) in evaluation form
+    g = [0] * WIDTH
+    power_of_r = 1
+    for d, position in openings:
+        sub_index = position % WIDTH
+        data = data_tree[d][position - sub_index: position - sub_index + WIDTH]
+        g = [(a + power_of_r * b) % MODULUS for a, b in zip(g, generate_quotient(data, sub_index))]
+        power_of_r = field.mul(power_of_r, r)
+    D = curve.msm(setup[2], g)
+
+    t = int.from_bytes(hash(r.to_bytes(32, 'big') + curve.serialize_g1(D)), 'big') % MODULUS
+    h = [0] * WIDTH
+    power_of_r = 1
+    for d, position in openings:
+        sub_index = position % WIDTH
+        data = data_tree[d][position - sub_index: position - sub_index + WIDTH]
+        coefficient = field.div(power_of_r, field.sub(t, POWERS[sub_index]))
+        h = [(a + coefficient * b) % MODULUS for a, b in zip(h, data)]
+        power_of_r = field.mul(power_of_r, r)
+
+    # Open h and g at t with a single proof for h + q * g
+    y = inv_fft_at_point(h, MODULUS, ROOT_OF_UNITY, t)
+    w = inv_fft_at_point(g, MODULUS, ROOT_OF_UNITY, t)
+    q = int.from_bytes(hash(b''.join(x.to_bytes(32, 'big') for x in (t, y, w))), 'big') % MODULUS
+    combined_value = (y + q * w) % MODULUS
+    inv_denominators = field.multi_inv([field.sub(p, t) for p in POWERS])
+    quotient = [(a + q * b - combined_value) * inv_d % MODULUS for a, b, inv_d in zip(h, g, inv_denominators)]
+    sigma = curve.msm(setup[2], quotient)
+    return commitments, D, y, sigma
+
+# Verify a multiproof generated by the above function
+def verify_multiproof(proof, commitment_root, indices, values, setup):
+    commitments, D, y, sigma = proof
+    openings = get_openings(indices)
+    positions = get_proof_commitment_positions(openings)
+    if len(commitments) != len(positions):
+        return False
+    commitments_by_position = dict(zip(positions, commitments))
+    commitments_by_position[(0, 0)] = commitment_root
+    values_by_index = dict(zip(indices, values))
+
+    # The opened values are the hashes of the commitments one layer down, and the values at the bottom
+    ys = [values_by_index[position] if d == DEPTH-1 else hash_point_to_field(commitments_by_position[(d+1, position)])
+          for d, position in openings]
+    r = multiproof_challenge(commitment_root, commitments, openings, ys)
+    t = int.from_bytes(hash(r.to_bytes(32, 'big') + curve.serialize_g1(D)), 'big') % MODULUS
+
+    # E = sum r**k / (t - z_k) * C_k is the commitment to h, and g(t) = h(t) - sum r**k * y_k / (t - z_k)
+    E_coefficients = {}
+    g2_of_t = 0
+    power_of_r = 1
+    for (d, position), y_k in zip(openings, ys):
+        coefficient = field.div(power_of_r, field.sub(t, POWERS[position % WIDTH]))
+        chunk = (d, position // WIDTH)
+        E_coefficients[chunk] = field.add(E_coefficients.get(chunk, 0), coefficient)
+        g2_of_t = (g2_of_t + coefficient * y_k) % MODULUS
+        power_of_r = field.mul(power_of_r, r)
+    w = field.sub(y, g2_of_t)
+
+    # Check the opening of E + q * D at t to y + q * w:
+    # e(E + q * D - (y + q * w), [1]) = e(sigma, [s - t])
+    q = int.from_bytes(hash(b''.join(x.to_bytes(32, 'big') for x in (t, y, w))), 'big') % MODULUS
+    combined_commitment = curve.msm([commitments_by_position[chunk] for chunk in E_coefficients] + [D],
+                                    list(E_coefficients.values()) + [q])
+    combined_value = (y + q * w) % MODULUS
+    s_minus_t = curve.add(setup[1][1], curve.neg(curve.mul(setup[1][0], t)))
+    return curve.pairing_check([
+        (curve.add(combined_commitment, curve.mul(curve.G1, MODULUS - combined_value)), curve.neg(setup[1][0])),
+        (sigma, s_minus_t)
+    ])
 
 def test():
     setup = generate_setup(1927409816240961209460912649124)
@@ -177,16 +277,27 @@ def test():
     print("Generated random test data")
     data_tree, commitment_tree = generate_tree(data, setup)
     print("Generated data and commitment tree")
-    print("Root: ", commitment_tree[0][0])
+    print("Root: ", curve.serialize_g1(commitment_tree[0][0]).hex())
     coords = [729 % WIDTH ** DEPTH, 505 % WIDTH ** DEPTH]
     a = time.time()
     commitments, w = generate_proof(data_tree, commitment_tree, coords, setup)
     print("Generated proof in %.3f seconds" % (time.time() - a))
     print('-------------------')
-    print("Witness: ", commitments, w)
+    print("Witness: ", [[curve.serialize_g1(x).hex() for x in c] for c in commitments], curve.serialize_g1(w).hex())
     a = time.time()
     assert verify_proof((commitments, w), commitment_tree[0][0], coords, [data[c] for c in coords], setup)
     print("Verified proof in %.3f seconds" % (time.time() - a))
+    print('-------------------')
+    coords = [(i * 97 + 13) % WIDTH ** DEPTH for i in range(64)]
+    a = time.time()
+    proof = generate_multiproof(data_tree, commitment_tree, coords, setup)
+    print("Generated multiproof for %d indices in %.3f seconds" % (len(coords), time.time() - a))
+    print("Multiproof contains %d commitments" % len(proof[0]))
+    a = time.time()
+    assert verify_multiproof(proof, commitment_tree[0][0], coords, [data[c] for c in coords], setup)
+    print("Verified multiproof in %.3f seconds" % (time.time() - a))
+    assert not verify_multiproof(proof, commitment_tree[0][0], coords, [data[c] + 1 for c in coords], setup)
+    print("Invalid multiproof check passed")
 
 if __name__ == '__main__':
     test()
@@ -1,7 +1,6 @@
-from py_ecc import optimized_bls12_381 as b
+from curve_backend import get_backend
 from fft import fft
 from poly_utils import PrimeField
-from multicombs import lincomb
 from fk20 import generate_all_proofs
 import os
 import hashlib
@@ -22,9 +21,13 @@ from verkle import (
     hash_point_to_field,
     layer_commit,
     generate_quotient,
-    verify_proof
+    verify_proof,
+    generate_multiproof,
+    verify_multiproof
 )
 
+curve = get_backend()
+
 # Generates the data and commitent tree for a piece of data
 # as well as the precomputed proofs
 def generate_tree(data, setup):
@@ -40,7 +43,7 @@ def generate_tree(data, setup):
             new_commitment_layer.append(layer_commit(data_tree[0][pos: pos+WIDTH], setup))
             # n^2 proof computation -- replaced by FK20
             #for sub_index in range(0, WIDTH):
-            #     new_proof_layer.append(lincomb(setup[2], generate_quotient(data_tree[0][pos: pos+WIDTH], sub_index), b.add, b.Z1))
+            #     new_proof_layer.append(curve.msm(setup[2], generate_quotient(data_tree[0][pos: pos+WIDTH], sub_index)))
 
             new_proof_layer += generate_all_proofs(data_tree[0][pos: pos+WIDTH], setup)
 
@@ -52,19 +55,47 @@ def generate_tree(data, setup):
     assert len(commitment_tree[0]) == 1
     return data_tree, commitment_tree, proof_tree
 
+# Commitments to the quotients (L_j(X) - L_j(w**i)) / (X - w**i) of the Lagrange polynomials, indexed [j][i].
+# Proofs are linear in the data, so changing the value at position j of a chunk by delta changes the proof
+# for position i of that chunk by delta times lagrange_quotients[j][i]. Only depends on the setup
+def generate_lagrange_quotients(setup):
+    return [[curve.msm(setup[2], generate_quotient([0]*j + [1] + [0]*(WIDTH-1-j), i)) for i in range(WIDTH)]
+            for j in range(WIDTH)]
+
+# Changes the value at an index and updates the trees in place: on every layer, the commitment to the
+# chunk on the path to the index and the proofs for all positions in that chunk are adjusted by the
+# change in the data. Costs (WIDTH+1) * DEPTH scalar multiplications instead of rebuilding the trees
+def update_leaf(data_tree, commitment_tree, proof_tree, index, value, setup, lagrange_quotients):
+    position = index
+    for d in range(DEPTH-1, -1, -1):
+        delta = field.sub(value, data_tree[d][position])
+        data_tree[d][position] = value
+        if delta == 0:
+            break
+        chunk_position, sub_index = position // WIDTH, position % WIDTH
+        commitment_tree[d][chunk_position] = curve.add(commitment_tree[d][chunk_position],
+                                                       curve.mul(setup[2][sub_index], delta))
+        for i in range(WIDTH):
+            proof_position = chunk_position * WIDTH + i
+            proof_tree[d][proof_position] = curve.add(proof_tree[d][proof_position],
+                                                      curve.mul(lagrange_quotients[sub_index][i], delta))
+        # The data one layer up is the hash of the updated commitment
+        value = hash_point_to_field(commitment_tree[d][chunk_position])
+        position = chunk_position
+
 # Generate a witness proving a particular set of indices
 def generate_proof(data_tree, commitment_tree, proof_tree, indices, setup):
     committee_root = commitment_tree[0][0]
     # Generate a random r value; we use a power of r as a coefficient for each sub-leaf
     # to create a random linear combination
-    r = int.from_bytes(hash(str([committee_root[0].n] + indices).encode('utf-8')), 'big') % b.curve_order
+    r = int.from_bytes(hash(curve.serialize_g1(committee_root) + str(indices).encode('utf-8')), 'big') % MODULUS
     #print("r", r)
     
     # Total polynomial that we are evaluating
     total_poly_evaluations = [0] * WIDTH
     # The set of all intermediate commitments
     commitments = []
-    total_proofs = b.Z1
+    total_proofs = curve.Z1
 
     for i, index in enumerate(indices):
         c = []
@@ -79,13 +110,13 @@ def generate_proof(data_tree, commitment_tree, proof_tree, indices, setup):
             proof = proof_tree[d][position_of_leaf]
 
             # Add in rfactor*D / (X - w**i) to the total
-            total_proofs = b.add(total_proofs, b.multiply(proof, rfactor))
+            total_proofs = curve.add(total_proofs, curve.mul(proof, rfactor))
             # Provide as part of the proof all intermediate-level commitments
             if d > 0:
                 c.append(commitment_tree[d][position_of_leaf // WIDTH])
         commitments.append(c)
     # Generate a polynomial commitment for the result
-    return commitments, b.normalize(total_proofs)
+    return commitments, total_proofs
 
 def test():
     setup = generate_setup(1927409816240961209460912649124)
@@ -96,17 +127,41 @@ def test():
     data_tree, commitment_tree, proof_tree = generate_tree(data, setup)
     print("Generated commitment and proofs in %.3f seconds" % (time.time() - a))
     print("Generated data and commitment tree")
-    print("Root: ", commitment_tree[0][0])
+    print("Root: ", curve.serialize_g1(commitment_tree[0][0]).hex())
     print('-------------------')
     coords = [729 % WIDTH ** DEPTH, 505 % WIDTH ** DEPTH]
     a = time.time()
     commitments, w = generate_proof(data_tree, commitment_tree, proof_tree, coords, setup)
     print("Generated proof in %.3f seconds" % (time.time() - a))
     print('-------------------')
-    print("Witness: ", commitments, w)
+    print("Witness: ", [[curve.serialize_g1(x).hex() for x in c] for c in commitments], curve.serialize_g1(w).hex())
     a = time.time()
     assert verify_proof((commitments, w), commitment_tree[0][0], coords, [data[c] for c in coords], setup)
     print("Verified proof in %.3f seconds" % (time.time() - a))
+    print('-------------------')
+    # The aggregated multiproof only needs the data and commitment trees
+    coords = [(i * 97 + 13) % WIDTH ** DEPTH for i in range(64)]
+    a = time.time()
+    proof = generate_multiproof(data_tree, commitment_tree, coords, setup)
+    print("Generated multiproof for %d indices in %.3f seconds" % (len(coords), time.time() - a))
+    a = time.time()
+    assert verify_multiproof(proof, commitment_tree[0][0], coords, [data[c] for c in coords], setup)
+    print("Verified multiproof in %.3f seconds" % (time.time() - a))
+    print('-------------------')
+    lagrange_quotients = generate_lagrange_quotients(setup)
+    print("Generated Lagrange quotients")
+    a = time.time()
+    update_leaf(data_tree, commitment_tree, proof_tree, 729, 12345, setup, lagrange_quotients)
+    print("Updated leaf in %.3f seconds" % (time.time() - a))
+    data[729] = 12345
+    _, new_commitment_tree, new_proof_tree = generate_tree(list(data), setup)
+    assert all(curve.eq(x, y) for layer, new_layer in zip(commitment_tree, new_commitment_tree) for x, y in zip(layer, new_layer))
+    assert all(curve.eq(x, y) for layer, new_layer in zip(proof_tree, new_proof_tree) for x, y in zip(layer, new_layer))
+    print("Updated trees match rebuilt trees")
+    coords = [729, 505]
+    commitments, w = generate_proof(data_tree, commitment_tree, proof_tree, coords, setup)
+    assert verify_proof((commitments, w), commitment_tree[0][0], coords, [data[c] for c in coords], setup)
+    print("Verified proof after update")
 
 if __name__ == '__main__':
     test()
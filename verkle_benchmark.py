@@ -0,0 +1,191 @@
+import argparse
+import csv
+import importlib
+import importlib.util
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+from time import time, strftime
+
+#
+# Reproducible benchmarks for the verkle tries in verkle_trie, verkle_trie_pedersen and verkle_trie_eip
+#
+# Every configuration of the grid is run in a fresh process with a fixed seed and a deterministic setup or
+# basis, so that runs on different commits measure exactly the same work. For each phase the time and the
+# memory high-water mark of the process after the phase (ru_maxrss, kilobytes on Linux) are recorded.
+#
+# The work itself is described by a `benchmark.py` adapter in the directory of each trie, which defines
+#
+# - DESCRIPTION: name of the trie, for the command line help
+# - PHASES: names of the phases, in the order they run
+# - GRID_PARAMETERS: list of (name, default values, help) of the parameters of the grid
+# - run_benchmark(config, record): runs all phases for one configuration (a dict with the grid parameters
+#   and the seed), calling record(phase, start_time) at the end of every phase, and returns a dict of
+#   other results (e.g. the proof size, or whether the proof verified)
+#
+# Example:
+#   python verkle_benchmark.py verkle_trie_eip --stems 1024,32768 --proof-keys 500,5000 --output results.json
+#   python verkle_benchmark.py verkle_trie_eip --stems 1024,32768 --proof-keys 500,5000 --compare results.json
+#
+
+
+def load_adapter(directory):
+    spec = importlib.util.spec_from_file_location("benchmark", os.path.join(directory, "benchmark.py"))
+    adapter = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(adapter)
+    return adapter
+
+
+def run_benchmark(directory, config):
+    """
+    Runs the adapter in `directory` for one configuration and returns the measurements.
+    Has to be run in a fresh process: the trie modules are imported from `directory` and set up for the
+    configuration by the adapter.
+    """
+    sys.path.insert(0, directory)
+    adapter = importlib.import_module("benchmark")
+
+    phases = {}
+    def record(phase, time_a):
+        phases[phase] = {"seconds": time() - time_a, "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+    results = adapter.run_benchmark(config, record)
+    return dict(results, phases=phases)
+
+
+def run_benchmark_to_pipe(directory, config, connection):
+    connection.send(run_benchmark(directory, config))
+    connection.close()
+
+
+def run_in_fresh_process(directory, config):
+    """
+    Runs run_benchmark in a new process. The process is not a pool worker, so that adapters can start
+    process pools of their own
+    """
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=run_benchmark_to_pipe, args=(directory, config, sender))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        process.join()
+        raise RuntimeError("Benchmark process for {0} exited with code {1}".format(config, process.exitcode))
+    process.join()
+    return result
+
+
+def get_metadata(directory):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"trie": os.path.basename(os.path.normpath(directory)),
+            "commit": commit,
+            "date": strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine()}
+
+
+def run_grid(directory, adapter, grid, seed, repeat):
+    """
+    Runs every configuration in the cartesian product of `grid` (parameter -> list of values) `repeat` times,
+    and keeps the fastest time and the highest memory high-water mark of each phase. Boolean results have to
+    hold in every run, other results are taken from the first run
+    """
+    parameters = [name for name, default, help in adapter.GRID_PARAMETERS]
+    results = []
+    for values in itertools.product(*[grid[parameter] for parameter in parameters]):
+        config = dict(zip(parameters, values), seed=seed)
+        runs = [run_in_fresh_process(directory, config) for i in range(repeat)]
+        result = {"config": config}
+        for key, value in runs[0].items():
+            if key != "phases":
+                result[key] = all(run[key] for run in runs) if isinstance(value, bool) else value
+        result["phases"] = {phase: {"seconds": min(run["phases"][phase]["seconds"] for run in runs),
+                                    "max_rss_kb": max(run["phases"][phase]["max_rss_kb"] for run in runs)}
+                            for phase in adapter.PHASES}
+        results.append(result)
+        print(" ".join("{0}={1}".format(parameter, config[parameter]) for parameter in parameters) + "  " +
+              " ".join("{0}={1:.3f}s".format(phase, result["phases"][phase]["seconds"]) for phase in adapter.PHASES),
+              file=sys.stderr)
+    return results
+
+
+def write_json(results, metadata, adapter, f):
+    json.dump({"metadata": metadata, "results": results}, f, indent=2)
+    f.write("\n")
+
+
+def write_csv(results, metadata, adapter, f):
+    parameters = [name for name, default, help in adapter.GRID_PARAMETERS]
+    other_results = [key for key in results[0] if key not in ("config", "phases")] if results else []
+    writer = csv.writer(f)
+    writer.writerow(parameters + ["seed"] + other_results +
+                    [phase + suffix for phase in adapter.PHASES for suffix in ("_seconds", "_max_rss_kb")])
+    for result in results:
+        writer.writerow([result["config"][parameter] for parameter in parameters + ["seed"]] +
+                        [result[key] for key in other_results] +
+                        [result["phases"][phase][key] for phase in adapter.PHASES for key in ("seconds", "max_rss_kb")])
+
+
+def compare(results, baseline, adapter):
+    """
+    Prints the time of every phase relative to the same configuration in `baseline` (as written by `write_json`).
+    Phases that are missing in `baseline` are left out
+    """
+    parameters = [name for name, default, help in adapter.GRID_PARAMETERS]
+    baseline_by_config = {json.dumps(result["config"], sort_keys=True): result for result in baseline["results"]}
+    print("Compared to commit {0}:".format(baseline["metadata"]["commit"]), file=sys.stderr)
+    for result in results:
+        old_result = baseline_by_config.get(json.dumps(result["config"], sort_keys=True))
+        if old_result is None:
+            continue
+        print(" ".join("{0}={1}".format(parameter, result["config"][parameter]) for parameter in parameters) + "  " +
+              " ".join("{0}={1:+.1%}".format(phase, result["phases"][phase]["seconds"] / old_result["phases"][phase]["seconds"] - 1)
+                       for phase in adapter.PHASES if phase in old_result["phases"]),
+              file=sys.stderr)
+
+
+def int_list(string):
+    return [int(x) for x in string.split(",")]
+
+
+if __name__ == "__main__":
+    directory_parser = argparse.ArgumentParser(add_help=False)
+    directory_parser.add_argument("directory")
+    known_args, _ = directory_parser.parse_known_args()
+    directory = os.path.abspath(known_args.directory)
+    adapter = load_adapter(directory)
+
+    parser = argparse.ArgumentParser(description="Reproducible benchmarks for the " + adapter.DESCRIPTION)
+    parser.add_argument("directory", help="Directory of the trie, containing its benchmark.py adapter")
+    for name, default, help in adapter.GRID_PARAMETERS:
+        parser.add_argument("--" + name.replace("_", "-"), type=int_list, default=default, help=help)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per configuration (the fastest run is reported)")
+    parser.add_argument("--format", choices=["json", "csv"], default="json")
+    parser.add_argument("--output", help="Output file (default: stdout)")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    grid = {name: getattr(args, name) for name, default, help in adapter.GRID_PARAMETERS}
+    results = run_grid(directory, adapter, grid, args.seed, args.repeat)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            compare(results, json.load(f), adapter)
+
+    write = write_json if args.format == "json" else write_csv
+    if args.output is None:
+        write(results, get_metadata(directory), adapter, sys.stdout)
+    else:
+        with open(args.output, "w", newline="") as f:
+            write(results, get_metadata(directory), adapter, f)
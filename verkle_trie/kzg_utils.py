@@ -1,5 +1,6 @@
 import blst
 import pippenger
+import secrets
 
 #
 # Utilities for dealing with polynomials in evaluation form
@@ -21,12 +22,14 @@ class KzgUtils():
     """
     Class that defines helper function for Kate proofs in evaluation form (Lagrange basis)
     """
-    def __init__(self, MODULUS, WIDTH, DOMAIN, SETUP, primefield):
+    def __init__(self, MODULUS, WIDTH, DOMAIN, SETUP, primefield, pool=None):
         self.MODULUS = MODULUS
         self.WIDTH = WIDTH
         self.DOMAIN = DOMAIN
         self.SETUP = SETUP
         self.primefield = primefield
+        # Optional multiprocessing.Pool used to split the MSMs across processes
+        self.pool = pool
         # Precomputed inverses of 1 / (1 - DOMAIN[i])
         self.inverses = [0] + [primefield.inv(1 - DOMAIN[i]) for i in range(1, WIDTH)]
         self.inverse_width = primefield.inv(self.WIDTH)
@@ -89,6 +92,43 @@ class KzgUtils():
         return pairing.final_exp().is_one()
 
 
+    def check_kzg_proof_batch(self, proofs):
+        """
+        Check many KZG proofs (C, z, y, pi) at once. With random coefficients r_i, all equations
+        e(C_i - [y_i], [1]) = e(pi_i, [s - z_i]) are folded into the single check
+        e(sum r_i * (C_i - [y_i] + z_i * pi_i), [1]) * e(-sum r_i * pi_i, [s]) == 1
+        which needs two Miller loops and one final exponentiation, independent of the number of proofs
+        """
+        if len(proofs) == 0:
+            return True
+        coefficients = [1] + [secrets.randbits(128) for i in range(len(proofs) - 1)]
+
+        group_elements = [C for C, z, y, pi in proofs] + [pi for C, z, y, pi in proofs]
+        factors = coefficients + [r * z % self.MODULUS for r, (C, z, y, pi) in zip(coefficients, proofs)]
+        y_sum = sum(r * y for r, (C, z, y, pi) in zip(coefficients, proofs)) % self.MODULUS
+        lhs = pippenger.pippenger(group_elements, factors, pool=self.pool).add(blst.G1().mult(y_sum).neg())
+        pi_sum = pippenger.pippenger([pi for C, z, y, pi in proofs], coefficients, pool=self.pool)
+
+        pairing = blst.PT(blst.G2().to_affine(), lhs.to_affine())
+        pairing.mul(blst.PT(self.SETUP["g2"][1].to_affine(), pi_sum.neg().to_affine()))
+
+        return pairing.final_exp().is_one()
+
+
+    def find_invalid_kzg_proofs(self, proofs):
+        """
+        Returns the indices of all invalid KZG proofs (C, z, y, pi) in `proofs` (an empty list if all are valid).
+        Uses one batch check if all proofs are valid, and otherwise bisects the batch to locate the invalid ones
+        """
+        if self.check_kzg_proof_batch(proofs):
+            return []
+        if len(proofs) == 1:
+            return [0]
+        half = len(proofs) // 2
+        return self.find_invalid_kzg_proofs(proofs[:half]) + \
+            [half + i for i in self.find_invalid_kzg_proofs(proofs[half:])]
+
+
     def evaluate_and_compute_kzg_proof(self, f, z):
         """
         Evaluates a function f (given in evaluation form) at a point z (which can be in the DOMAIN or not)
@@ -102,7 +142,7 @@ class KzgUtils():
             y = self.evaluate_polynomial_in_evaluation_form(f, z)
             q = self.compute_outer_quotient_in_evaluation_form(f, z, y)
 
-        return y, pippenger.pippenger_simple(self.SETUP["g1_lagrange"], q)
+        return y, pippenger.pippenger(self.SETUP["g1_lagrange"], q, pool=self.pool)
 
 
     def compute_commitment_lagrange(self, values):
@@ -110,5 +150,5 @@ class KzgUtils():
         Computes a commitment for a function given in evaluation form.
         'values' is a dictionary and can have missing indices, which improves efficiency.
         """
-        commitment = pippenger.pippenger_simple([self.SETUP["g1_lagrange"][i] for i in values.keys()], values.values())
+        commitment = pippenger.pippenger([self.SETUP["g1_lagrange"][i] for i in values.keys()], values.values(), pool=self.pool)
         return commitment
\ No newline at end of file
@@ -1,8 +1,13 @@
 import blst
+import curve_backend
 from itertools import zip_longest
 from collections import defaultdict
 from random import randint
 from time import time
+from multiprocessing import Pool
+
+# The bucket method itself is curve_backend.pippenger, shared with kzg_data_availability, verkle and bulletproofs
+curve = curve_backend.get_backend("blst")
 
 def integer_in_base(i, b):
     r = []
@@ -40,6 +45,15 @@ def pippenger_simple(group_elements, factors):
         result.mult(b).add(total)
     return result
 
+def pippenger(group_elements, factors, window_bits=None, pool=None):
+    """
+    Multiexponentiation using Pippenger's algorithm with signed digits (see curve_backend.pippenger). The window
+    size is chosen from the measured cost of additions and doublings unless `window_bits` is given. If `pool`
+    (a multiprocessing.Pool) is given, the windows are computed in parallel. Returns a new point
+    """
+    return curve_backend.pippenger(curve, list(group_elements), list(factors), curve.Z1, window_bits, pool).dup()
+
+
 def lincomb_naive(group_elements, factors):
     """
     Direct linear combination
@@ -63,6 +77,39 @@ def test_pippenger(group_elements, factors):
     time_c = time()
     print("Using simple Pippenger algorithm: {0:.6f} s".format(time_c - time_b))
     assert naive_result.is_equal(pippenger_result)
-    
+
+
+def benchmark_pippenger(sizes, pool=None):
+    """
+    Test and time pippenger against lincomb_naive and pippenger_simple for MSMs of the given sizes
+    """
+    print("n\tnaive\tsimple\tpippenger" + ("\tpippenger (pool)" if pool is not None else ""))
+    generator = blst.P1_generator()
+    for n in sizes:
+        group_elements = [generator.dup().mult(randint(1, curve.curve_order - 1)) for i in range(n)]
+        factors = [randint(0, curve.curve_order - 1) for i in range(n)]
+        timings = []
+
+        time_a = time()
+        naive_result = lincomb_naive(group_elements, factors)
+        timings.append(time() - time_a)
+
+        time_a = time()
+        assert naive_result.is_equal(pippenger_simple(group_elements, factors))
+        timings.append(time() - time_a)
+
+        time_a = time()
+        assert naive_result.is_equal(pippenger(group_elements, factors))
+        timings.append(time() - time_a)
+
+        if pool is not None:
+            time_a = time()
+            assert naive_result.is_equal(pippenger(group_elements, factors, pool=pool))
+            timings.append(time() - time_a)
+
+        print("{0}\t".format(n) + "\t".join("{0:.6f}".format(t) for t in timings))
+
+
 if __name__ == "__main__":
-    test_pippenger([blst.P1_generator()]*16384, [randint(0, 2**255) for i in range(16384)])
\ No newline at end of file
+    with Pool() as pool:
+        benchmark_pippenger([1, 16, 256, 4096, 16384], pool)
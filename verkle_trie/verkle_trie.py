@@ -1,12 +1,15 @@
 import pippenger
 import blst
 import hashlib
+import kzg_setup
 from random import randint, shuffle
 from poly_utils import PrimeField
 from time import time
 from kzg_utils import KzgUtils
 from fft import fft
 import sys
+import os
+from multiprocessing import Pool
 
 #
 # Proof of concept implementation for verkle tries
@@ -46,6 +49,17 @@ NUMBER_DELETED_KEYS = 512
 # Number of key/values pair in proof
 NUMBER_KEYS_PROOF = 5000
 
+# Number of proofs to check in one batch, and key/value pairs in each of them
+NUMBER_BATCH_PROOFS = 16
+NUMBER_KEYS_BATCH_PROOF = 100
+
+# Number of worker processes used for MSMs (None to compute them in the main process)
+NUMBER_MSM_WORKERS = None
+
+# Trusted setup file written by save_setup. If None, a setup is generated from a fixed secret on every start.
+# The Lagrange polynomials derived from it are cached in the same directory
+SETUP_FILE = None
+
 def generate_setup(size, secret):
     """
     Generates a setup in the G1 group and G2 group, as well as the Lagrange polynomials in G1 (via FFT)
@@ -56,6 +70,70 @@ def generate_setup(size, secret):
     return {"g1": g1_setup, "g2": g2_setup, "g1_lagrange": g1_lagrange}
 
 
+#
+# Trusted setup files are read and written by kzg_setup.py in the repository root, shared with
+# kzg_data_availability/trusted_setup.py (using the blst backend, like pippenger.py).
+#
+# The Lagrange form of the setup is cached in "lagrange_<size>_<hash>.bin" files (uncompressed points), keyed by
+# the hash of the compressed G1 points it is derived from
+#
+
+def save_setup(setup, filename):
+    """
+    Write the G1 and G2 parts of a setup to a file in compressed form
+    """
+    kzg_setup.save_setup(pippenger.curve, setup["g1"], setup["g2"], filename)
+
+
+def verify_setup(setup):
+    """
+    Check that the G1 and G2 parts of a setup are successive powers of the same secret, starting with the generators,
+    and that all points are in the subgroup of order MODULUS (see kzg_setup.verify_setup)
+    """
+    return kzg_setup.verify_setup(pippenger.curve, setup["g1"], setup["g2"])
+
+
+def get_lagrange_setup(g1_setup, cache_directory=None):
+    """
+    Lagrange polynomials in G1 for the setup g1_setup (of size WIDTH), via FFT. If `cache_directory` is given,
+    they are read from the cache if they have been computed for the same setup before, and stored there otherwise
+    """
+    if cache_directory is None:
+        return fft(g1_setup, MODULUS, ROOT_OF_UNITY, inv=True)
+
+    setup_hash = hashlib.sha256(b"".join(x.compress() for x in g1_setup)).hexdigest()
+    filename = os.path.join(cache_directory, "lagrange_{0}_{1}.bin".format(len(g1_setup), setup_hash))
+    if os.path.exists(filename):
+        with open(filename, "rb") as f:
+            data = f.read()
+        if len(data) == 96 * len(g1_setup):
+            return [blst.P1(data[i:i + 96]) for i in range(0, len(data), 96)]
+
+    g1_lagrange = fft(g1_setup, MODULUS, ROOT_OF_UNITY, inv=True)
+    os.makedirs(cache_directory, exist_ok=True)
+    temporary_filename = "{0}.{1}.tmp".format(filename, os.getpid())
+    with open(temporary_filename, "wb") as f:
+        f.write(b"".join(x.serialize() for x in g1_lagrange))
+    os.replace(temporary_filename, filename)
+    return g1_lagrange
+
+
+def load_setup(filename, verify=True, cache_directory=None):
+    """
+    Load a setup written by save_setup (the G1 part has to have WIDTH points) and add the Lagrange polynomials,
+    which are cached in `cache_directory` if it is given. Raises a ValueError if the file is not a valid setup;
+    the subgroup and pairing checks of verify_setup are skipped if `verify` is False
+    """
+    g1_setup, g2_setup = kzg_setup.load_setup(pippenger.curve, filename)
+    if len(g1_setup) != WIDTH:
+        raise ValueError("Trusted setup has {0} G1 points, {1} are needed".format(len(g1_setup), WIDTH))
+    setup = {"g1": g1_setup, "g2": g2_setup}
+    if verify and not verify_setup(setup):
+        raise ValueError("Invalid trusted setup")
+    setup["g1_lagrange"] = get_lagrange_setup(g1_setup, cache_directory)
+    return setup
+
+
 def get_verkle_indices(key):
     """
     Generates the list of verkle indices for key
@@ -421,6 +499,19 @@ def check_kzg_multiproof(Cs, indices, ys, proof, display_times=True):
     https://dankradfeist.de/ethereum/2021/06/18/pcs-multiproofs.html
     """
 
+    if not kzg_utils.check_kzg_proof(*get_kzg_multiproof_opening(Cs, indices, ys, proof, display_times)):
+        return False
+
+    log_time_if_eligible("   Checked KZG proofs", 30, display_times)
+
+    return True
+
+
+def get_kzg_multiproof_opening(Cs, indices, ys, proof, display_times=True):
+    """
+    Reduces a KZG multiproof to the single KZG opening (C, z, y, pi) that has to be checked to verify it
+    """
+
     D_serialized, y, sigma_serialized = proof
     D = blst.P1(D_serialized)
     sigma = blst.P1(sigma_serialized)
@@ -431,35 +522,47 @@ def check_kzg_multiproof(Cs, indices, ys, proof, display_times=True):
     log_time_if_eligible("   Computed r hash", 30, display_times)
     
     # Step 2
-    t = hash_to_int([r, D])
+    t = hash_to_int([r, D]) % MODULUS
     E_coefficients = []
     g_2_of_t = 0
     power_of_r = 1
 
-    for index, y in zip(indices, ys):
+    for index, y_i in zip(indices, ys):
         E_coefficient = primefield.div(power_of_r, t - DOMAIN[index])
         E_coefficients.append(E_coefficient)
-        g_2_of_t += E_coefficient * y % MODULUS
+        g_2_of_t += E_coefficient * y_i % MODULUS
             
         power_of_r = power_of_r * r % MODULUS
 
     log_time_if_eligible("   Computed g2 and e coeffs", 30, display_times)
     
-    E = pippenger.pippenger_simple(Cs, E_coefficients)
+    E = pippenger.pippenger(Cs, E_coefficients)
 
     log_time_if_eligible("   Computed E commitment", 30, display_times)
 
-    # Step 3 (Check KZG proofs)
+    # Step 3 (Reduce to a single KZG proof)
     w = (y - g_2_of_t) % MODULUS
 
     q = hash_to_int([E, D, y, w])
 
-    if not kzg_utils.check_kzg_proof(E.dup().add(D.dup().mult(q)), t, y + q * w, sigma):
-        return False
+    return E.dup().add(D.dup().mult(q)), t, (y + q * w) % MODULUS, sigma
 
-    log_time_if_eligible("   Checked KZG proofs", 30, display_times)
 
-    return True
+def find_invalid_kzg_multiproofs(multiproofs, display_times=True):
+    """
+    Verifies many KZG multiproofs (Cs, indices, ys, proof) with a single batched pairing check.
+    Returns the indices of the invalid multiproofs (an empty list if all are valid)
+    """
+
+    openings = [get_kzg_multiproof_opening(Cs, indices, ys, proof, False) for Cs, indices, ys, proof in multiproofs]
+
+    log_time_if_eligible("   Reduced multiproofs", 30, display_times)
+
+    invalid = kzg_utils.find_invalid_kzg_proofs(openings)
+
+    log_time_if_eligible("   Checked KZG proofs (batch)", 30, display_times)
+
+    return invalid
 
 
 def make_verkle_proof(trie, keys, display_times=True):
@@ -519,6 +622,14 @@ def check_verkle_proof(trie, keys, values, proof, display_times=True):
 
     start_logging_time_if_eligible("   Starting proof check", display_times)
 
+    return check_kzg_multiproof(*get_verkle_proof_multiproof(trie, keys, values, proof, display_times), display_times)
+
+
+def get_verkle_proof_multiproof(trie, keys, values, proof, display_times=True):
+    """
+    Recreates the KZG multiproof (Cs, indices, ys, proof) that a Verkle tree proof consists of
+    """
+
     # Unpack the proof
     depths, commitments_sorted_by_index_serialized, D_serialized, y, sigma_serialized = proof
     commitments_sorted_by_index = [blst.P1(trie)] + [blst.P1(x) for x in commitments_sorted_by_index_serialized]
@@ -562,7 +673,22 @@ def check_verkle_proof(trie, keys, values, proof, display_times=True):
 
     log_time_if_eligible("   Recreated commitment lists", 30, display_times)
 
-    return check_kzg_multiproof(Cs, indices, ys, [D_serialized, y, sigma_serialized], display_times)
+    return Cs, indices, ys, [D_serialized, y, sigma_serialized]
+
+
+def find_invalid_verkle_proofs(verkle_proofs, display_times=True):
+    """
+    Checks many Verkle tree proofs (root, keys, values, proof) at once, folding all their KZG checks into a
+    single pairing check. Returns the indices of the invalid proofs (an empty list if all are valid)
+    """
+
+    start_logging_time_if_eligible("   Starting batch proof check", display_times)
+
+    multiproofs = [get_verkle_proof_multiproof(trie, keys, values, proof, False) for trie, keys, values, proof in verkle_proofs]
+
+    log_time_if_eligible("   Recreated commitment lists", 30, display_times)
+
+    return find_invalid_kzg_multiproofs(multiproofs, display_times)
 
 
 if __name__ == "__main__":
@@ -579,8 +705,12 @@ if __name__ == "__main__":
         NUMBER_DELETED_KEYS = 0
         NUMBER_ADDED_KEYS = 0
     
-    SETUP = generate_setup(WIDTH, 8927347823478352432985)
-    kzg_utils = KzgUtils(MODULUS, WIDTH, DOMAIN, SETUP, primefield)
+    if SETUP_FILE is not None:
+        SETUP = load_setup(SETUP_FILE, cache_directory=os.path.dirname(os.path.abspath(SETUP_FILE)))
+    else:
+        SETUP = generate_setup(WIDTH, 8927347823478352432985)
+    pool = Pool(NUMBER_MSM_WORKERS) if NUMBER_MSM_WORKERS is not None else None
+    kzg_utils = KzgUtils(MODULUS, WIDTH, DOMAIN, SETUP, primefield, pool)
 
 
     # Build a random verkle trie
@@ -668,10 +798,36 @@ if __name__ == "__main__":
     print("Computed proof for {0} keys (size = {1} bytes) in {2:.3f} s".format(NUMBER_KEYS_PROOF, proof_size, time_b - time_a), file=sys.stderr)
 
     time_a = time()
-    check_verkle_proof(root["commitment"].compress(), keys_in_proof, [values[key] for key in keys_in_proof], proof)
+    assert check_verkle_proof(root["commitment"].compress(), keys_in_proof, [values[key] for key in keys_in_proof], proof)
     time_b = time()
     check_time = time_b - time_a
 
     print("Checked proof in {0:.3f} s".format(time_b - time_a), file=sys.stderr)
 
+    if NUMBER_BATCH_PROOFS > 0:
+
+        verkle_proofs = []
+        for i in range(NUMBER_BATCH_PROOFS):
+            shuffle(all_keys)
+            keys = all_keys[:NUMBER_KEYS_BATCH_PROOF]
+            verkle_proofs.append((root["commitment"].compress(), keys, [values[key] for key in keys],
+                                  make_verkle_proof(root, keys, display_times=False)))
+
+        time_a = time()
+        assert find_invalid_verkle_proofs(verkle_proofs) == []
+        time_b = time()
+
+        print("Checked {0} proofs in batch in {1:.3f} s".format(NUMBER_BATCH_PROOFS, time_b - time_a), file=sys.stderr)
+
+        # Swap two values so that one of the proofs is invalid
+        invalid_index = NUMBER_BATCH_PROOFS // 2
+        trie_root, keys, proof_values, proof = verkle_proofs[invalid_index]
+        verkle_proofs[invalid_index] = (trie_root, keys, proof_values[1:2] + proof_values[:1] + proof_values[2:], proof)
+
+        time_a = time()
+        assert find_invalid_verkle_proofs(verkle_proofs) == [invalid_index]
+        time_b = time()
+
+        print("Found invalid proof in batch in {0:.3f} s".format(time_b - time_a), file=sys.stderr)
+
     print("{0}\t{1}\t{2}\t{3}\t{4}\t{5}\t{6}\t{7}".format(WIDTH_BITS, WIDTH, NUMBER_INITIAL_KEYS, NUMBER_KEYS_PROOF, average_depth, proof_size, proof_time, check_time))
@@ -0,0 +1,127 @@
+from random import Random
+from time import time
+
+#
+# Benchmark adapter for the EIP verkle trie, run with ../verkle_benchmark.py:
+#   python verkle_benchmark.py verkle_trie_eip --stems 1024,32768 --proof-keys 500,5000 --output results.json
+#
+# Besides the single-key paths, the phases cover the batched commitment update (insert_batch), proofs computed
+# with a process pool (prove_parallel), the streaming verifier on the wire format (verify_streaming), and
+# writing the trie to a NodeStore and proving from the lazily loaded trie (store_flush, store_prove)
+#
+
+DESCRIPTION = "EIP verkle trie"
+
+PHASES = ["bulk_load", "commit", "insert", "insert_batch", "prove", "prove_parallel", "verify", "verify_streaming",
+          "root_update", "store_flush", "store_prove"]
+
+GRID_PARAMETERS = [
+    ("stems", [2**10, 2**15], "Numbers of stems in the initial trie"),
+    ("chunks_per_stem", [10], "Numbers of values per stem in the initial trie"),
+    ("added_keys", [512], "Numbers of keys inserted with commitment updates, one by one and then as one batch"),
+    ("proof_keys", [500, 5000], "Numbers of keys in the proof"),
+    ("proof_workers", [2], "Numbers of worker processes for prove_parallel"),
+]
+
+
+def run_benchmark(config, record):
+    """
+    Sets up the module globals of `verkle_trie` for the configuration, with a deterministic basis, and runs all phases
+    """
+    import dbm
+    import io
+    import os
+    import tempfile
+    from multiprocessing import Pool
+    import verkle_trie
+    from ipa_utils import IPAUtils
+
+    rng = Random(config["seed"])
+    verkle_trie.BASIS = verkle_trie.generate_basis(verkle_trie.WIDTH, seed=config["seed"])
+    verkle_trie.ipa_utils = IPAUtils(verkle_trie.BASIS["G"], verkle_trie.BASIS["Q"], verkle_trie.primefield)
+
+    root_node = {"node_type": verkle_trie.VERKLE_TRIE_NODE_TYPE_INNER}
+    values = {}
+    items = []
+    for i in range(config["stems"]):
+        stem = rng.randbytes(31)
+        for j in range(config["chunks_per_stem"]):
+            items.append((stem + bytes([rng.randrange(256)]), rng.randbytes(32)))
+
+    time_a = time()
+    for key, value in items:
+        verkle_trie.update_verkle_tree_nocommitmentupdate(root_node, key, value)
+        values[key] = value
+    record("bulk_load", time_a)
+
+    time_a = time()
+    verkle_trie.verkle_add_missing_commitments(root_node)
+    record("commit", time_a)
+
+    items = [(rng.randbytes(32), rng.randbytes(32)) for i in range(config["added_keys"])]
+    time_a = time()
+    for key, value in items:
+        verkle_trie.update_verkle_tree(root_node, key, value)
+        values[key] = value
+    record("insert", time_a)
+
+    # Half new stems, half new values in existing stems, as in verkle_trie.py
+    existing_keys = sorted(values)
+    items = [(rng.randbytes(32) if i % 2 == 0 else verkle_trie.get_stem(rng.choice(existing_keys)) + bytes([rng.randrange(256)]),
+              rng.randbytes(32)) for i in range(config["added_keys"])]
+    time_a = time()
+    verkle_trie.update_verkle_tree_batch(root_node, items)
+    values.update(items)
+    record("insert_batch", time_a)
+
+    keys_in_proof = rng.sample(sorted(values), min(config["proof_keys"], len(values)))
+    values_in_proof = [values[key] for key in keys_in_proof]
+
+    time_a = time()
+    proof = verkle_trie.make_verkle_proof(root_node, keys_in_proof, display_times=False)
+    record("prove", time_a)
+
+    with Pool(config["proof_workers"]) as pool:
+        time_a = time()
+        parallel_proof = verkle_trie.make_verkle_proof(root_node, keys_in_proof, display_times=False, pool=pool)
+        record("prove_parallel", time_a)
+
+    verkle_root = root_node["commitment"].serialize()
+    time_a = time()
+    valid, update_hint = verkle_trie.check_verkle_proof(verkle_root, keys_in_proof, values_in_proof, proof, display_times=False)
+    record("verify", time_a)
+
+    proof_file = io.BytesIO()
+    verkle_trie.write_verkle_proof(proof, proof_file)
+    proof_file.seek(0)
+    time_a = time()
+    streaming_valid = verkle_trie.check_verkle_proof_streaming(verkle_root, iter(sorted(zip(keys_in_proof, values_in_proof))),
+                                                               proof_file, display_times=False)
+    record("verify_streaming", time_a)
+
+    updated_values = [rng.randbytes(32) for key in keys_in_proof]
+    time_a = time()
+    verkle_trie.compute_updated_verkle_root(verkle_root, keys_in_proof, values_in_proof, updated_values, update_hint,
+                                            display_times=False)
+    record("root_update", time_a)
+
+    # Flushing replaces the children of the root by stubs that load from the store
+    average_depth = verkle_trie.get_average_depth(root_node)
+    with tempfile.TemporaryDirectory() as directory:
+        node_store = verkle_trie.NodeStore(dbm.open(os.path.join(directory, "nodes"), "n"))
+        time_a = time()
+        node_store.flush(root_node)
+        record("store_flush", time_a)
+
+        time_a = time()
+        stored_proof = verkle_trie.make_verkle_proof(node_store.load_root(), keys_in_proof, display_times=False)
+        record("store_prove", time_a)
+        node_store.backend.close()
+
+    encoded_proof = verkle_trie.encode_verkle_proof(proof)
+    return {"proof_valid": valid,
+            "streaming_proof_valid": bool(streaming_valid),
+            "parallel_proof_matches": verkle_trie.encode_verkle_proof(parallel_proof) == encoded_proof,
+            "stored_proof_matches": verkle_trie.encode_verkle_proof(stored_proof) == encoded_proof,
+            "proof_size": verkle_trie.get_proof_size(proof),
+            "average_depth": average_depth}
@@ -2,6 +2,7 @@ from bandersnatch import Point, Scalar
 from poly_utils import PrimeField
 import hashlib
 import time
+import os
 
 #
 # Utilities for dealing with polynomials in evaluation form
@@ -42,6 +43,8 @@ class IPAUtils():
         self.WIDTH = primefield.WIDTH
         self.DOMAIN = primefield.DOMAIN
         self.primefield = primefield
+        self.basis_tables = None
+        self.basis_table_window_bits = None
 
 
     def hash_to_field(self, x):
@@ -59,19 +62,110 @@ class IPAUtils():
         """
         Returns a Pedersen commitment to the vector a (defined by its coefficients)
         """
-        if len(values) < 5:
+        # With precomputed basis tables, a table lookup per value beats the MSM for somewhat larger vectors
+        if len(values) < 5 or (self.basis_tables is not None and len(values) < 16):
             if len(values) == 0:
                 return Point().mul(0)
             else:
                 it = iter(values.items())
                 k, v = next(it)
-                r = self.BASIS_G[k].dup().glv(v)
+                r = self.basis_mul(k, v)
                 for k, v in it:
-                    r = r.add(self.BASIS_G[k].dup().glv(v))
+                    r = r.add(self.basis_mul(k, v))
                 return r
         return Point().msm([self.BASIS_G[i] for i in values.keys()], [Scalar().from_int(x) for x in values.values()])
 
 
+    def basis_mul(self, i, x):
+        """
+        Returns x * BASIS_G[i], using the precomputed basis tables if available
+        """
+        if self.basis_tables is None:
+            return self.BASIS_G[i].dup().glv(x)
+
+        table = self.basis_tables[i]
+        window_bits = self.basis_table_window_bits
+        mask = 2**window_bits - 1
+        x %= self.MODULUS
+        r = Point().mul(0)
+        window = 0
+        while x > 0:
+            digit = x & mask
+            if digit > 0:
+                r.add(table[window * mask + digit - 1])
+            x >>= window_bits
+            window += 1
+        return r
+
+
+    def precompute_basis_tables(self, window_bits=4, filename=None):
+        """
+        Precomputes fixed-base tables for BASIS_G, so that multiplying a basis point by a scalar only
+        needs one addition per window of `window_bits` bits of the scalar.
+
+        The table for BASIS_G[i] holds d * 2**(window_bits * j) * BASIS_G[i] for all windows j and digits
+        d = 1 ... 2**window_bits - 1. If `filename` is given, the tables are loaded from that file if it exists
+        and was computed for the same basis, and are written to it otherwise.
+        """
+        if filename is not None and os.path.exists(filename):
+            if self.load_basis_tables(filename):
+                return
+
+        mask = 2**window_bits - 1
+        number_of_windows = (self.MODULUS.bit_length() + window_bits - 1) // window_bits
+        self.basis_tables = []
+        for g in self.BASIS_G:
+            table = []
+            window_base = g.dup()
+            for j in range(number_of_windows):
+                multiple = window_base.dup()
+                for d in range(mask):
+                    table.append(multiple.dup())
+                    multiple.add(window_base)
+                window_base = multiple
+            self.basis_tables.append(table)
+        self.basis_table_window_bits = window_bits
+
+        if filename is not None:
+            self.save_basis_tables(filename)
+
+
+    def save_basis_tables(self, filename):
+        """
+        Writes the basis tables to `filename`: window_bits (1 byte), table length (4 bytes), then all table
+        points serialized, table by table
+        """
+        with open(filename, "wb") as f:
+            f.write(bytes([self.basis_table_window_bits]))
+            f.write(len(self.basis_tables[0]).to_bytes(4, "little"))
+            for table in self.basis_tables:
+                f.write(b"".join(point.serialize() for point in table))
+
+
+    def load_basis_tables(self, filename):
+        """
+        Loads basis tables written by `save_basis_tables`. Returns False (and leaves the tables unchanged) if
+        they were computed for a different basis
+        """
+        with open(filename, "rb") as f:
+            data = f.read()
+        window_bits = data[0]
+        table_length = int.from_bytes(data[1:5], "little")
+        if len(data) != 5 + 32 * table_length * len(self.BASIS_G):
+            return False
+        basis_tables = []
+        position = 5
+        for g in self.BASIS_G:
+            if data[position:position + 32] != g.serialize():
+                return False
+            basis_tables.append([Point().deserialize(data[position + 32 * k:position + 32 * (k + 1)])
+                                 for k in range(table_length)])
+            position += 32 * table_length
+        self.basis_tables = basis_tables
+        self.basis_table_window_bits = window_bits
+        return True
+
+
     def pedersen_commit_basis(self, a, basis):
         """
         Returns a Pedersen commitment to the vector a (defined by its coefficients)
@@ -110,22 +204,23 @@ class IPAUtils():
 
         i = 0
         xs = []
-        xinvs = []
+        Cs_LR = []
 
         while n > 1:
             C_L, C_R = [Point().deserialize(C) for C in proof[i]]
-
-            x = self.hash_to_field([C_L, C_R])
-            xinv = self.primefield.inv(x)
-            xs.append(x)
-            xinvs.append(xinv)
-
-            current_commitment = current_commitment.dup().add(C_L.dup().glv(x)).add(C_R.dup().glv(xinv))
+            Cs_LR.append((C_L, C_R))
+            xs.append(self.hash_to_field([C_L, C_R]))
 
             n = m
             m = n // 2
             i = i + 1
 
+        # All challenges only depend on the proof, so they can be inverted at once
+        xinvs = self.primefield.multi_inv(xs)
+
+        for (C_L, C_R), x, xinv in zip(Cs_LR, xs, xinvs):
+            current_commitment = current_commitment.dup().add(C_L.dup().glv(x)).add(C_R.dup().glv(xinv))
+
         f_g_coefs = self.f_g_coefs(xinvs)
         g_l = Point().msm(self.BASIS_G, f_g_coefs)
 
@@ -235,3 +330,23 @@ if __name__ == "__main__":
     time_b = time.time()
 
     print("Proof verified in {:.2f} ms".format((time_b - time_a)*1000))
+
+    update = {i: poly_eval[i] for i in range(0, WIDTH, 64)}
+
+    time_a = time.time()
+    C_update = ipautils.pedersen_commit_sparse(update)
+    time_b = time.time()
+
+    print("Sparse commitment ({} values) computed in {:.2f} ms".format(len(update), (time_b - time_a)*1000))
+
+    time_a = time.time()
+    ipautils.precompute_basis_tables()
+    time_b = time.time()
+
+    print("Basis tables precomputed in {:.2f} ms".format((time_b - time_a)*1000))
+
+    time_a = time.time()
+    assert ipautils.pedersen_commit_sparse(update) == C_update
+    time_b = time.time()
+
+    print("Sparse commitment ({} values) using basis tables computed in {:.2f} ms".format(len(update), (time_b - time_a)*1000))
@@ -31,6 +31,10 @@ class PrimeField():
         # Inverses needed for quotients
         self.INVERSES = [self.inv(x) for x in list(range(WIDTH)) + list(range(-WIDTH + 1, 0))]
 
+        # Cache for domain_inverses, for the last few evaluation points
+        self.domain_inverses_cache = {}
+        self.domain_inverses_cache_size = 16
+
         
     def formal_derivative(self, f):
         return [(n + 1) * c % self.MODULUS for n, c in enumerate(f[1:])]
@@ -45,7 +49,7 @@ class PrimeField():
         r = 0
         Az = self.eval_poly_at(self.A, z)
 
-        inverses = self.multi_inv([z - x for x in self.DOMAIN])
+        inverses = self.domain_inverses(z)
 
         for i, x in enumerate(inverses):
             r += f[i] * self.Aprime_DOMAIN_inv[i] * x % self.MODULUS
@@ -64,7 +68,7 @@ class PrimeField():
         r = []
         Az = self.eval_poly_at(self.A, z)
 
-        inverses = self.multi_inv([z - x for x in self.DOMAIN])
+        inverses = self.domain_inverses(z)
 
         for i, x in enumerate(inverses):
             r.append(Az * self.Aprime_DOMAIN_inv[i] * x % self.MODULUS)
@@ -80,14 +84,12 @@ class PrimeField():
         quotient (where z is not in DOMAIN), we need to do some extra work to compute q[index] where the formula above
         is 0 / 0
         """
-        q = [0] * self.WIDTH
+        # q[index] = sum_(i != index) (f[i] - y) / (DOMAIN[index] - DOMAIN[i]) * A'(DOMAIN[index]) / A'(DOMAIN[i])
+        #          = - A'(DOMAIN[index]) * sum_(i != index) q[i] / A'(DOMAIN[i])
         y = f[index]
-        for i in range(self.WIDTH):
-            if i != index:
-                q[i] = (f[i] - y) * self.INVERSES[i - index] % self.MODULUS
-                q[index] += (f[i] - y) * self.INVERSES[index - i] * self.Aprime_DOMAIN[index] * self.Aprime_DOMAIN_inv[i] % self.MODULUS
-
-        q[index] %= self.MODULUS
+        # INVERSES[0] = 0, so this gives q[index] = 0 before it is set below
+        q = [(f[i] - y) * self.INVERSES[i - index] % self.MODULUS for i in range(self.WIDTH)]
+        q[index] = -self.Aprime_DOMAIN[index] * sum(q[i] * self.Aprime_DOMAIN_inv[i] for i in range(self.WIDTH)) % self.MODULUS
 
         return q
 
@@ -97,11 +99,50 @@ class PrimeField():
         Compute the quotient q(X) = (f(X) - y)) / (X - z) in evaluation form. Note that this only works if the quotient
         is exact, i.e. f(z) = y, and otherwise returns garbage
         """
-        q = [0] * self.WIDTH
-        for i in range(self.WIDTH):
-            q[i] = self.div(f[i] - y, self.DOMAIN[i] - z)
+        inverses = self.domain_inverses(z)
+        return [(y - f[i]) * inverses[i] % self.MODULUS for i in range(self.WIDTH)]
 
-        return q
+
+    def domain_inverses(self, z):
+        """
+        Returns the inverses 1 / (z - DOMAIN[i]) for all i (0 where z = DOMAIN[i]), computed with a single
+        inversion. The result is cached for the last few z, since the same evaluation point is typically
+        used several times in a proof (e.g. for the h polynomial and the barycentric formula constants).
+        The returned list must not be modified.
+        """
+        z %= self.MODULUS
+        if z not in self.domain_inverses_cache:
+            if len(self.domain_inverses_cache) >= self.domain_inverses_cache_size:
+                del self.domain_inverses_cache[next(iter(self.domain_inverses_cache))]
+            self.domain_inverses_cache[z] = self.multi_inv([z - x for x in self.DOMAIN])
+        return self.domain_inverses_cache[z]
+
+    # Vector operations for polynomials in evaluation form. All take and return lists
+
+    def add_vectors(self, a, b):
+        return [(x + y) % self.MODULUS for x, y in zip(a, b)]
+
+    def sub_vectors(self, a, b):
+        return [(x - y) % self.MODULUS for x, y in zip(a, b)]
+
+    def mul_vectors(self, a, b):
+        """
+        Pointwise product
+        """
+        return [x * y % self.MODULUS for x, y in zip(a, b)]
+
+    def scale_vector(self, a, c):
+        return [x * c % self.MODULUS for x in a]
+
+    def lincomb_vectors(self, vectors, factors):
+        """
+        Returns sum_i factors[i] * vectors[i], only reducing once at the end
+        """
+        r = [0] * self.WIDTH
+        for v, c in zip(vectors, factors):
+            for i in range(self.WIDTH):
+                r[i] += v[i] * c
+        return [x % self.MODULUS for x in r]
 
     def add(self, x, y):
         return (x+y) % self.MODULUS
@@ -334,4 +375,7 @@ if __name__ == "__main__":
 
     poly_quotient_eval2 = [primefield.eval_poly_at(poly_quotient2, x) for x in primefield.DOMAIN]
 
-    assert poly_eval_quotient2 == poly_quotient_eval2
\ No newline at end of file
+    assert poly_eval_quotient2 == poly_quotient_eval2
+
+    assert primefield.lincomb_vectors([poly_eval, poly_eval_quotient], [3, 5]) \
+        == primefield.add_vectors(primefield.scale_vector(poly_eval, 3), primefield.scale_vector(poly_eval_quotient, 5))
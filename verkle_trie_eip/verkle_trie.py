@@ -1,10 +1,15 @@
 from bandersnatch import Point, Scalar
 import hashlib
-from random import randint, shuffle, choice
+from random import randint, shuffle, choice, Random
 from poly_utils import PrimeField
 from time import time
 from ipa_utils import IPAUtils, hash
 import sys
+from collections import OrderedDict
+from multiprocessing import Pool
+from bisect import bisect_left
+import io
+import dbm
 
 #
 # Proof of concept implementation for verkle tries
@@ -38,6 +43,9 @@ NUMBER_ADDED_STEMS = 512
 # Number of chunks to add to existing stems
 NUMBER_ADDED_CHUNKS = 512
 
+# Number of keys inserted without updating commitments, followed by a single commitment update of the dirty nodes
+NUMBER_DEFERRED_UPDATES = 512
+
 # Number of actually existing key/values pair in proof
 NUMBER_EXISTING_KEYS_PROOF = 5000
 
@@ -47,6 +55,19 @@ NUMBER_RANDOM_CHUNKS_PROOF = 1000
 
 NUMBER_VALUES_UPDATED = 1000
 
+# If set, the trie is written to an on-disk node store after it is built and then used from the store
+NODE_STORE_FILENAME = None
+
+# Number of worker processes used for computing proofs (None to compute them in the main process)
+NUMBER_PROOF_WORKERS = None
+# Number of openings per work item when computing multiproofs in parallel
+MULTIPROOF_CHUNK_SIZE = 256
+
+# If set, fixed-base tables with this window size are precomputed for the Pedersen basis
+BASIS_TABLE_WINDOW_BITS = None
+# File to load/save the basis tables (only useful with a reproducible basis)
+BASIS_TABLE_FILENAME = None
+
 # Verkle trie constants
 VERKLE_TRIE_NODE_TYPE_INNER = 0
 VERKLE_TRIE_NODE_TYPE_SUFFIX_TREE = 1
@@ -61,12 +82,20 @@ VERKLE_PROOF_EXTENSION_PRESENT_NOEXTENSION = 0
 VERKLE_PROOF_EXTENSION_PRESENT_PRESENT = 1
 VERKLE_PROOF_EXTENSION_PRESENT_OTHERSTEM = 2 # Used to indicate that there is an extension present, but for a different stem
 
-def generate_basis(size):
+def generate_basis(size, seed=None):
     """
     Generates a basis for Pedersen commitments
+
+    If `seed` is given, the basis is derived from it, so that it is the same on every run. The discrete
+    logarithms of such a basis are known, so it must only be used for benchmarks and tests.
     """
     # TODO: Currently random points that differ on every run.
     # Implement reproducable basis generation once hash_to_curve is provided
+    if seed is not None:
+        rng = Random(seed)
+        BASIS_G = [Point().mul(rng.randrange(1, MODULUS)) for i in range(WIDTH)]
+        BASIS_Q = Point().mul(rng.randrange(1, MODULUS))
+        return {"G": BASIS_G, "Q": BASIS_Q}
     BASIS_G = [Point(generator=False) for i in range(WIDTH)]
     BASIS_Q = Point(generator=False)
     return {"G": BASIS_G, "Q": BASIS_Q}
@@ -100,6 +129,23 @@ def commitment_to_field(commitment):
 #   "C2_field": C2 % MODULUS
 #   "commitment": commitment
 #   "commitment_field": commitment % MODULUS
+#
+# Nodes that were changed by `update_verkle_tree_nocommitmentupdate` since their commitments were last computed
+# additionally have a "dirty" entry: a dict mapping each changed child index (inner nodes) or suffix (suffix trees)
+# to the child commitment field (or value, None if absent) it had at that time. Nodes without commitments have
+# never been committed. `verkle_add_missing_commitments` brings both up to date.
+
+
+def mark_dirty(node, key, old_value):
+    """
+    Records that `key` of `node` changed. Only the first change since the last commitment update is kept,
+    as that is the value the commitment is still based on. Nothing to do for nodes that were never committed.
+    """
+    if "commitment" in node:
+        if "dirty" not in node:
+            node["dirty"] = {}
+        if key not in node["dirty"]:
+            node["dirty"][key] = old_value
 
 
 def update_verkle_tree_nocommitmentupdate(root_node, key, value):
@@ -118,12 +164,16 @@ def update_verkle_tree_nocommitmentupdate(root_node, key, value):
         index = stem[depth]
         depth += 1
         if index in current_node:
-            current_node = current_node[index]
+            child = current_node[index]
+            mark_dirty(current_node, index, child["commitment_field"] if "commitment_field" in child else 0)
+            current_node = child
         else:
+            mark_dirty(current_node, index, 0)
             current_node[index] = {"node_type": VERKLE_TRIE_NODE_TYPE_SUFFIX_TREE, "stem": stem, suffix: value}
             return
 
     if current_node["stem"] == stem:
+        mark_dirty(current_node, suffix, current_node[suffix] if suffix in current_node else None)
         current_node[suffix] = value
     else:
         old_suffix_tree = current_node
@@ -167,18 +217,18 @@ def update_verkle_tree(root_node, key, value):
                     current_node[suffix] = value
                     new_value_lower = int.from_bytes(value[:16], "little") + 2**128
                     new_value_upper = int.from_bytes(value[16:], "little")
-                    commitment_change = BASIS["G"][2 * suffix % 256].dup().mul((MODULUS + new_value_lower - old_value_lower) % MODULUS) \
-                                        .add(BASIS["G"][(2 * suffix + 1) % 256].dup().mul((MODULUS + new_value_upper - old_value_upper) % MODULUS))
+                    commitment_change = ipa_utils.basis_mul(2 * suffix % 256, (MODULUS + new_value_lower - old_value_lower) % MODULUS) \
+                                        .add(ipa_utils.basis_mul((2 * suffix + 1) % 256, (MODULUS + new_value_upper - old_value_upper) % MODULUS))
                     
                     if suffix < 128:
                         current_node["C1"].add(commitment_change)
                         new_field = commitment_to_field(current_node["C1"])
-                        current_node["commitment"].add(BASIS["G"][2].dup().mul((MODULUS + new_field - current_node["C1_field"]) % MODULUS))
+                        current_node["commitment"].add(ipa_utils.basis_mul(2, (MODULUS + new_field - current_node["C1_field"]) % MODULUS))
                         current_node["C1_field"] = new_field
                     else:
                         current_node["C2"].add(commitment_change)
                         new_field = commitment_to_field(current_node["C2"])
-                        current_node["commitment"].add(BASIS["G"][3].dup().mul((MODULUS + new_field - current_node["C2_field"]) % MODULUS))
+                        current_node["commitment"].add(ipa_utils.basis_mul(3, (MODULUS + new_field - current_node["C2_field"]) % MODULUS))
                         current_node["C2_field"] = new_field
                     new_field = commitment_to_field(current_node["commitment"])
                     value_change = (MODULUS + new_field - current_node["commitment_field"]) % MODULUS
@@ -220,55 +270,232 @@ def update_verkle_tree(root_node, key, value):
     
     # Update all the ancestor commitments along `path`
     for index, node in reversed(path):
-        node["commitment"].add(BASIS["G"][index].dup().mul(value_change))
+        node["commitment"].add(ipa_utils.basis_mul(index, value_change))
         old_field = node["commitment_field"]
         new_field = commitment_to_field(node["commitment"])
         node["commitment_field"] = new_field
         value_change = (MODULUS + new_field - old_field) % MODULUS
 
 
-def verkle_add_missing_commitments(node):
+def update_verkle_tree_batch(root_node, items):
     """
-    Recursively adds all missing commitments and hashes to a verkle trie structure.
+    Update or insert many (key, value) pairs and update all commitments
+
+    Writes are grouped by stem and by shared inner node prefix, so that every touched commitment
+    is updated exactly once (one sparse MSM per node) instead of once per key
     """
-    if node["node_type"] == VERKLE_TRIE_NODE_TYPE_SUFFIX_TREE:
+    updates_by_stem = {}
+    for key, value in items:
+        stem = get_stem(key)
+        if stem not in updates_by_stem:
+            updates_by_stem[stem] = {}
+        updates_by_stem[stem][get_suffix(key)] = value
 
-        C1 = ipa_utils.pedersen_commit_sparse({2 * i + j: int.from_bytes(node[i][16 * j:16 * (j + 1)], "little") + (1 - j) * 2**128
-                                                for i in range(128)
-                                                for j in range(2)
-                                                if i in node})
+    update_verkle_inner_node_batch(root_node, 0, updates_by_stem)
 
-        C2 = ipa_utils.pedersen_commit_sparse({2 * i + j: int.from_bytes(node[128 + i][16 * j:16 * (j + 1)], "little") + (1 - j) * 2**128
-                                                for i in range(128)
-                                                for j in range(2)
-                                                if 128 + i in node})
 
-        C1_field = commitment_to_field(C1)
-        C2_field = commitment_to_field(C2)
+def update_verkle_suffix_tree_batch(node, updates):
+    """
+    Applies all `updates` (suffix -> value) to an existing suffix tree node and updates C1, C2 and
+    the extension commitment with one sparse MSM each
+    """
+    old_values = {suffix: node[suffix] if suffix in node else None for suffix in updates}
+    node.update(updates)
+    c_deltas = get_suffix_tree_deltas(node, old_values)
 
-        node["C1"] = C1
-        node["C1_field"] = C1_field
-        node["C2"] = C2
-        node["C2_field"] = C2_field
+    field_changes = {}
+    for i, c_delta in enumerate(c_deltas):
+        if len(c_delta) > 0:
+            C = "C1" if i == 0 else "C2"
+            node[C].add(ipa_utils.pedersen_commit_sparse(c_delta))
+            new_field = commitment_to_field(node[C])
+            field_changes[2 + i] = (MODULUS + new_field - node[C + "_field"]) % MODULUS
+            node[C + "_field"] = new_field
 
-        commitment = ipa_utils.pedersen_commit_sparse({0: 1, 
-                                                       1: int.from_bytes(node["stem"], "little"),
-                                                       2: C1_field, 
-                                                       3: C2_field})
+    node["commitment"].add(ipa_utils.pedersen_commit_sparse(field_changes))
+    node["commitment_field"] = commitment_to_field(node["commitment"])
 
-        node["commitment"] = commitment
-        node["commitment_field"] = commitment_to_field(commitment)
 
-    elif node["node_type"] == VERKLE_TRIE_NODE_TYPE_INNER:
-        child = {}
-        for i in range(WIDTH):
-            if i in node:
-                if "commitment_field" not in node[i]:
-                    verkle_add_missing_commitments(node[i])
-                child[i] = node[i]["commitment_field"]
-        commitment = ipa_utils.pedersen_commit_sparse(child)
-        node["commitment"] = commitment
-        node["commitment_field"] = int.from_bytes(commitment.serialize(), "little") % MODULUS
+def get_suffix_tree_deltas(node, old_values):
+    """
+    Returns the changes of the C1 and C2 polynomials (as sparse dicts) of the suffix tree `node` relative to
+    `old_values` (suffix -> value before the change, None if absent)
+    """
+    c_deltas = [{}, {}]
+    for suffix, old_value in old_values.items():
+        old_value_lower = (int.from_bytes(old_value[:16], "little") + 2**128) if old_value is not None else 0
+        old_value_upper = (int.from_bytes(old_value[16:], "little")) if old_value is not None else 0
+        new_value_lower = int.from_bytes(node[suffix][:16], "little") + 2**128
+        new_value_upper = int.from_bytes(node[suffix][16:], "little")
+        c_delta = c_deltas[suffix // 128]
+        c_delta[2 * suffix % 256] = (MODULUS + new_value_lower - old_value_lower) % MODULUS
+        c_delta[(2 * suffix + 1) % 256] = (MODULUS + new_value_upper - old_value_upper) % MODULUS
+    return c_deltas
+
+
+def update_verkle_inner_node_batch(node, depth, updates_by_stem):
+    """
+    Applies `updates_by_stem` (stem -> {suffix: value}) to the subtree of the inner node `node` at `depth`.
+    All stems have to share the prefix of `node`.
+
+    Children are updated first, then the node commitment is updated with a single sparse MSM over the
+    changes of all touched children. If `node` is new (has no commitment yet), it is committed from scratch.
+    """
+    updates_by_index = {}
+    for stem, updates in updates_by_stem.items():
+        index = stem[depth]
+        if index not in updates_by_index:
+            updates_by_index[index] = {}
+        updates_by_index[index][stem] = updates
+
+    field_changes = {}
+    for index, child_updates_by_stem in updates_by_index.items():
+        if index in node:
+            child = node[index]
+            old_field = child["commitment_field"]
+            if child["node_type"] == VERKLE_TRIE_NODE_TYPE_INNER:
+                update_verkle_inner_node_batch(child, depth + 1, child_updates_by_stem)
+            elif len(child_updates_by_stem) == 1 and child["stem"] in child_updates_by_stem:
+                update_verkle_suffix_tree_batch(child, child_updates_by_stem[child["stem"]])
+            else:
+                # Stem split: the suffix tree moves down into a new inner node, and the updates are inserted
+                # below it (possibly splitting further)
+                child = {"node_type": VERKLE_TRIE_NODE_TYPE_INNER, node[index]["stem"][depth + 1]: node[index]}
+                node[index] = child
+                update_verkle_inner_node_batch(child, depth + 1, child_updates_by_stem)
+        else:
+            old_field = 0
+            if len(child_updates_by_stem) == 1:
+                stem, updates = next(iter(child_updates_by_stem.items()))
+                child = {"node_type": VERKLE_TRIE_NODE_TYPE_SUFFIX_TREE, "stem": stem}
+                child.update(updates)
+                verkle_add_missing_commitments(child)
+            else:
+                child = {"node_type": VERKLE_TRIE_NODE_TYPE_INNER}
+                update_verkle_inner_node_batch(child, depth + 1, child_updates_by_stem)
+            node[index] = child
+        field_changes[index] = (MODULUS + child["commitment_field"] - old_field) % MODULUS
+
+    if "commitment" in node:
+        node["commitment"].add(ipa_utils.pedersen_commit_sparse(field_changes))
+        node["commitment_field"] = commitment_to_field(node["commitment"])
+    else:
+        verkle_add_missing_commitments(node)
+
+
+def verkle_add_missing_commitments(node, pool=None):
+    """
+    Adds all missing commitments and hashes to a verkle trie structure, and updates the commitments of all
+    nodes marked dirty.
+
+    Only new and dirty nodes are visited. They are collected level by level and committed bottom up, so
+    that all MSMs of one level are computed in one batch (in parallel if `pool` is given). Committed nodes
+    that were changed are updated from the changes recorded in "dirty" rather than recomputed.
+    """
+    levels = []
+    level = [node] if needs_commitment_update(node) else []
+    while len(level) > 0:
+        levels.append(level)
+        next_level = []
+        for current_node in level:
+            if current_node["node_type"] == VERKLE_TRIE_NODE_TYPE_INNER:
+                indices = current_node["dirty"].keys() if "commitment" in current_node else range(WIDTH)
+                for i in indices:
+                    if i in current_node and needs_commitment_update(current_node[i]):
+                        next_level.append(current_node[i])
+        level = next_level
+
+    for level in reversed(levels):
+        commit_level(level, pool)
+
+
+def needs_commitment_update(node):
+    return "commitment_field" not in node or "dirty" in node
+
+
+def get_suffix_tree_polynomials(node):
+    """
+    Returns the C1 and C2 polynomials of the suffix tree `node` as sparse dicts
+    """
+    return [{2 * i + j: int.from_bytes(node[128 * k + i][16 * j:16 * (j + 1)], "little") + (1 - j) * 2**128
+             for i in range(128)
+             for j in range(2)
+             if 128 * k + i in node}
+            for k in range(2)]
+
+
+def pedersen_commit_sparse_serialized(values):
+    return ipa_utils.pedersen_commit_sparse(values).serialize()
+
+
+def pedersen_commit_sparse_many(values_list, pool=None):
+    """
+    Computes the sparse Pedersen commitments to all the vectors in `values_list`, in parallel if `pool` is given
+    """
+    if pool is None:
+        return [ipa_utils.pedersen_commit_sparse(values) for values in values_list]
+    return [Point().deserialize(data) for data in pool.map(pedersen_commit_sparse_serialized, values_list)]
+
+
+def commit_level(level, pool=None):
+    """
+    Computes or updates the commitments of all nodes in `level`, whose children all have up-to-date commitments.
+    New nodes are committed from scratch, dirty nodes get their commitment updated by the commitment to the changes.
+    """
+    # First pass: inner node commitments, and C1 and C2 of suffix trees
+    msms = []
+    for node in level:
+        if node["node_type"] == VERKLE_TRIE_NODE_TYPE_INNER:
+            if "commitment" in node:
+                msms.append({i: (MODULUS + (node[i]["commitment_field"] if i in node else 0) - old_field) % MODULUS
+                             for i, old_field in node["dirty"].items()})
+            else:
+                msms.append({i: node[i]["commitment_field"] for i in range(WIDTH) if i in node})
+        else:
+            if "commitment" in node:
+                msms.extend(get_suffix_tree_deltas(node, node["dirty"]))
+            else:
+                msms.extend(get_suffix_tree_polynomials(node))
+
+    commitments = iter(pedersen_commit_sparse_many(msms, pool))
+
+    # Second pass: extension commitments of suffix trees
+    suffix_trees = []
+    msms = []
+    for node in level:
+        if node["node_type"] == VERKLE_TRIE_NODE_TYPE_INNER:
+            commitment = next(commitments)
+            if "commitment" in node:
+                node["commitment"].add(commitment)
+                del node["dirty"]
+            else:
+                node["commitment"] = commitment
+            node["commitment_field"] = commitment_to_field(node["commitment"])
+        else:
+            suffix_trees.append(node)
+            field_changes = {}
+            for C, i in (("C1", 2), ("C2", 3)):
+                commitment = next(commitments)
+                if "commitment" in node:
+                    old_field = node[C + "_field"]
+                    node[C].add(commitment)
+                else:
+                    old_field = 0
+                    node[C] = commitment
+                node[C + "_field"] = commitment_to_field(node[C])
+                field_changes[i] = (MODULUS + node[C + "_field"] - old_field) % MODULUS
+            if "commitment" not in node:
+                field_changes[0] = 1
+                field_changes[1] = int.from_bytes(node["stem"], "little")
+            msms.append(field_changes)
+
+    for node, commitment in zip(suffix_trees, pedersen_commit_sparse_many(msms, pool)):
+        if "commitment" in node:
+            node["commitment"].add(commitment)
+            del node["dirty"]
+        else:
+            node["commitment"] = commitment
+        node["commitment_field"] = commitment_to_field(node["commitment"])
 
 
 def check_valid_tree(node, prefix=b""):
@@ -355,6 +582,200 @@ def get_average_depth(root_node):
     return depth / nodes
 
 
+#
+# Persistent node store
+#
+# Nodes are stored by their path in the trie (the stem prefix leading to them) using a compact fixed layout:
+#
+# VERKLE_TRIE_NODE_TYPE_INNER:
+#   node_type (1 byte) | commitment (32) | child bitmap (32) | commitment_field of each present child (32 each)
+#
+# VERKLE_TRIE_NODE_TYPE_SUFFIX_TREE:
+#   node_type (1 byte) | stem (31) | C1 (32) | C2 (32) | commitment (32) | value bitmap (32) | each present value (32 each)
+#
+# Children of a loaded inner node are `StoredNode` stubs that only know their commitment field. They are
+# loaded from the store on first access to anything else, so the trie functions can work on a stored trie
+# without changes.
+#
+
+class StoredNode(dict):
+    """
+    A trie node backed by a `NodeStore`. Loads itself from the store on first access and remembers whether
+    it has been modified since it was loaded.
+    """
+
+    def __init__(self, store, path, commitment_field=None):
+        super().__init__()
+        self.store = store
+        self.path = path
+        self.loaded = False
+        self.dirty = False
+        if commitment_field is not None:
+            dict.__setitem__(self, "commitment_field", commitment_field)
+
+    def load(self):
+        if not self.loaded:
+            dict.update(self, self.store.deserialize_node(self.store.get(self.path), self.path))
+            self.loaded = True
+
+    def __getitem__(self, key):
+        if key != "commitment_field":
+            self.load()
+        return dict.__getitem__(self, key)
+
+    def __contains__(self, key):
+        # A node that was never loaded cannot have been changed, so it has no "dirty" entry
+        if key != "commitment_field" and (key != "dirty" or self.loaded):
+            self.load()
+        return dict.__contains__(self, key)
+
+    def __setitem__(self, key, value):
+        self.load()
+        self.dirty = True
+        dict.__setitem__(self, key, value)
+
+    def get(self, key, default=None):
+        if key != "commitment_field":
+            self.load()
+        return dict.get(self, key, default)
+
+    def update(self, *args, **kwargs):
+        self.load()
+        self.dirty = True
+        dict.update(self, *args, **kwargs)
+
+
+class NodeStore():
+    """
+    Stores serialized verkle trie nodes in `backend`, which can be any mapping from bytes to bytes (a dict
+    for an in-memory store, or e.g. a `dbm` database for an on-disk store). Reads go through an LRU cache of
+    serialized nodes.
+    """
+
+    def __init__(self, backend=None, cache_size=2**16):
+        self.backend = {} if backend is None else backend
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+
+
+    def get(self, path):
+        if path in self.cache:
+            self.cache.move_to_end(path)
+            return self.cache[path]
+        data = self.backend[b"node" + path]
+        self.cache_put(path, data)
+        return data
+
+
+    def put(self, path, data):
+        self.backend[b"node" + path] = data
+        self.cache_put(path, data)
+
+
+    def cache_put(self, path, data):
+        self.cache[path] = data
+        self.cache.move_to_end(path)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+
+    def serialize_node(self, node):
+        bitmap = 0
+        if node["node_type"] == VERKLE_TRIE_NODE_TYPE_INNER:
+            children = b""
+            for i in range(WIDTH):
+                if dict.__contains__(node, i):
+                    bitmap |= 1 << i
+                    children += dict.__getitem__(node, i)["commitment_field"].to_bytes(32, "little")
+            return bytes([VERKLE_TRIE_NODE_TYPE_INNER]) + node["commitment"].serialize() \
+                + bitmap.to_bytes(32, "little") + children
+        else:
+            values = b""
+            for i in range(WIDTH):
+                if i in node:
+                    bitmap |= 1 << i
+                    values += node[i]
+            return bytes([VERKLE_TRIE_NODE_TYPE_SUFFIX_TREE]) + node["stem"] + node["C1"].serialize() \
+                + node["C2"].serialize() + node["commitment"].serialize() + bitmap.to_bytes(32, "little") + values
+
+
+    def deserialize_node(self, data, path):
+        if data[0] == VERKLE_TRIE_NODE_TYPE_INNER:
+            node = {"node_type": VERKLE_TRIE_NODE_TYPE_INNER,
+                    "commitment": Point().deserialize(data[1:33]),
+                    "commitment_field": int.from_bytes(data[1:33], "little") % MODULUS}
+            bitmap = int.from_bytes(data[33:65], "little")
+            position = 65
+            for i in range(WIDTH):
+                if bitmap >> i & 1:
+                    node[i] = StoredNode(self, path + bytes([i]), int.from_bytes(data[position:position + 32], "little"))
+                    position += 32
+            return node
+        else:
+            assert data[0] == VERKLE_TRIE_NODE_TYPE_SUFFIX_TREE
+            node = {"node_type": VERKLE_TRIE_NODE_TYPE_SUFFIX_TREE,
+                    "stem": data[1:32],
+                    "C1": Point().deserialize(data[32:64]),
+                    "C1_field": int.from_bytes(data[32:64], "little") % MODULUS,
+                    "C2": Point().deserialize(data[64:96]),
+                    "C2_field": int.from_bytes(data[64:96], "little") % MODULUS,
+                    "commitment": Point().deserialize(data[96:128]),
+                    "commitment_field": int.from_bytes(data[96:128], "little") % MODULUS}
+            bitmap = int.from_bytes(data[128:160], "little")
+            position = 160
+            for i in range(WIDTH):
+                if bitmap >> i & 1:
+                    node[i] = data[position:position + 32]
+                    position += 32
+            return node
+
+
+    def load_root(self):
+        """
+        Returns the root node of the stored trie (loaded lazily), or a new empty root node if the store is empty
+        """
+        if b"node" not in self.backend:
+            return {"node_type": VERKLE_TRIE_NODE_TYPE_INNER}
+        root_node = StoredNode(self, b"")
+        root_node.load()
+        return root_node
+
+
+    def flush(self, root_node):
+        """
+        Writes all new and modified nodes of the trie at `root_node` to the store, and unloads all nodes
+        except the root, so that memory use stays bounded by the nodes touched between two flushes.
+        Meant to be called once per block.
+        """
+        self.flush_node(root_node, b"")
+        for i in range(WIDTH):
+            if dict.__contains__(root_node, i):
+                dict.__setitem__(root_node, i, StoredNode(self, bytes([i]), dict.__getitem__(root_node, i)["commitment_field"]))
+        if hasattr(self.backend, "sync"):
+            self.backend.sync()
+
+
+    def flush_node(self, node, path):
+        if isinstance(node, StoredNode):
+            if not node.loaded:
+                return
+            # Suffix trees move down when their stem gets split, so they have to be written at the new path
+            if not node.dirty and node.path == path:
+                if node["node_type"] == VERKLE_TRIE_NODE_TYPE_SUFFIX_TREE:
+                    return
+            else:
+                self.put(path, self.serialize_node(node))
+                node.path = path
+                node.dirty = False
+        else:
+            self.put(path, self.serialize_node(node))
+
+        if node["node_type"] == VERKLE_TRIE_NODE_TYPE_INNER:
+            for i in range(WIDTH):
+                if dict.__contains__(node, i):
+                    self.flush_node(dict.__getitem__(node, i), path + bytes([i]))
+
+
 def find_key_with_path(root_node, key):
     """
     Returns the path of all nodes on the way to `key` as well as their index
@@ -380,12 +801,7 @@ def find_key_with_path(root_node, key):
     
 
 def get_proof_size(proof):
-    depths, extension_present, commitments_sorted_by_path_serialized, other_stems, D_serialized, ipa_proof = proof
-    size = len(depths) # assume 8 bit integer to represent the depth (5 bit) and extension_present(2 bit)
-    size += 32 * len(commitments_sorted_by_path_serialized)
-    size += 32 * len(other_stems)
-    size += 32 + (len(ipa_proof) - 1) * 2 * 32 + 32
-    return size
+    return len(encode_verkle_proof(proof))
 
 
 lasttime = [0]
@@ -403,12 +819,64 @@ def log_time_if_eligible(string, width, eligible):
         lasttime[0] = time()
 
 
-def make_ipa_multiproof(Cs, fs, zs, ys, display_times=True):
+def ipa_multiproof_chunks(fs, zs, r):
+    """
+    Splits the openings (fs, zs) into chunks of MULTIPROOF_CHUNK_SIZE. Each chunk also gets the power of r that
+    its first opening is multiplied by, so that the chunks can be processed independently
+    """
+    chunk_size = MULTIPROOF_CHUNK_SIZE
+    return [(fs[i:i + chunk_size], zs[i:i + chunk_size], r, pow(r, i, MODULUS)) for i in range(0, len(fs), chunk_size)]
+
+
+def compute_g_chunk(fs, zs, r, power_of_r):
+    """
+    Computes the part of the g polynomial (in evaluation form) for one chunk of openings
+    """
+    quotients = []
+    factors = []
+    for f, index in zip(fs, zs):
+        quotients.append(primefield.compute_inner_quotient_in_evaluation_form(f, index))
+        factors.append(power_of_r)
+
+        power_of_r = power_of_r * r % MODULUS
+
+    return primefield.lincomb_vectors(quotients, factors)
+
+
+def compute_h_chunk(fs, zs, r, power_of_r, t):
+    """
+    Computes the part of the h polynomial (in evaluation form) for one chunk of openings
+    """
+    denominator_inverses = primefield.domain_inverses(t)
+    factors = []
+    for index in zs:
+        factors.append(power_of_r * denominator_inverses[index] % MODULUS)
+
+        power_of_r = power_of_r * r % MODULUS
+
+    return primefield.lincomb_vectors(fs, factors)
+
+
+def sum_partial_polynomials(partials):
+    """
+    Adds the polynomials (in evaluation form) computed for all chunks
+    """
+    r = [0 for i in range(WIDTH)]
+    for partial in partials:
+        for i in range(WIDTH):
+            r[i] += partial[i]
+    return [x % MODULUS for x in r]
+
+
+def make_ipa_multiproof(Cs, fs, zs, ys, display_times=True, pool=None):
     """
     Computes an IPA multiproof according to the schema described here:
     https://dankradfeist.de/ethereum/2021/06/18/pcs-multiproofs.html
 
     This proof makes the assumption that the domain is the integers 0, 1, 2, ... WIDTH - 1
+
+    If `pool` (a multiprocessing.Pool) is given, the g and h polynomials are computed in parallel by
+    splitting the openings across the workers. The proof is the same as without `pool`.
     """
 
     # Step 1: Construct g(X) polynomial in evaluation form
@@ -416,17 +884,10 @@ def make_ipa_multiproof(Cs, fs, zs, ys, display_times=True):
 
     log_time_if_eligible("   Hashed to r", 30, display_times)
 
-    g = [0 for i in range(WIDTH)]
-    power_of_r = 1
-    for f, index in zip(fs, zs):
-        quotient = primefield.compute_inner_quotient_in_evaluation_form(f, index)
-        for i in range(WIDTH):
-            g[i] += power_of_r * quotient[i]
-
-        power_of_r = power_of_r * r % MODULUS
-    
-    for i in range(len(g)):
-        g[i] %= MODULUS
+    if pool is None:
+        g = compute_g_chunk(fs, zs, r, 1)
+    else:
+        g = sum_partial_polynomials(pool.starmap(compute_g_chunk, ipa_multiproof_chunks(fs, zs, r)))
 
     log_time_if_eligible("   Computed g polynomial", 30, display_times)
 
@@ -437,19 +898,11 @@ def make_ipa_multiproof(Cs, fs, zs, ys, display_times=True):
     # Step 2: Compute h in evaluation form
     
     t = ipa_utils.hash_to_field([r, D]) % MODULUS
-    
-    h = [0 for i in range(WIDTH)]
-    power_of_r = 1
-    
-    for f, index in zip(fs, zs):
-        denominator_inv = primefield.inv(t - primefield.DOMAIN[index])
-        for i in range(WIDTH):
-            h[i] += power_of_r * f[i] * denominator_inv % MODULUS
-            
-        power_of_r = power_of_r * r % MODULUS
-   
-    for i in range(len(h)):
-        h[i] %= MODULUS
+
+    if pool is None:
+        h = compute_h_chunk(fs, zs, r, 1, t)
+    else:
+        h = sum_partial_polynomials(pool.starmap(compute_h_chunk, [chunk + (t,) for chunk in ipa_multiproof_chunks(fs, zs, r)]))
 
     log_time_if_eligible("   Computed h polynomial", 30, display_times)
 
@@ -489,8 +942,10 @@ def check_ipa_multiproof(Cs, zs, ys, proof, display_times=True):
 
     C_by_serialized = {}
 
+    denominator_inverses = primefield.domain_inverses(t)
+
     for C, z, y in zip(Cs, zs, ys):
-        E_coefficient = primefield.div(power_of_r, t - primefield.DOMAIN[z])
+        E_coefficient = power_of_r * denominator_inverses[z] % MODULUS
         C_serialized = C.serialize()
         C_by_serialized[C_serialized] = C
         E_coefficients[C_serialized] = E_coefficient if C_serialized not in E_coefficients \
@@ -516,11 +971,13 @@ def check_ipa_multiproof(Cs, zs, ys, proof, display_times=True):
     return True
 
 
-def make_verkle_proof(root_node, keys, display_times=True):
+def make_verkle_proof(root_node, keys, display_times=True, pool=None):
     """
     Creates a proof for the `keys` in the verkle trie given by `root_node`
 
     This includes proving that a value is not in the verkle trie
+
+    If `pool` (a multiprocessing.Pool) is given, the multiproof is computed in parallel
     """
 
     start_logging_time_if_eligible("   Starting proof computation", display_times)
@@ -666,7 +1123,7 @@ def make_verkle_proof(root_node, keys, display_times=True):
                                                 for i in range(128)
                                                 for j in range(2)])
 
-    D_serialized, ipa_proof = make_ipa_multiproof(Cs, fs, zs, ys, display_times)
+    D_serialized, ipa_proof = make_ipa_multiproof(Cs, fs, zs, ys, display_times, pool)
 
     # All commitments, but without any duplications. These are for sending over the wire as part of the proof
     nodes_sorted_by_path = sorted(nodes_by_path.items())
@@ -699,6 +1156,7 @@ def check_verkle_proof(verkle_root, keys, values, proof, display_times=True):
     # Unpack the proof
     depths, extension_present, commitments_sorted_by_path_serialized, other_stems, D_serialized, ipa_proof = proof
     commitments_sorted_by_path = [Point().deserialize(verkle_root)] + [Point().deserialize(x) for x in commitments_sorted_by_path_serialized]
+    other_stems = [bytes(x) for x in other_stems]
 
     # Find all stems
     stems = sorted(list(set([get_stem(key) for key in keys])))
@@ -838,6 +1296,245 @@ def check_verkle_proof(verkle_root, keys, values, proof, display_times=True):
     return check_ipa_multiproof(Cs, zs, ys, [D_serialized, ipa_proof], display_times), update_hint
 
 
+#
+# Verkle proof wire format
+#
+# number of stems (4 bytes), then one byte per stem (in sorted order): depth | extension_present << 5
+# number of commitments (4 bytes), then the commitments sorted by path, without the root (32 bytes each)
+# number of other stems (4 bytes), then the other stems in sorted order (31 bytes each)
+# D (32 bytes)
+# C_L and C_R for each of the WIDTH_BITS IPA rounds (32 bytes each)
+# the final IPA scalar a (32 bytes)
+#
+
+def encode_verkle_proof(proof):
+    """
+    Encodes a verkle proof in the wire format
+    """
+    depths, extension_present, commitments_sorted_by_path_serialized, other_stems, D_serialized, ipa_proof = proof
+    assert len(ipa_proof) == WIDTH_BITS + 1
+    return b"".join([len(depths).to_bytes(4, "little"),
+                     bytes(depth | extpres << 5 for depth, extpres in zip(depths, extension_present)),
+                     len(commitments_sorted_by_path_serialized).to_bytes(4, "little"),
+                     b"".join(commitments_sorted_by_path_serialized),
+                     len(other_stems).to_bytes(4, "little"),
+                     b"".join(other_stems),
+                     D_serialized,
+                     b"".join(C for C_L_and_C_R in ipa_proof[:-1] for C in C_L_and_C_R),
+                     ipa_proof[-1][0].to_bytes(32, "little")])
+
+
+class PackedSequence():
+    """
+    Read-only sequence of `item_size` byte items in the buffer `data`, returned as memoryview slices (or
+    passed through `decode` if given). Nothing is copied when the sequence is created.
+    """
+
+    def __init__(self, data, item_size, decode=None):
+        self.data = data
+        self.item_size = item_size
+        self.decode = decode
+
+    def __len__(self):
+        return len(self.data) // self.item_size
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("PackedSequence index out of range")
+        item = self.data[i * self.item_size:(i + 1) * self.item_size]
+        return item if self.decode is None else self.decode(item)
+
+
+def decode_verkle_proof(data):
+    """
+    Decodes a verkle proof from the wire format. Returns a proof in the same form as `make_verkle_proof`, except
+    that all lists are `PackedSequence`s and all serialized points and stems are memoryview slices of `data`.
+    Raises ValueError if `data` is not a canonical encoding of a proof.
+    """
+    data = memoryview(data)
+    position = 0
+
+    def take(length):
+        nonlocal position
+        if position + length > len(data):
+            raise ValueError("Verkle proof is truncated")
+        position += length
+        return data[position - length:position]
+
+    number_of_stems = int.from_bytes(take(4), "little")
+    depths_and_extpres = take(number_of_stems)
+    if any(x >> 5 > VERKLE_PROOF_EXTENSION_PRESENT_OTHERSTEM for x in depths_and_extpres):
+        raise ValueError("Invalid extension status")
+    depths = PackedSequence(depths_and_extpres, 1, lambda x: x[0] & 31)
+    extension_present = PackedSequence(depths_and_extpres, 1, lambda x: x[0] >> 5)
+    number_of_commitments = int.from_bytes(take(4), "little")
+    commitments_sorted_by_path_serialized = PackedSequence(take(32 * number_of_commitments), 32)
+    number_of_other_stems = int.from_bytes(take(4), "little")
+    other_stems = PackedSequence(take(31 * number_of_other_stems), 31)
+    D_serialized = take(32)
+    ipa_proof = [[take(32), take(32)] for i in range(WIDTH_BITS)]
+    a = int.from_bytes(take(32), "little")
+    if a >= MODULUS:
+        raise ValueError("Invalid IPA scalar")
+    ipa_proof.append([a])
+    if position != len(data):
+        raise ValueError("Trailing data after verkle proof")
+
+    return depths, extension_present, commitments_sorted_by_path_serialized, other_stems, D_serialized, ipa_proof
+
+
+def write_verkle_proof(proof, f):
+    """
+    Writes a verkle proof in the wire format to the file object `f`
+    """
+    f.write(encode_verkle_proof(proof))
+
+
+def read_exactly(f, length):
+    data = f.read(length)
+    if len(data) != length:
+        raise EOFError("Verkle proof is truncated")
+    return data
+
+
+def check_verkle_proof_streaming(verkle_root, key_values, f, display_times=True):
+    """
+    Checks a verkle proof in the wire format, read from the file object `f`, for the (key, value) pairs
+    given by the iterator `key_values`, which have to be sorted by key.
+
+    Stems and their extension status are read from `f` and validated while the keys arrive, so invalid proofs
+    are rejected without reading the rest. Keys and values are not kept: the verifier only keeps the stems with
+    extension and one field element per opening, which is what the multiproof transcript needs.
+    """
+
+    start_logging_time_if_eligible("   Starting streaming proof check", display_times)
+
+    number_of_stems = int.from_bytes(read_exactly(f, 4), "little")
+    stems_read = 0
+    previous_key = None
+    stem = None
+
+    # Stems with extension present, in sorted order
+    stems_with_extension = []
+    # Prefixes at which an extension node for a different stem has to be found
+    other_stem_prefixes = set()
+
+    # All paths of commitments required for the proof, and the openings (path, z). Openings of inner nodes
+    # are mapped to None (the value is the field element of the child commitment), leaf openings to their value
+    all_paths = set()
+    openings = {}
+
+    for key, value in key_values:
+        if previous_key is not None and key <= previous_key:
+            return False
+        previous_key = key
+
+        if get_stem(key) != stem:
+            stem = get_stem(key)
+            if stems_read == number_of_stems:
+                return False
+            depth_and_extpres = read_exactly(f, 1)[0]
+            stems_read += 1
+            depth = depth_and_extpres & 31
+            extpres = depth_and_extpres >> 5
+
+            for i in range(depth):
+                all_paths.add(stem[:i])
+                openings[(stem[:i], stem[i])] = None
+
+            if extpres == VERKLE_PROOF_EXTENSION_PRESENT_PRESENT:
+                stems_with_extension.append(stem)
+            elif extpres == VERKLE_PROOF_EXTENSION_PRESENT_OTHERSTEM:
+                other_stem_prefixes.add(stem[:depth])
+            elif extpres == VERKLE_PROOF_EXTENSION_PRESENT_NOEXTENSION:
+                if depth == 0:
+                    return False
+                openings[(stem[:depth - 1], stem[depth - 1])] = 0
+            else:
+                return False
+
+            if extpres != VERKLE_PROOF_EXTENSION_PRESENT_NOEXTENSION:
+                all_paths.add(stem[:depth])
+                openings[(stem[:depth], 0)] = 1
+                # The value is the stem of the extension node: set below for this stem, or from another stem with
+                # extension or the list of other stems
+                openings.setdefault((stem[:depth], 1), None)
+
+        if extpres == VERKLE_PROOF_EXTENSION_PRESENT_PRESENT:
+            suffix = get_suffix(key)
+            openings[(stem[:depth], 1)] = int.from_bytes(stem, "little")
+            openings[(stem[:depth], 2 + (suffix // 128))] = None
+
+            suffix_tree_path = stem[:depth] + bytes([2 if suffix < 128 else 3])
+            all_paths.add(suffix_tree_path)
+            openings[(suffix_tree_path, 2 * suffix % 256)] = int.from_bytes(value[:16], "little") + 2**128 if value is not None else 0
+            openings[(suffix_tree_path, (2 * suffix + 1) % 256)] = int.from_bytes(value[16:], "little") if value is not None else 0
+        elif value is not None:
+            # Prover can only claim the extension is not present or for another stem if the value was never written
+            return False
+
+    if stems_read != number_of_stems:
+        return False
+
+    log_time_if_eligible("   Read stems and keys", 30, display_times)
+
+    all_paths = sorted(all_paths)
+    number_of_commitments = int.from_bytes(read_exactly(f, 4), "little")
+    if number_of_commitments != len(all_paths) - 1:
+        return False
+    commitments_serialized_by_path = {b"": verkle_root}
+    for path in all_paths[1:]:
+        commitments_serialized_by_path[path] = read_exactly(f, 32)
+
+    # Extension nodes for other stems: either the other stem is one of the stems with extension in the proof,
+    # or it has to be in the list of other stems
+    number_of_other_stems = int.from_bytes(read_exactly(f, 4), "little")
+    other_stems = [read_exactly(f, 31) for i in range(number_of_other_stems)]
+    if other_stems != sorted(set(other_stems)):
+        return False
+    other_stems_used = set()
+    for prefix in other_stem_prefixes:
+        i = bisect_left(stems_with_extension, prefix)
+        if i < len(stems_with_extension) and stems_with_extension[i][:len(prefix)] == prefix:
+            continue
+        i = bisect_left(other_stems, prefix)
+        if i == len(other_stems) or other_stems[i][:len(prefix)] != prefix:
+            return False
+        other_stems_used.add(other_stems[i])
+        openings[(prefix, 1)] = int.from_bytes(other_stems[i], "little")
+    if len(other_stems_used) != len(other_stems):
+        return False
+
+    D_serialized = read_exactly(f, 32)
+    ipa_proof = [[read_exactly(f, 32), read_exactly(f, 32)] for i in range(WIDTH_BITS)]
+    ipa_proof.append([int.from_bytes(read_exactly(f, 32), "little")])
+
+    log_time_if_eligible("   Read proof", 30, display_times)
+
+    commitments_by_path = {path: Point().deserialize(C) for path, C in commitments_serialized_by_path.items()}
+
+    Cs = []
+    zs = []
+    ys = []
+    for (path, z), y in sorted(openings.items()):
+        if y is None:
+            child_path = path + bytes([z])
+            if child_path not in commitments_serialized_by_path:
+                return False
+            y = int.from_bytes(commitments_serialized_by_path[child_path], "little") % MODULUS
+        Cs.append(commitments_by_path[path])
+        zs.append(z)
+        ys.append(y)
+
+    log_time_if_eligible("   Recreated commitment lists", 30, display_times)
+
+    return check_ipa_multiproof(Cs, zs, ys, [D_serialized, ipa_proof], display_times)
+
+
 def compute_updated_verkle_root(verkle_root, keys, values, updated_values, update_hint, display_times=True):
     """
     Computes the updated verkle root
@@ -1045,6 +1742,13 @@ if __name__ == "__main__":
     BASIS = generate_basis(WIDTH)
     ipa_utils = IPAUtils(BASIS["G"], BASIS["Q"], primefield)
 
+    if BASIS_TABLE_WINDOW_BITS is not None:
+        time_a = time()
+        ipa_utils.precompute_basis_tables(BASIS_TABLE_WINDOW_BITS, BASIS_TABLE_FILENAME)
+        time_b = time()
+
+        print("Precomputed basis tables in {0:.3f} s".format(time_b - time_a), file=sys.stderr)
+
     # Build a random verkle trie
     root_node = {"node_type": VERKLE_TRIE_NODE_TYPE_INNER}
 
@@ -1063,12 +1767,25 @@ if __name__ == "__main__":
     print("Inserted {0} elements for an average depth of {1:.3f}".format(NUMBER_CHUNKS, average_depth), file=sys.stderr)
     print("Average depth = {0:.3f} without counting suffix trees (stem tree only)".format(average_depth - 2), file=sys.stderr)
 
+    pool = Pool(NUMBER_PROOF_WORKERS) if NUMBER_PROOF_WORKERS is not None else None
+
     time_a = time()
-    verkle_add_missing_commitments(root_node)
+    verkle_add_missing_commitments(root_node, pool)
     time_b = time()
 
     print("Computed verkle root in {0:.3f} s".format(time_b - time_a), file=sys.stderr)
 
+    node_store = None
+    if NODE_STORE_FILENAME is not None:
+        node_store = NodeStore(dbm.open(NODE_STORE_FILENAME, "n"))
+
+        time_a = time()
+        node_store.flush(root_node)
+        root_node = node_store.load_root()
+        time_b = time()
+
+        print("Wrote verkle trie to node store in {0:.3f} s".format(time_b - time_a), file=sys.stderr)
+
     time_a = time()
     assert values == check_valid_tree(root_node)
     time_b = time()
@@ -1082,6 +1799,8 @@ if __name__ == "__main__":
             value = randint(0, 2**256-1).to_bytes(32, "little")
             update_verkle_tree(root_node, key, value)
             values[key] = value
+        if node_store is not None:
+            node_store.flush(root_node)
         time_y = time()
             
         print("Additionally inserted {0} stems in {1:.3f} s".format(NUMBER_ADDED_STEMS, time_y - time_x), file=sys.stderr)
@@ -1104,6 +1823,8 @@ if __name__ == "__main__":
             value = randint(0, 2**256-1).to_bytes(32, "little")
             update_verkle_tree(root_node, key, value)
             values[key] = value
+        if node_store is not None:
+            node_store.flush(root_node)
         time_y = time()
             
         print("Additionally inserted {0} chunks in {1:.3f} s".format(NUMBER_ADDED_CHUNKS, time_y - time_x), file=sys.stderr)
@@ -1115,6 +1836,31 @@ if __name__ == "__main__":
         
         print("[Checked tree valid: {0:.3f} s]".format(time_b - time_a), file=sys.stderr)
 
+    if NUMBER_DEFERRED_UPDATES > 0:
+
+        time_x = time()
+        existing_keys = list(values.keys())
+        for i in range(NUMBER_DEFERRED_UPDATES):
+            if i % 2 == 0:
+                key = randint(0, 2**256-1).to_bytes(32, "little")
+            else:
+                key = get_stem(choice(existing_keys)) + bytes([randint(0, 255)])
+            value = randint(0, 2**256-1).to_bytes(32, "little")
+            update_verkle_tree_nocommitmentupdate(root_node, key, value)
+            values[key] = value
+        verkle_add_missing_commitments(root_node, pool)
+        if node_store is not None:
+            node_store.flush(root_node)
+        time_y = time()
+
+        print("Additionally inserted {0} keys with deferred commitment update in {1:.3f} s".format(NUMBER_DEFERRED_UPDATES, time_y - time_x), file=sys.stderr)
+
+        time_a = time()
+        assert values == check_valid_tree(root_node)
+        time_b = time()
+        
+        print("[Checked tree valid: {0:.3f} s]".format(time_b - time_a), file=sys.stderr)
+
     all_keys = list(values.keys())
     shuffle(all_keys)
 
@@ -1134,7 +1880,7 @@ if __name__ == "__main__":
         values_in_proof.append(values[key] if key in values else None)
 
     time_a = time()
-    proof = make_verkle_proof(root_node, keys_in_proof)
+    proof = make_verkle_proof(root_node, keys_in_proof, pool=pool)
     time_b = time()
     
     proof_size = get_proof_size(proof)
@@ -1158,6 +1904,17 @@ if __name__ == "__main__":
 
     print("Checked proof in {0:.3f} s".format(time_b - time_a), file=sys.stderr)
 
+    proof_file = io.BytesIO()
+    write_verkle_proof(proof, proof_file)
+    proof_file.seek(0)
+
+    time_a = time()
+    assert check_verkle_proof_streaming(root_node["commitment"].serialize(), iter(sorted(dict(zip(keys_in_proof, values_in_proof)).items())),
+                                        proof_file)
+    time_b = time()
+
+    print("Checked proof (streaming) in {0:.3f} s".format(time_b - time_a), file=sys.stderr)
+
     time_a = time()
     updated_root = compute_updated_verkle_root(root_node["commitment"].serialize(), keys_in_proof, values_in_proof, updated_values, update_hint)
     time_b = time()
@@ -1166,12 +1923,11 @@ if __name__ == "__main__":
     print("Computed root update in {0:.3f} s".format(time_b - time_a), file=sys.stderr)
 
     time_a = time()
-    for key, updated_value in zip(keys_in_proof, updated_values):
-        if updated_value is not None:
-            update_verkle_tree(root_node, key, updated_value)
+    update_verkle_tree_batch(root_node, [(key, updated_value) for key, updated_value in zip(keys_in_proof, updated_values)
+                                         if updated_value is not None])
     time_b = time()
     check_time = time_b - time_a
 
     assert root_node["commitment"] == updated_root
 
-    print("Verified updated root in {0:.3f} s".format(time_b - time_a), file=sys.stderr)
+    print("Verified updated root (batch update) in {0:.3f} s".format(time_b - time_a), file=sys.stderr)
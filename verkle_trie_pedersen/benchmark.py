@@ -0,0 +1,78 @@
+from random import Random
+from time import time
+
+#
+# Benchmark adapter for the Pedersen verkle trie, run with ../verkle_benchmark.py:
+#   python verkle_benchmark.py verkle_trie_pedersen --width-bits 5,8,10 --keys 65536 --proof-keys 500 --output results.json
+#
+
+DESCRIPTION = "Pedersen verkle trie"
+
+PHASES = ["bulk_load", "commit", "insert", "delete", "prove", "verify"]
+
+GRID_PARAMETERS = [
+    ("width_bits", [5, 8, 10], "Trie widths (log2)"),
+    ("keys", [2**16], "Numbers of keys in the initial trie"),
+    ("added_keys", [512], "Numbers of keys inserted with commitment updates"),
+    ("deleted_keys", [512], "Numbers of keys deleted"),
+    ("proof_keys", [500, 5000], "Numbers of keys in the proof"),
+]
+
+
+def run_benchmark(config, record):
+    """
+    Sets up the module globals of `verkle_trie` for the configuration, with a deterministic basis, and runs all phases
+    """
+    import verkle_trie
+    from bandersnatch import Point
+    from ipa_utils import IPAUtils
+    from poly_utils import PrimeField
+
+    rng = Random(config["seed"])
+    verkle_trie.WIDTH_BITS = config["width_bits"]
+    verkle_trie.WIDTH = 2**verkle_trie.WIDTH_BITS
+    verkle_trie.primefield = PrimeField(verkle_trie.MODULUS, verkle_trie.WIDTH)
+    verkle_trie.BASIS = verkle_trie.generate_basis(verkle_trie.WIDTH, seed=config["seed"])
+    verkle_trie.ipa_utils = IPAUtils(verkle_trie.BASIS["G"], verkle_trie.BASIS["Q"], verkle_trie.primefield)
+
+    root = {"node_type": "inner", "commitment": Point().mul(0)}
+    values = {}
+    items = [(rng.randbytes(32), rng.randbytes(32)) for i in range(config["keys"])]
+
+    time_a = time()
+    for key, value in items:
+        verkle_trie.insert_verkle_node(root, key, value)
+        values[key] = value
+    record("bulk_load", time_a)
+
+    time_a = time()
+    verkle_trie.add_node_hash(root)
+    record("commit", time_a)
+
+    items = [(rng.randbytes(32), rng.randbytes(32)) for i in range(config["added_keys"])]
+    time_a = time()
+    for key, value in items:
+        verkle_trie.update_verkle_node(root, key, value)
+        values[key] = value
+    record("insert", time_a)
+
+    keys_to_delete = rng.sample(sorted(values), min(config["deleted_keys"], len(values) - 1))
+    time_a = time()
+    for key in keys_to_delete:
+        verkle_trie.delete_verkle_node(root, key)
+        del values[key]
+    record("delete", time_a)
+
+    keys_in_proof = rng.sample(sorted(values), min(config["proof_keys"], len(values)))
+
+    time_a = time()
+    proof = verkle_trie.make_verkle_proof(root, keys_in_proof, display_times=False)
+    record("prove", time_a)
+
+    time_a = time()
+    valid = verkle_trie.check_verkle_proof(root["commitment"].serialize(), keys_in_proof, [values[key] for key in keys_in_proof], proof, display_times=False)
+    record("verify", time_a)
+
+    return {"proof_valid": valid,
+            "proof_size": verkle_trie.get_proof_size(proof),
+            "average_depth": verkle_trie.get_average_depth(root)}
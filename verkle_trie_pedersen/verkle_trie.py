@@ -1,6 +1,6 @@
 from bandersnatch import Point, Scalar
 import hashlib
-from random import randint, shuffle
+from random import randint, shuffle, Random
 from poly_utils import PrimeField
 from time import time
 from ipa_utils import IPAUtils, hash
@@ -35,12 +35,20 @@ NUMBER_DELETED_KEYS = 512
 # Number of key/values pair in proof
 NUMBER_KEYS_PROOF = 5000
 
-def generate_basis(size):
+def generate_basis(size, seed=None):
     """
     Generates a basis for Pedersen commitments
+
+    If `seed` is given, the basis is derived from it, so that it is the same on every run. The discrete
+    logarithms of such a basis are known, so it must only be used for benchmarks and tests.
     """
     # TODO: Currently random points that differ on every run.
     # Implement reproducable basis generation once hash_to_curve is provided
+    if seed is not None:
+        rng = Random(seed)
+        BASIS_G = [Point().mul(rng.randrange(1, MODULUS)) for i in range(WIDTH)]
+        BASIS_Q = Point().mul(rng.randrange(1, MODULUS))
+        return {"G": BASIS_G, "Q": BASIS_Q}
     BASIS_G = [Point(generator=False) for i in range(WIDTH)]
     BASIS_Q = Point(generator=False)
     return {"G": BASIS_G, "Q": BASIS_Q}